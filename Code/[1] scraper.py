@@ -1,39 +1,40 @@
 '''
 Small script that scrapes JSONs files from the FlavourDB2 website.
-'''
-
-import json
-import requests
-
-# Define the range of IDs
-start_id = 1
-end_id = 979
-
-# Base URL
-base_url = "https://cosylab.iiitd.edu.in/flavordb2/entities_json?id="
-
-# Combined data
-combined_data = []
 
-# Fetch and combine data
-for entity_id in range(start_id, end_id + 1):
-
-    print(f"Getting ID= {entity_id}")
-
-    url = f"{base_url}{entity_id}"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        data = response.json()
-        combined_data.append(data)
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching data for ID {entity_id}: {e}")
-    except json.JSONDecodeError:
-        print(f"Error decoding JSON for ID {entity_id}")
-
-# Write combined data to a file
-output_file = "combined_flavor_db.json"
-with open(output_file, "w", encoding="utf-8") as f:
-    json.dump(combined_data, f, indent=4)
+Entities are fetched concurrently and streamed to a JSON Lines file. Fetched IDs are recorded in a
+checkpoint file, so rerunning the script after a crash only fetches the missing IDs.
+'''
 
-print(f"Data successfully combined into {output_file}")
+import argparse
+from helper_functions.helper_instrumentation import add_trace_arguments, run_traced
+from helper_functions.helper_scraper import BASE_URL
+from helper_functions.helper_stages import scrape_flavourdb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape the entity JSONs from FlavourDB2.")
+    parser.add_argument("--start-id", type=int, default=1)
+    parser.add_argument("--end-id", type=int, default=979)
+    parser.add_argument("--base-url", default=BASE_URL, help="URL the entity ID is appended to")
+    parser.add_argument("--jsonl", default="combined_flavor_db.jsonl", help="Streaming output, one entity per line")
+    parser.add_argument("--checkpoint", default="combined_flavor_db.done", help="IDs that were already fetched")
+    parser.add_argument("--output", default="combined_flavor_db.json", help="Combined JSON list")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-per-second", type=float, default=None)
+    parser.add_argument("--retries", type=int, default=5)
+    add_trace_arguments(parser)
+    args = parser.parse_args()
+
+    # Fetch all IDs that are not in the checkpoint yet, then write combined data to a file
+    run_traced(
+        scrape_flavourdb, args.trace, args.profile,
+        args.start_id, args.end_id, args.jsonl, args.checkpoint, args.output,
+        base_url=args.base_url,
+        concurrency=args.concurrency,
+        max_per_second=args.max_per_second,
+        retries=args.retries
+    )
+
+
+if __name__ == '__main__':
+    main()
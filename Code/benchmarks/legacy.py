@@ -0,0 +1,352 @@
+"""
+This file contains the previous implementations of optimized stages, so the benchmarks can compare against them:
+
+1. `resolve_top_matches_pivot`:
+   - The wide pivot + `np.select` version of `resolve_top_matches` (step 3).
+
+2. `clean_ingredient_names_apply` / `combine_flavour_nutrition_merge`:
+   - The per-name `re.sub` cleaning and the string-keyed groupby + merge of `combine_flavour_nutrition` (step 5).
+
+3. `training_batches_json`:
+   - The training input read straight from the labelled JSON file: parsed, tokenized and padded every epoch.
+
+4. `candidate_losses_iterrows` / `best_target_ingredient_iterrows`:
+   - The `iterrows` loop of step 4 that scores every candidate of a recipe with the scalar loss functions.
+
+5. `stop_words_greedy_loop`:
+   - The greedy stop word loop of step 2 that re-cleans and re-matches every name for every common word.
+"""
+
+import json
+import math
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+
+from helper_functions.helper_pairing import (calculate_average_molecule_overlap, calculate_molecule_overlap_loss,
+                                             calculate_normalized_nutrition_loss)
+
+
+def resolve_top_matches_pivot(top_matches_df: pd.DataFrame, threshold: int = 90,
+                              consensus_score: int = 80) -> pd.DataFrame:
+    """
+    Picks the matching flavour row for every nutrition row from its top 3 fuzzy matches (wide pivot version).
+
+    The rules are applied in order, every row is only resolved by the first rule that applies:
+    1. Perfect match: one of the fuzz-scores is 100.
+    2. Clear match: the top 3 matches are the same flavour row and all fuzz-scores are above `consensus_score`.
+    3. Threshold match: one of the fuzz-scores is above `threshold`.
+
+    Args:
+        top_matches_df (pd.DataFrame): Long DataFrame with 'nutrition_index', 'flavour_index' and 'fuzz_score'.
+        threshold (int): The fuzz-score a match needs for rule 3. Default is 90.
+        consensus_score (int): The fuzz-score all top 3 matches need for rule 2. Default is 80.
+
+    Returns:
+        pd.DataFrame: 'nutrition_index' and 'flavour_index' of every resolved nutrition row.
+    """
+    # Sort matches by nutrition_index and fuzz_score (descending)
+    top_matches_df = top_matches_df.sort_values(
+        by=['nutrition_index', 'fuzz_score'], ascending=[True, False]
+    )
+
+    # Keep only the top 3 matches per nutrition_index
+    top_matches_df = top_matches_df.groupby('nutrition_index').head(3)
+
+    # Pivot the DataFrame to make it wide - With help of ChatGPT
+    top_matches_wide_df = top_matches_df.assign(rank=top_matches_df.groupby('nutrition_index').cumcount() + 1) \
+        .pivot(index='nutrition_index', columns='rank') \
+        .reset_index()
+
+    # Flatten the MultiIndex columns - With help of ChatGPT
+    top_matches_wide_df.columns = ['_'.join(map(str, col)).strip('_')
+                                   for col in top_matches_wide_df.columns]
+
+    # Condition 1: Perfect matches (at least 1 fuzzy-score is 100)
+    perfect_scores_df = top_matches_wide_df[
+        (top_matches_wide_df['fuzz_score_1'] == 100) |
+        (top_matches_wide_df['fuzz_score_2'] == 100) |
+        (top_matches_wide_df['fuzz_score_3'] == 100)
+    ].copy()  # Copy to avoid warning
+
+    # Determine which flavour_index corresponds to the perfect score
+    perfect_scores_df.loc[:, 'flavour_index'] = np.select(
+        condlist=[
+            perfect_scores_df['fuzz_score_1'] == 100,
+            perfect_scores_df['fuzz_score_2'] == 100,
+            perfect_scores_df['fuzz_score_3'] == 100
+        ],
+        choicelist=[
+            perfect_scores_df['flavour_index_1'],
+            perfect_scores_df['flavour_index_2'],
+            perfect_scores_df['flavour_index_3']
+        ],
+        default=None  # No perfect match found
+    )
+
+    # Create the DataFrame with nutrition_index and corresponding flavour_index (we'll use this for the next condition)
+    result_df = perfect_scores_df[['nutrition_index', 'flavour_index']]
+
+    # Remove the rows from the original df
+    top_matches_wide_df = top_matches_wide_df[~top_matches_wide_df['nutrition_index'].isin(
+        perfect_scores_df['nutrition_index'])]
+
+    # Condition 2: Clear match (= top 3 matches from same flavour-row & fuzz_scores above consensus_score)
+    same_flavour_row_df = top_matches_wide_df[
+        (top_matches_wide_df['flavour_index_1'] == top_matches_wide_df['flavour_index_2']) &
+        (top_matches_wide_df['flavour_index_2'] == top_matches_wide_df['flavour_index_3']) &
+        (top_matches_wide_df['fuzz_score_1'] > consensus_score) &
+        (top_matches_wide_df['fuzz_score_2'] > consensus_score) &
+        (top_matches_wide_df['fuzz_score_3'] > consensus_score)
+    ].copy()
+
+    same_flavour_row_extracted = same_flavour_row_df[[
+        'nutrition_index', 'flavour_index_1']]
+
+    # Rename flavour_index
+    same_flavour_row_extracted = same_flavour_row_extracted.rename(
+        columns={'flavour_index_1': 'flavour_index'})
+
+    # Add to results
+    result_df = pd.concat(
+        [result_df, same_flavour_row_extracted])
+
+    top_matches_wide_df = top_matches_wide_df[~top_matches_wide_df['nutrition_index'].isin(
+        same_flavour_row_extracted['nutrition_index'])]
+
+    # Condition 3: Any fuzz_score is greater than a certain threshold
+    fuzz_score_filtered_df = top_matches_wide_df[
+        (top_matches_wide_df['fuzz_score_1'] > threshold) |
+        (top_matches_wide_df['fuzz_score_2'] > threshold) |
+        (top_matches_wide_df['fuzz_score_3'] > threshold)
+    ].copy()
+
+    fuzz_score_filtered_df.loc[:, 'flavour_index'] = np.select(
+        condlist=[
+            fuzz_score_filtered_df['fuzz_score_1'] > threshold,
+            fuzz_score_filtered_df['fuzz_score_2'] > threshold,
+            fuzz_score_filtered_df['fuzz_score_3'] > threshold
+        ],
+        choicelist=[
+            fuzz_score_filtered_df['flavour_index_1'],
+            fuzz_score_filtered_df['flavour_index_2'],
+            fuzz_score_filtered_df['flavour_index_3']
+        ],
+        default=None  # No fuzz-score above threshold
+    )
+
+    fuzz_score_extracted = fuzz_score_filtered_df[[
+        'nutrition_index', 'flavour_index']]
+
+    return pd.concat([result_df, fuzz_score_extracted], ignore_index=True)
+
+
+def clean_ingredient_names_apply(names: pd.Series) -> pd.Series:
+    """
+    Cleans ingredient names for the join (missing names become 'nan').
+
+    Args:
+        names (pd.Series): The names to clean.
+
+    Returns:
+        pd.Series: The cleaned names, with the same index.
+    """
+    # With help of ChatGPT
+    return names.apply(lambda x: re.sub(r'[^a-zA-Z0-9\s]', '', str(x).lower().strip()))
+
+
+def combine_flavour_nutrition_merge(flavour_df: pd.DataFrame, nevo_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combines the flavour molecules and the (joined) NEVO nutrition into one dataset.
+
+    The NEVO rows are grouped per (cleaned flavour name, ID): numeric columns are averaged, the other columns
+    keep their first value. The groups are then inner-joined with the flavour rows on the cleaned name.
+
+    Args:
+        flavour_df (pd.DataFrame): The flavour dataset, with 'ingredient' and 'molecule_list' columns.
+        nevo_df (pd.DataFrame): The joined NEVO dataset, with 'flavour_name' and 'flavour_index' columns
+            (nutrient columns already numeric).
+
+    Returns:
+        pd.DataFrame: The combined dataset, with 'molecule_list' as its last column.
+
+    Notes:
+    -----
+    - Both DataFrames are modified directly: they get their cleaned name column, and 'flavour_index' of
+      `nevo_df` is renamed to 'ID'.
+    """
+    # Clean and tokenize both nutritional and flavour datasets
+    flavour_df['clean_ingredient'] = clean_ingredient_names_apply(flavour_df['ingredient'])
+    nevo_df['clean_flavour_name'] = clean_ingredient_names_apply(nevo_df['flavour_name'])
+
+    # Renaming columns and reformatting column types
+    # (ID was changed due to it causing errors. It was changed to a string)
+    nevo_df.rename(columns={'flavour_index': 'ID'}, inplace=True)
+    nevo_df['ID'] = nevo_df['ID'].dropna().astype(int).astype(str)
+
+    # Distinguishijng between columns based on the type of data in said column.
+    non_numeric_columns = nevo_df.select_dtypes(exclude='number').columns
+    numeric_columns = nevo_df.select_dtypes(include='number').columns
+
+    # grouping data in rows (based on ingredient names) - ** use was aided by ChatGPT
+    nevo_df_grouped = (
+        nevo_df.groupby(['clean_flavour_name', 'ID'], as_index=False)
+        .agg({**{col: 'first' for col in non_numeric_columns}, **{col: 'mean' for col in numeric_columns}})
+    )
+
+    # Combine the dataframes in order to have a final dataset
+    combined_df = pd.merge(
+        flavour_df,
+        nevo_df_grouped,
+        how='inner',
+        left_on='clean_ingredient',
+        right_on='clean_flavour_name'
+    )
+
+    molecules_column = combined_df.pop('molecule_list')
+    combined_df['molecule_list'] = molecules_column
+    return combined_df
+
+
+def training_batches_json(path: str, token_ids: Dict[str, int], max_length: int = 32,
+                          batch_size: int = 32) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+    """
+    Yields the training batches of a labelled JSON file, parsing and padding the recipes on the fly.
+    """
+    with open(path, 'r') as file:
+        recipes = [recipe for recipe in json.load(file) if recipe.get('best_target_ingredient')]
+
+    for start in range(0, len(recipes), batch_size):
+        batch = recipes[start:start + batch_size]
+        tokens = np.zeros((len(batch), max_length), dtype=np.int32)
+        for row, recipe in enumerate(batch):
+            names = sorted({ingredient['ingredient'].strip().lower() for ingredient in recipe['matched_ingredients']})
+            ids = [token_ids.get(name, 1) for name in names]
+            tokens[row, :len(ids[:max_length])] = ids[:max_length]
+        labels = np.array([token_ids[recipe['best_target_ingredient']['name']] for recipe in batch], dtype=np.int32)
+        total_loss = np.array([recipe['best_target_ingredient']['total_loss'] for recipe in batch], dtype=np.float32)
+        yield tokens, {'ingredient_output': labels, 'score_output': total_loss}
+
+
+def candidate_losses_iterrows(recipe: dict, combined_df: pd.DataFrame, target_macros: Dict[str, float],
+                              w_molecule: float = 0.5, w_nutrition: float = 0.5) -> List[Tuple[float, dict]]:
+    """
+    Scores every candidate of a recipe, one `iterrows` row at a time (already matched ingredients are skipped).
+
+    Args:
+        recipe (dict): A recipe with 'matched_ingredients'.
+        combined_df (pd.DataFrame): The combined dataset, with a 'molecule_set' column.
+        target_macros (Dict[str, float]): Target percentage per macro.
+        w_molecule (float): Weight of the molecule loss.
+        w_nutrition (float): Weight of the nutrition loss.
+
+    Returns:
+        List[Tuple[float, dict]]: The total loss (before rounding) and the `best_target_ingredient` dict of every
+        candidate, in row order.
+    """
+    matched_ingredients = recipe.get('matched_ingredients', [])
+    current_nutrition = {"protein": 0, "fat": 0, "carbohydrates": 0}
+    for ing in matched_ingredients:
+        if isinstance(ing, dict) and 'nutrition' in ing:
+            current_nutrition["protein"] += float(ing['nutrition'].get("PROT (g)", "0"))
+            current_nutrition["fat"] += float(ing['nutrition'].get("FAT (g)", "0"))
+            current_nutrition["carbohydrates"] += float(ing['nutrition'].get("CHO (g)", "0"))
+
+    candidates = []
+    for _, row in combined_df.iterrows():
+        ingredient_name = row['clean_ingredient']
+        ingredient_molecules = row['molecule_set']
+        if ingredient_name in [ing['ingredient'] for ing in matched_ingredients]:
+            continue
+
+        molecule_overlap = calculate_average_molecule_overlap(matched_ingredients, ingredient_molecules, combined_df)
+        molecule_loss = calculate_molecule_overlap_loss(molecule_overlap)
+
+        ingredient_nutrition = {
+            "protein": float(str(row['PROT (g)']).replace(',', '.')),
+            "fat": float(str(row['FAT (g)']).replace(',', '.')),
+            "carbohydrates": float(str(row['CHO (g)']).replace(',', '.'))
+        }
+        nutrition_loss = calculate_normalized_nutrition_loss(current_nutrition, ingredient_nutrition, target_macros)
+
+        # Apply a log transformation to both losses
+        log_molecule_loss = math.log(max(molecule_loss, 1e-10) + 1)
+        log_nutrition_loss = math.log(max(nutrition_loss, 1e-10) + 1)
+        total_loss = w_molecule * log_molecule_loss + w_nutrition * log_nutrition_loss
+
+        candidates.append((total_loss, {
+            "name": ingredient_name,
+            "ID": row['ID'],
+            "molecule_loss": round(log_molecule_loss, 10),
+            "nutrition_loss": round(log_nutrition_loss, 10),
+            "total_loss": round(total_loss, 10),
+            "nutritional_info": ingredient_nutrition,
+            "molecules": list(ingredient_molecules)
+        }))
+    return candidates
+
+
+def best_target_ingredient_iterrows(recipe: dict, combined_df: pd.DataFrame, target_macros: Dict[str, float],
+                                    w_molecule: float = 0.5, w_nutrition: float = 0.5) -> Optional[dict]:
+    """
+    The candidate with the lowest total loss (the first one on ties), or None if no loss is below inf.
+    """
+    best_ingredient = None
+    lowest_total_loss = float('inf')
+    for total_loss, candidate in candidate_losses_iterrows(recipe, combined_df, target_macros, w_molecule,
+                                                           w_nutrition):
+        if total_loss < lowest_total_loss:
+            lowest_total_loss = total_loss
+            best_ingredient = candidate
+    return best_ingredient
+
+
+def stop_words_greedy_loop(names: List[str], flavour_df: pd.DataFrame, name_columns: List[str],
+                           common_words: List[str], consensus_score: int = 70, threshold: int = 75) -> pd.DataFrame:
+    """
+    Greedily adds common words as stop words, re-cleaning and re-matching every name for every word (step 2).
+
+    Args:
+        names (List[str]): The (lowercased) NEVO food names.
+        flavour_df (pd.DataFrame): The flavour dataset.
+        name_columns (List[str]): The flavour name columns to match against.
+        common_words (List[str]): Candidate stop words, most frequent first.
+        consensus_score (int): The fuzz-score all top 3 matches need for the clear match rule. Default is 70.
+        threshold (int): The fuzz-score a match needs for the threshold rule. Default is 75.
+
+    Returns:
+        pd.DataFrame: The kept words ('stop_word') and the matches each of them added ('added_matches').
+    """
+    stop_words = []
+    added_matches = []
+    total_matches = 0
+
+    for common_word in common_words:
+
+        # Append common_word to check it's effects
+        stop_words.append(common_word)
+        pattern = r'\b(?:' + '|'.join(map(re.escape, stop_words)) + r')\b'
+        cleaned_names = [re.sub(pattern, '', name, flags=re.IGNORECASE).strip() for name in names]
+
+        # Top 3 matches of every cleaned name in every name column
+        top_matches = []
+        for idx, cleaned_name in enumerate(cleaned_names):
+            for name_column in name_columns:
+                matches = process.extract(cleaned_name, flavour_df[name_column].tolist(), limit=3,
+                                          scorer=fuzz.partial_ratio)
+                for match, score, match_index in matches:
+                    top_matches.append({'nutrition_index': idx, 'flavour_index': match_index, 'fuzz_score': score})
+
+        current_matches = len(resolve_top_matches_pivot(pd.DataFrame(top_matches), threshold, consensus_score))
+
+        # Check if removing common word has no improvement
+        if current_matches < total_matches:
+            stop_words.pop(stop_words.index(common_word))
+        else:
+            added_matches.append(current_matches - total_matches)
+            total_matches = current_matches
+
+    return pd.DataFrame({'stop_word': stop_words, 'added_matches': added_matches})
@@ -0,0 +1,402 @@
+'''
+Benchmarks the matching and pairing pipeline on synthetic data and stores the results as JSON.
+
+Usage (from the Code directory):
+    python -m benchmarks.run --scale 1k --output benchmarks/results/1k.json
+    python -m benchmarks.run --scale 10k --only fuzzy_top3 resolve_top_matches
+    python -m benchmarks.run --scale 10x --only combine_groupby_merge combine_groupby_merge_strings --memory
+    python -m benchmarks.run --scale 10k --only substitutes_batch substitutes_single
+    python -m benchmarks.run --scale 125k --only training_epoch_json training_epoch_shards
+    python -m benchmarks.run --compare benchmarks/results/before.json benchmarks/results/after.json
+
+Every benchmark is timed `--repeat` times on fresh copies of its input; the JSON keeps all timings, so
+regressions can be diffed between commits. With `--memory` every benchmark runs once more (untimed) under
+tracemalloc to record the peak of its Python allocations.
+'''
+
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+import numpy as np
+
+from benchmarks import legacy, synthetic
+from helper_functions.helper_combine import clean_ingredient_names, combine_flavour_nutrition
+from helper_functions.helper_fuzzy import FuzzyMatcher
+from helper_functions.helper_merge import clean_name, get_name_cleaner, resolve_top_matches
+from helper_functions.helper_nutrition import normalise_nutrient_columns
+from helper_functions.helper_pairing import DEFAULT_TARGET_MACROS, PairingEngine, get_molecule_list
+from helper_functions.helper_recognise import IngredientRecogniser, ingredient_aliases, recognise_recipes
+from helper_functions.helper_resolve import resolve_matches
+from helper_functions.helper_substitutes import SubstituteIndex
+from helper_functions.helper_training import build_vocabulary, export_training_shards, iter_training_batches
+
+
+# Number of recipes, NEVO rows, flavour entities and nutrient columns per scale (10k and 125k use the sizes of the
+# real datasets, 10x ten times those)
+SCALES = {
+    '1k': {'recipes': 1_000, 'nevo': 500, 'flavour': 200, 'nutrients': 10},
+    '10k': {'recipes': 10_000, 'nevo': 2_300, 'flavour': 950, 'nutrients': 10},
+    '125k': {'recipes': 125_000, 'nevo': 2_300, 'flavour': 950, 'nutrients': 10},
+    '10x': {'recipes': 10_000, 'nevo': 23_000, 'flavour': 9_500, 'nutrients': 130}
+}
+
+# name -> function(data) returning (setup, run): `setup()` builds fresh inputs, `run(inputs)` is timed
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def benchmark(function: Callable) -> Callable:
+    BENCHMARKS[function.__name__] = function
+    return function
+
+
+def make_data(scale: str, seed: int = 0) -> dict:
+    """
+    Generates the synthetic inputs of every benchmark for a scale.
+    """
+    sizes = SCALES[scale]
+    entities = synthetic.flavour_entities(sizes['flavour'], seed=seed)
+    nevo = synthetic.nevo_rows(sizes['nevo'], entities, seed=seed, n_nutrients=sizes['nutrients'])
+    joined = synthetic.nevo_joined(nevo, entities, seed=seed)
+
+    flavour_df = entities[['entity_id', 'entity_alias_readable']].copy()
+    flavour_df['entity_alias_readable'] = flavour_df['entity_alias_readable'].str.lower()
+
+    joined_numeric, _ = normalise_nutrient_columns(joined.copy())
+    combined_df = combine_flavour_nutrition(synthetic.flavour_molecules(entities), joined_numeric)
+
+    return {
+        'sizes': sizes,
+        'names': nevo['Engelse naam/Food name'].str.lower(),
+        'flavour_df': flavour_df,
+        'molecules_df': synthetic.flavour_molecules(entities),
+        'joined_df': joined,
+        'combined_df': combined_df,
+        'recipes': synthetic.recipes(sizes['recipes'], combined_df, seed=seed)
+    }
+
+
+@benchmark
+def clean_name_loop(data):
+    """`clean_name` called once per name (how the stop word search used it)."""
+    words = synthetic.STOPWORDS
+    return lambda: data['names'], lambda names: [clean_name(name, words) for name in names]
+
+
+@benchmark
+def clean_many(data):
+    """`NameCleaner.clean_many` on the whole column."""
+    cleaner = get_name_cleaner(synthetic.STOPWORDS)
+    return lambda: data['names'], cleaner.clean_many
+
+
+def _top_matches(data):
+    matcher = FuzzyMatcher(data['flavour_df'], ['entity_alias_readable'], limit=3)
+    top_matches_df = matcher.extract(data['names'])
+    top_matches_df['flavour_index'] = data['flavour_df']['entity_id'].to_numpy()[top_matches_df['flavour_index']]
+    return top_matches_df
+
+
+@benchmark
+def fuzzy_top3(data):
+    """Top 3 fuzzy matches of every NEVO name (step 3)."""
+    return lambda: data, _top_matches
+
+
+@benchmark
+def resolve_top_matches_pivot(data):
+    """Previous wide pivot and match conditions on the long top 3 table (step 3)."""
+    top_matches_df = _top_matches(data)
+    return top_matches_df.copy, legacy.resolve_top_matches_pivot
+
+
+@benchmark
+def resolve_top_matches_stage(data):
+    """`resolve_top_matches` on the long top 3 table (step 3)."""
+    top_matches_df = _top_matches(data)
+    return top_matches_df.copy, resolve_top_matches
+
+
+@benchmark
+def resolve_matches_arrays(data):
+    """`resolve_matches` on the (n, 3) arrays of `FuzzyMatcher.top_k` (step 3)."""
+    matcher = FuzzyMatcher(data['flavour_df'], ['entity_alias_readable'], limit=3)
+    labels, scores = matcher.top_k(data['names'], k=3)
+    return lambda: (labels, scores), lambda arrays: resolve_matches(*arrays)
+
+
+@benchmark
+def combine_datasets(data):
+    """Nutrient normalisation, groupby and merge of the flavour and NEVO datasets (step 5)."""
+    def setup():
+        return data['molecules_df'].copy(), data['joined_df'].copy()
+
+    def run(inputs):
+        molecules_df, joined_df = inputs
+        joined_df, _ = normalise_nutrient_columns(joined_df)
+        return combine_flavour_nutrition(molecules_df, joined_df)
+
+    return setup, run
+
+
+def _normalised_inputs(data):
+    # The nutrient columns are normalised once, so only the groupby and merge are timed
+    if 'joined_numeric_df' not in data:
+        data['joined_numeric_df'], _ = normalise_nutrient_columns(data['joined_df'].copy())
+    return lambda: (data['molecules_df'].copy(), data['joined_numeric_df'].copy())
+
+
+@benchmark
+def combine_groupby_merge(data):
+    """Only the groupby and merge of step 5 (integer keys and index lookup)."""
+    return _normalised_inputs(data), lambda inputs: combine_flavour_nutrition(*inputs)
+
+
+@benchmark
+def combine_groupby_merge_strings(data):
+    """The same with the string-keyed groupby and merge it replaced."""
+    return _normalised_inputs(data), lambda inputs: legacy.combine_flavour_nutrition_merge(*inputs)
+
+
+@benchmark
+def clean_ingredient_names_distinct(data):
+    """Cleaning the NEVO flavour names for the join (every distinct name once)."""
+    return lambda: data['joined_df']['flavour_name'], clean_ingredient_names
+
+
+@benchmark
+def clean_ingredient_names_apply(data):
+    """The same cleaning with `re.sub` per name."""
+    return lambda: data['joined_df']['flavour_name'], legacy.clean_ingredient_names_apply
+
+
+@benchmark
+def recognise_lines(data):
+    """Mapping free-text ingredient lines of every recipe to the ingredients (token trie, longest match)."""
+    recogniser = IngredientRecogniser(ingredient_aliases(data['combined_df']))
+
+    def setup():
+        return [
+            {'ingredients': [f"2 tbsp chopped {ingredient['ingredient']}s, fresh"
+                             for ingredient in recipe['matched_ingredients']]}
+            for recipe in data['recipes']
+        ]
+
+    return setup, lambda recipes: list(recognise_recipes(recipes, recogniser))
+
+
+@benchmark
+def engine_build(data):
+    """Building the `PairingEngine` (Jaccard matrix and nutrition arrays) from the combined dataset."""
+    def setup():
+        combined_df = data['combined_df'].copy()
+        combined_df['molecule_set'] = combined_df['molecule_list'].apply(get_molecule_list)
+        return combined_df
+
+    return setup, lambda combined_df: PairingEngine(combined_df, DEFAULT_TARGET_MACROS)
+
+
+@benchmark
+def recipe_scoring(data):
+    """`best_target_ingredient` for every recipe (step 4)."""
+    combined_df = data['combined_df'].copy()
+    combined_df['molecule_set'] = combined_df['molecule_list'].apply(get_molecule_list)
+    engine = PairingEngine(combined_df, DEFAULT_TARGET_MACROS)
+    return lambda: data['recipes'], lambda recipes: [engine.best_target_ingredient(recipe) for recipe in recipes]
+
+
+@benchmark
+def recipe_scoring_pruned(data):
+    """`best_target_ingredient_pruned` for every recipe (inverted index and lower bound, same result)."""
+    combined_df = data['combined_df'].copy()
+    combined_df['molecule_set'] = combined_df['molecule_list'].apply(get_molecule_list)
+    engine = PairingEngine(combined_df, DEFAULT_TARGET_MACROS)
+    return lambda: data['recipes'], \
+        lambda recipes: [engine.best_target_ingredient_pruned(recipe) for recipe in recipes]
+
+
+def _substitute_index(data) -> SubstituteIndex:
+    combined_df = data['combined_df'].copy()
+    combined_df['molecule_set'] = combined_df['molecule_list'].apply(get_molecule_list)
+    return SubstituteIndex(combined_df, nutrients='all')
+
+
+@benchmark
+def substitutes_batch(data):
+    """10 substitutes of every ingredient in one batch (nearest neighbours on all nutrients, Jaccard rerank)."""
+    index = _substitute_index(data)
+    ingredients = list(index.name_to_row)
+    return lambda: ingredients, lambda names: index.substitutes_batch(names, 10)
+
+
+@benchmark
+def substitutes_single(data):
+    """The same queries one ingredient at a time (single-query latency is `min / queries`)."""
+    index = _substitute_index(data)
+    ingredients = list(index.name_to_row)
+    return lambda: ingredients, lambda names: [index.substitutes(name, 10) for name in names]
+
+
+def _benchmark_directory() -> str:
+    # A temporary directory for benchmark files, removed when the run ends
+    directory = tempfile.mkdtemp(prefix='chefgpt_benchmark_')
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return directory
+
+
+def _training_files(data) -> dict:
+    # The labelled recipes as an indented JSON file (like step 4 writes) and as training shards, made once per run
+    if 'training_files' not in data:
+        directory = _benchmark_directory()
+        labelled = synthetic.labelled_recipes(data['recipes'], data['combined_df'])
+        vocabulary = build_vocabulary(data['combined_df']['clean_ingredient'])
+        json_path = os.path.join(directory, 'labelled.json')
+        with open(json_path, 'w') as file:
+            json.dump(labelled, file, indent=4)
+        export_training_shards(labelled, vocabulary, os.path.join(directory, 'shards'), shard_size=10_000)
+        data['training_files'] = {'labelled': labelled, 'vocabulary': vocabulary, 'json': json_path,
+                                  'shards': os.path.join(directory, 'shards'), 'directory': directory}
+    return data['training_files']
+
+
+@benchmark
+def training_export(data):
+    """Writing the labelled recipes as padded token sequences in .npz shards."""
+    files = _training_files(data)
+    output_directory = os.path.join(files['directory'], 'export')
+    return lambda: files['labelled'], \
+        lambda labelled: export_training_shards(labelled, files['vocabulary'], output_directory, shard_size=10_000)
+
+
+@benchmark
+def training_epoch_json(data):
+    """One epoch of batches of 32 from the labelled JSON file (parsed, tokenized and padded every epoch)."""
+    files = _training_files(data)
+    token_ids = {token: token_id for token_id, token in enumerate(files['vocabulary'])}
+    return lambda: files['json'], lambda path: sum(1 for _ in legacy.training_batches_json(path, token_ids))
+
+
+@benchmark
+def training_epoch_shards(data):
+    """One shuffled epoch of batches of 32 from the .npz shards."""
+    files = _training_files(data)
+    return lambda: files['shards'], lambda directory: sum(1 for _ in iter_training_batches(directory, seed=0))
+
+
+def time_benchmark(factory: Callable, data: dict, repeat: int, memory: bool = False) -> dict:
+    """
+    Times a benchmark `repeat` times (the setup is not timed), and optionally measures its peak memory in one
+    extra run (tracemalloc slows the run down, so it is not timed).
+    """
+    setup, run = factory(data)
+    timings = []
+    for _ in range(repeat):
+        inputs = setup()
+        start = time.perf_counter()
+        run(inputs)
+        timings.append(time.perf_counter() - start)
+    result = {
+        'timings': timings,
+        'min': min(timings),
+        'median': float(np.median(timings)),
+        'description': factory.__doc__
+    }
+
+    if memory:
+        inputs = setup()
+        tracemalloc.start()
+        try:
+            run(inputs)
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_benchmarks(scale: str, only=None, repeat: int = 3, seed: int = 0, memory: bool = False) -> dict:
+    """
+    Runs the (selected) benchmarks for a scale.
+
+    Returns:
+        dict: The environment ('commit', 'python', 'numpy', ...), the sizes and a result per benchmark.
+    """
+    data = make_data(scale, seed)
+    results = {}
+    for name, factory in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        results[name] = time_benchmark(factory, data, repeat, memory)
+        peak = f"  peak {results[name]['peak_mb']:8.1f} MB" if memory else ''
+        print(f"{name:34s} min {results[name]['min'] * 1000:10.1f} ms  "
+              f"median {results[name]['median'] * 1000:10.1f} ms{peak}")
+
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'scale': scale,
+        'seed': seed,
+        'sizes': data['sizes'],
+        'results': results
+    }
+
+
+def compare(before_path: str, after_path: str):
+    """
+    Prints the change of the minimum timing of every benchmark between two result files.
+    """
+    with open(before_path, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(after_path, encoding='utf-8') as f:
+        after = json.load(f)
+
+    print(f"{before['commit']} ({before['scale']}) -> {after['commit']} ({after['scale']})")
+    for name, result in after['results'].items():
+        if name not in before['results']:
+            continue
+        old, new = before['results'][name]['min'], result['min']
+        print(f"{name:34s} {old * 1000:10.1f} ms -> {new * 1000:10.1f} ms  ({old / new:5.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic data.")
+    parser.add_argument("--scale", choices=list(SCALES), default='1k')
+    parser.add_argument("--only", nargs='+', choices=list(BENCHMARKS), help="Only run these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory", action='store_true', help="Also measure the peak memory of every benchmark")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run_benchmarks(args.scale, args.only, args.repeat, args.seed, args.memory)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+This file contains deterministic generators of synthetic pipeline data, so the benchmarks run offline:
+
+1. `flavour_entities`:
+   - FlavourDB-like entities (entity_id, entity_alias_readable, synonyms, category) with molecule lists.
+
+2. `nevo_rows` / `nevo_joined`:
+   - NEVO-like food rows (names built from the flavour entities plus stopwords, nutrient columns that mix
+     decimal commas and points), and the same rows after they were joined with the flavour entities.
+
+3. `flavour_molecules`:
+   - The 'flavourDB2_molecules.csv' shape (ingredient, entity_id, molecule_list).
+
+4. `recipes` / `labelled_recipes`:
+   - Recipes with 'matched_ingredients' (name and nutrition) drawn from a combined dataset, and the same recipes
+     with a random 'best_target_ingredient' (name and losses), shaped like the output of step 4.
+
+The same arguments (and seed) always give the same data.
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+FOODS = [
+    'apple', 'banana', 'butter', 'peanut', 'chicken', 'beef', 'pork', 'salmon', 'tuna', 'shrimp', 'rice', 'wheat',
+    'oat', 'barley', 'corn', 'potato', 'tomato', 'onion', 'garlic', 'carrot', 'cabbage', 'spinach', 'lettuce',
+    'cucumber', 'pepper', 'mushroom', 'lemon', 'orange', 'grape', 'strawberry', 'raspberry', 'cherry', 'peach',
+    'pear', 'plum', 'mango', 'pineapple', 'coconut', 'almond', 'walnut', 'hazelnut', 'cashew', 'milk', 'cheese',
+    'yogurt', 'cream', 'egg', 'honey', 'sugar', 'cocoa', 'coffee', 'tea', 'vanilla', 'cinnamon', 'ginger', 'basil',
+    'oregano', 'thyme', 'rosemary', 'parsley', 'mint', 'bean', 'lentil', 'pea', 'soy', 'sesame', 'olive', 'avocado'
+]
+QUALIFIERS = [
+    'green', 'red', 'black', 'white', 'sweet', 'wild', 'sour', 'smoked', 'roasted', 'dried', 'brown', 'yellow'
+]
+STOPWORDS = [
+    'raw', 'boiled', 'fried', 'canned', 'fresh', 'frozen', 'salted', 'unsalted', 'with skin', 'without skin',
+    'average', 'prepared', 'low fat', 'whole', 'sliced', 'in oil'
+]
+CATEGORIES = ['fruit', 'vegetable', 'meat', 'fish', 'dairy', 'cereal', 'nut', 'spice', 'herb', 'beverage']
+NUTRIENT_COLUMNS = ['ENERCC (kcal)', 'WATER (g)', 'PROT (g)', 'FAT (g)', 'CHO (g)', 'SUGAR (g)', 'FIBT (g)',
+                    'NA (mg)', 'CA (mg)', 'VITC (mg)']
+
+
+def _entity_names(n: int) -> List[str]:
+    # Single foods first, then qualified and compound names ('peanut butter'), numbered once those run out
+    names = list(FOODS)
+    names += [f'{qualifier} {food}' for qualifier in QUALIFIERS for food in FOODS]
+    names += [f'{first} {second}' for first in FOODS for second in FOODS if first != second]
+    names += [f'{names[i % len(names)]} {i // len(names) + 1}' for i in range(max(0, n - len(names)))]
+    return names[:n]
+
+
+def flavour_entities(n: int = 950, n_molecules: int = 2000, seed: int = 0) -> pd.DataFrame:
+    """
+    Generates FlavourDB-like entities.
+
+    Args:
+        n (int): Number of entities.
+        n_molecules (int): Size of the molecule vocabulary.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: 'entity_id', 'entity_alias_readable', 'entity_alias_synonyms', 'category', 'molecule_list'.
+    """
+    rng = np.random.default_rng(seed)
+    names = _entity_names(n)
+
+    # Molecule counts are skewed like in FlavourDB: most entities have few molecules, some have hundreds
+    counts = np.clip(rng.lognormal(3.5, 1.0, n).astype(int), 1, n_molecules)
+    popularity = 1 / np.arange(1, n_molecules + 1)
+    popularity /= popularity.sum()
+    molecule_lists = [
+        ', '.join(f'molecule {m}' for m in rng.choice(n_molecules, count, replace=False, p=popularity))
+        for count in counts
+    ]
+
+    return pd.DataFrame({
+        'entity_id': np.arange(n) + 1,
+        'entity_alias_readable': [name.title() for name in names],
+        'entity_alias_synonyms': [[name, name.replace(' ', '')] for name in names],
+        'category': rng.choice(CATEGORIES, n),
+        'molecule_list': molecule_lists
+    })
+
+
+def nevo_rows(n: int, entities: pd.DataFrame, seed: int = 0, comma_fraction: float = 0.3,
+              n_nutrients: int = len(NUTRIENT_COLUMNS)) -> pd.DataFrame:
+    """
+    Generates NEVO-like food rows whose names are based on the flavour entities.
+
+    Args:
+        n (int): Number of rows.
+        entities (pd.DataFrame): Entities from `flavour_entities`.
+        seed (int): Random seed.
+        comma_fraction (float): Fraction of the nutrient values written with a decimal comma (as strings).
+        n_nutrients (int): Number of nutrient columns; beyond `NUTRIENT_COLUMNS` they are numbered (NEVO has
+            about 130).
+
+    Returns:
+        pd.DataFrame: 'Food group', 'NEVO-code', 'Engelse naam/Food name' and the nutrient columns.
+    """
+    rng = np.random.default_rng(seed)
+    base = entities['entity_alias_readable'].str.lower().to_numpy()[rng.integers(0, len(entities), n)]
+    names = []
+    for name in base:
+        words = list(rng.choice(STOPWORDS, rng.integers(0, 3), replace=False))
+        names.append(' '.join([name.capitalize()] + words))
+
+    df = pd.DataFrame({
+        'Food group': rng.choice(CATEGORIES, n),
+        'NEVO-code': np.arange(n) + 1,
+        'Engelse naam/Food name': names
+    })
+    columns = NUTRIENT_COLUMNS + [f'NUTRIENT{i} (mg)' for i in range(len(NUTRIENT_COLUMNS), n_nutrients)]
+    for column in columns[:n_nutrients]:
+        values = np.round(rng.gamma(1.5, 10, n), 1)
+        with_comma = rng.random(n) < comma_fraction
+        df[column] = [str(value).replace('.', ',') if comma else value for value, comma in zip(values, with_comma)]
+    return df
+
+
+def nevo_joined(nevo_df: pd.DataFrame, entities: pd.DataFrame, seed: int = 0,
+                matched_fraction: float = 0.7) -> pd.DataFrame:
+    """
+    Adds 'flavour_index' and 'flavour_name' (like 'NEVO_Joined_cleaned.csv') to NEVO-like rows.
+
+    Rows are matched to the entity their name was generated from; the others stay unmatched (NaN).
+    """
+    rng = np.random.default_rng(seed)
+    names = entities['entity_alias_readable'].str.lower()
+    entity_by_name = dict(zip(names, entities['entity_id']))
+    readable_by_id = dict(zip(entities['entity_id'], entities['entity_alias_readable']))
+
+    # Longest entity name that starts the food name (prefixes are looked up, so this scales to large datasets)
+    flavour_index = []
+    for food_name in nevo_df['Engelse naam/Food name'].str.lower():
+        prefixes = (food_name[:length] for length in range(len(food_name), 0, -1))
+        match = next((prefix for prefix in prefixes if prefix in entity_by_name), None)
+        flavour_index.append(entity_by_name[match] if match and rng.random() < matched_fraction else np.nan)
+
+    df = nevo_df.copy()
+    df['flavour_index'] = flavour_index
+    df['flavour_name'] = df['flavour_index'].map(readable_by_id)
+    return df
+
+
+def flavour_molecules(entities: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the entities in the 'flavourDB2_molecules.csv' shape: 'ingredient', 'entity_id', 'molecule_list'.
+    """
+    return pd.DataFrame({
+        'ingredient': entities['entity_alias_readable'],
+        'entity_id': entities['entity_id'],
+        'molecule_list': entities['molecule_list']
+    })
+
+
+def recipes(n: int, combined_df: pd.DataFrame, seed: int = 0, max_ingredients: int = 12) -> List[dict]:
+    """
+    Generates recipes from the ingredients of a combined dataset.
+
+    Args:
+        n (int): Number of recipes.
+        combined_df (pd.DataFrame): The combined dataset (with 'clean_ingredient').
+        seed (int): Random seed.
+        max_ingredients (int): Maximum number of matched ingredients per recipe.
+
+    Returns:
+        List[dict]: Recipes with 'title' and 'matched_ingredients' (ingredient name and nutrition strings).
+    """
+    rng = np.random.default_rng(seed)
+    names = combined_df['clean_ingredient'].unique()
+    amounts = np.round(rng.gamma(1.2, 3, (n, max_ingredients, 3)), 2).astype(str)
+    counts = rng.integers(1, max_ingredients + 1, n)
+
+    result = []
+    for number, count in enumerate(counts):
+        ingredients = rng.choice(names, count)
+        result.append({
+            'title': f'recipe {number}',
+            'matched_ingredients': [
+                {
+                    'ingredient': ingredient,
+                    'nutrition': dict(zip(['PROT (g)', 'FAT (g)', 'CHO (g)'], amounts[number, position]))
+                }
+                for position, ingredient in enumerate(ingredients)
+            ]
+        })
+    return result
+
+
+def labelled_recipes(recipes: List[dict], combined_df: pd.DataFrame, seed: int = 0) -> List[dict]:
+    """
+    Adds a random 'best_target_ingredient' (an ingredient of the combined dataset and its losses) to copies of
+    the recipes.
+    """
+    rng = np.random.default_rng(seed)
+    names = combined_df['clean_ingredient'].unique()
+    targets = rng.choice(names, len(recipes))
+    losses = np.round(rng.random((len(recipes), 2)), 10)
+
+    return [
+        {
+            **recipe,
+            'best_target_ingredient': {
+                'name': target,
+                'molecule_loss': molecule_loss,
+                'nutrition_loss': nutrition_loss,
+                'total_loss': round(0.5 * molecule_loss + 0.5 * nutrition_loss, 10)
+            }
+        }
+        for recipe, target, (molecule_loss, nutrition_loss) in zip(recipes, targets.tolist(), losses.tolist())
+    ]
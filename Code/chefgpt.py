@@ -0,0 +1,258 @@
+'''
+Command line entry point for the ChefGPT tools that run on top of the pipeline outputs.
+
+Usage:
+    python chefgpt.py serve --combined chefgpt/resources/combined_flavour_nutrition.csv --port 8000
+    python chefgpt.py complete --recipes recipes.jsonl --output completed.jsonl --steps 3 --beam-width 4
+    python chefgpt.py run --w-nutrition 0.6
+    python chefgpt.py run pairing --dry-run
+    python chefgpt.py pair-cache --recipes recipes.jsonl --limit 100
+    python chefgpt.py recognise --recipes raw_recipes.jsonl --output matched.jsonl --flavour flavourDB2.json --workers 8
+    python chefgpt.py substitutes butter "olive oil" --k 5 --nutrients all
+    python chefgpt.py export-training --labelled updated_recipes_with_losses.json --output training_shards
+    python chefgpt.py infer --model chefgpt.keras --training training_shards --recipes recipes.jsonl --output out.jsonl
+'''
+
+import argparse
+import os
+from itertools import islice
+from helper_functions.helper_pairing import DEFAULT_TARGET_MACROS, PairingEngine
+
+
+combined_dataset_path = 'chefgpt/resources/combined_flavour_nutrition.csv'
+pair_cache_file = 'pair_overlap.f32'
+
+
+def add_engine_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--combined", default=combined_dataset_path, help="combined_flavour_nutrition.csv")
+    parser.add_argument("--w-molecule", type=float, default=0.5, help="Weight of the molecule loss")
+    parser.add_argument("--w-nutrition", type=float, default=0.5, help="Weight of the nutrition loss")
+
+
+def load_engine(args) -> PairingEngine:
+    return PairingEngine.from_csv(args.combined, DEFAULT_TARGET_MACROS, args.w_molecule, args.w_nutrition)
+
+
+def command_serve(args):
+    from helper_functions.helper_service import serve
+
+    serve(load_engine(args), args.host, args.port, args.unix, args.max_batch, args.max_wait_ms)
+
+
+def command_complete(args):
+    from helper_functions.helper_completion import complete_recipes
+    from helper_functions.helper_recipes import iter_recipes, write_jsonl
+
+    engine = load_engine(args)
+    recipes = islice(iter_recipes(args.recipes), args.limit)
+    write_jsonl(complete_recipes(engine, recipes, args.steps, args.beam_width), args.output)
+
+
+def command_pair_cache(args):
+    from helper_functions.helper_pair_cache import measure_pair_cache, molecule_pair_cache
+    from helper_functions.helper_recipes import iter_recipes
+
+    from helper_functions.helper_cache import default_cache_dir
+
+    # The disk tier lives in the cache directory of the combined dataset, unless another path (or '') is given
+    path = os.path.join(default_cache_dir(args.combined), pair_cache_file) if args.path is None else args.path
+    engine = load_engine(args)
+    cache = molecule_pair_cache(engine, path, args.lru_size)
+    print(measure_pair_cache(engine, cache, islice(iter_recipes(args.recipes), args.limit)))
+
+
+def command_recognise(args):
+    from helper_functions.helper_instrumentation import run_traced
+    from helper_functions.helper_stages import recognise_recipes_file
+
+    run_traced(recognise_recipes_file, args.trace, None, args.combined, args.recipes, args.output,
+               flavour_json=args.flavour, nevo_names_path=args.nevo_names, lines_field=args.lines_field,
+               workers=args.workers, chunk_size=args.chunk_size)
+
+
+def command_substitutes(args):
+    import json
+    import sys
+    from helper_functions.helper_substitutes import SubstituteIndex
+
+    index = SubstituteIndex.from_csv(args.combined, args.nutrients, args.w_nutrition, args.w_molecule, args.pool)
+    ingredients = list(args.ingredients)
+    if args.input:
+        with open(args.input, 'r') as f:
+            ingredients += [line.strip() for line in f if line.strip()]
+
+    unknown = [ingredient for ingredient in ingredients if ingredient not in index.name_to_row]
+    if unknown:
+        print(f"Unknown ingredients (not in the combined dataset): {', '.join(unknown)}", file=sys.stderr)
+    ingredients = [ingredient for ingredient in ingredients if ingredient in index.name_to_row]
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for ingredient, result in zip(ingredients, index.substitutes_batch(ingredients, args.k)):
+            substitutes = index.substitutes_dict(ingredient, result=result)
+            output.write(json.dumps({'ingredient': ingredient, 'substitutes': substitutes}) + '\n')
+    finally:
+        if args.output:
+            output.close()
+
+
+def command_export_training(args):
+    from helper_functions.helper_instrumentation import run_traced
+    from helper_functions.helper_stages import export_training_data
+
+    run_traced(export_training_data, args.trace, None, args.combined, args.labelled, args.output,
+               max_length=args.max_length, shard_size=args.shard_size)
+
+
+def command_infer(args):
+    from helper_functions.helper_instrumentation import run_traced
+    from helper_functions.helper_stages import compare_inference_file
+
+    run_traced(compare_inference_file, args.trace, None, args.combined, args.model, args.training, args.recipes,
+               args.output, DEFAULT_TARGET_MACROS, args.w_molecule, args.w_nutrition, threads=args.threads,
+               batch_size=args.batch_size, cache_size=args.cache_size)
+
+
+def command_run(args):
+    from helper_functions.helper_instrumentation import Tracer
+    from helper_functions.helper_pipeline import default_pipeline
+
+    pipeline = default_pipeline(
+        nutrition_file=args.nutrition,
+        flavour_json=args.flavour,
+        stop_words_path=args.stop_words,
+        nevo_joined_path=args.nevo_joined,
+        nevo_cleaned_path=args.nevo_cleaned,
+        flavour_molecules_path=args.flavour_molecules,
+        combined_path=args.combined,
+        nevo_names_path=args.nevo_names,
+        recipes_path=args.recipes,
+        labelled_path=args.output,
+        match_threshold=args.match_threshold,
+        w_molecule=args.w_molecule,
+        w_nutrition=args.w_nutrition,
+        stream=args.stream,
+        workers=args.workers,
+        prune=args.prune
+    )
+    tracer = Tracer()
+    pipeline.run(args.stages or None, force=args.force, dry_run=args.dry_run, tracer=tracer)
+    tracer.summary()
+    if args.trace:
+        tracer.write(args.trace)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="chefgpt", description="ChefGPT tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the ingredient suggestion service")
+    add_engine_arguments(serve_parser)
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--unix", default=None, help="Serve on this Unix socket instead of TCP")
+    serve_parser.add_argument("--max-batch", type=int, default=32, help="Maximum requests scored together")
+    serve_parser.add_argument("--max-wait-ms", type=float, default=1.0, help="Time a batch waits for requests")
+    serve_parser.set_defaults(func=command_serve)
+
+    complete_parser = commands.add_parser("complete", help="Add several ingredients per recipe with beam search")
+    add_engine_arguments(complete_parser)
+    complete_parser.add_argument("--recipes", required=True, help="JSON array or JSON Lines (.jsonl) file")
+    complete_parser.add_argument("--output", required=True, help="JSON Lines output")
+    complete_parser.add_argument("--steps", type=int, default=3, help="Ingredients added per recipe")
+    complete_parser.add_argument("--beam-width", type=int, default=4)
+    complete_parser.add_argument("--limit", type=int, default=None, help="Only complete the first N recipes")
+    complete_parser.set_defaults(func=command_complete)
+
+    run_parser = commands.add_parser("run", help="Run the pipeline, skipping the stages that are up to date")
+    run_parser.add_argument("stages", nargs='*', help="Only bring these stages (and what they need) up to date")
+    run_parser.add_argument("--force", nargs='+', default=[], help="Rerun these stages even if they are up to date")
+    run_parser.add_argument("--dry-run", action="store_true", help="Only show which stages would run and why")
+    run_parser.add_argument("--nutrition", default='NEVO2023_8.0.csv')
+    run_parser.add_argument("--flavour", default='flavourDB2.json')
+    run_parser.add_argument("--stop-words", default='stop_words.csv')
+    run_parser.add_argument("--nevo-joined", default='NEVO_Joined.csv')
+    run_parser.add_argument("--nevo-cleaned", default='chefgpt/resources/NEVO_Joined_cleaned.csv',
+                            help="The hand-cleaned join output that is combined")
+    run_parser.add_argument("--flavour-molecules", default='chefgpt/resources/flavourDB2_molecules.csv')
+    run_parser.add_argument("--combined", default=combined_dataset_path)
+    run_parser.add_argument("--nevo-names", default='chefgpt/resources/nevo_names.csv')
+    run_parser.add_argument("--recipes", default='chefgpt/resources/matched_recipe_data_with_common_molecules.json')
+    run_parser.add_argument("--output", default='chefgpt/resources/updated_recipes_with_losses-huge.json',
+                            help="Labelled recipes (with --stream the .jsonl variant of this path)")
+    run_parser.add_argument("--match-threshold", type=int, default=90)
+    run_parser.add_argument("--w-molecule", type=float, default=0.5, help="Weight of the molecule loss")
+    run_parser.add_argument("--w-nutrition", type=float, default=0.5, help="Weight of the nutrition loss")
+    run_parser.add_argument("--stream", action="store_true", help="Write the labelled recipes as JSON Lines")
+    run_parser.add_argument("--workers", type=int, default=None, help="Processes used by the stages")
+    run_parser.add_argument("--prune", action="store_true",
+                            help="Use the pruned pairing search (same result; falls back to the exhaustive search "
+                                 "when most candidates share a molecule with the recipe)")
+    run_parser.add_argument("--trace", default=None, help="Write a JSON trace of the stages to this file")
+    run_parser.set_defaults(func=command_run)
+
+    pair_cache_parser = commands.add_parser(
+        "pair-cache",
+        help="Measure the pairwise molecule overlap cache (the labelling and serving engine doesn't use it)"
+    )
+    add_engine_arguments(pair_cache_parser)
+    pair_cache_parser.add_argument("--recipes", required=True, help="JSON array or JSON Lines (.jsonl) file")
+    pair_cache_parser.add_argument("--path", default=None,
+                                   help=f"File of the on-disk tier (kept between runs). Default is {pair_cache_file} "
+                                        f"in the cache directory of --combined ($CHEFGPT_CACHE_DIR or .chefgpt_cache "
+                                        f"next to it); '' keeps the cache in memory only")
+    pair_cache_parser.add_argument("--lru-size", type=int, default=100_000, help="Pairs kept in memory")
+    pair_cache_parser.add_argument("--limit", type=int, default=None, help="Only score the first N recipes")
+    pair_cache_parser.set_defaults(func=command_pair_cache)
+
+    recognise_parser = commands.add_parser("recognise", help="Map free-text ingredient lines to ingredients")
+    recognise_parser.add_argument("--combined", default=combined_dataset_path, help="combined_flavour_nutrition.csv")
+    recognise_parser.add_argument("--recipes", required=True, help="JSON array or JSON Lines (.jsonl) file")
+    recognise_parser.add_argument("--output", required=True, help="JSON Lines output")
+    recognise_parser.add_argument("--flavour", default=None, help="flavourDB2.json, to use the FlavourDB synonyms")
+    recognise_parser.add_argument("--nevo-names", default='chefgpt/resources/nevo_names.csv',
+                                  help="nevo_names.csv, to use the NEVO food names ('' to skip)")
+    recognise_parser.add_argument("--lines-field", default='ingredients', help="Field with the ingredient lines")
+    recognise_parser.add_argument("--workers", type=int, default=1, help="Processes that recognise recipes")
+    recognise_parser.add_argument("--chunk-size", type=int, default=2000, help="Recipes per chunk of a worker")
+    recognise_parser.add_argument("--trace", default=None, help="Write a JSON trace of the stages to this file")
+    recognise_parser.set_defaults(func=command_recognise)
+
+    substitutes_parser = commands.add_parser("substitutes", help="Find ingredients with a similar nutrient profile")
+    add_engine_arguments(substitutes_parser)
+    substitutes_parser.add_argument("ingredients", nargs='*', help="Ingredient names ('clean_ingredient')")
+    substitutes_parser.add_argument("--input", default=None, help="File with one ingredient per line")
+    substitutes_parser.add_argument("--output", default=None, help="JSON Lines output (default is stdout)")
+    substitutes_parser.add_argument("--k", type=int, default=10, help="Substitutes per ingredient")
+    substitutes_parser.add_argument("--nutrients", choices=['macros', 'all'], default='macros',
+                                    help="Compare PROT/FAT/CHO only, or all NEVO nutrient columns")
+    substitutes_parser.add_argument("--pool", type=int, default=50, help="Nearest ingredients that are reranked")
+    substitutes_parser.set_defaults(func=command_substitutes)
+
+    export_parser = commands.add_parser("export-training", help="Write the labelled recipes as training shards")
+    export_parser.add_argument("--combined", default=combined_dataset_path, help="combined_flavour_nutrition.csv")
+    export_parser.add_argument("--labelled", required=True, help="Labelled recipes (JSON array or JSON Lines)")
+    export_parser.add_argument("--output", required=True, help="Directory of the .npz shards")
+    export_parser.add_argument("--max-length", type=int, default=32, help="Length of the padded sequences")
+    export_parser.add_argument("--shard-size", type=int, default=50_000, help="Recipes per shard")
+    export_parser.add_argument("--trace", default=None, help="Write a JSON trace of the stages to this file")
+    export_parser.set_defaults(func=command_export_training)
+
+    infer_parser = commands.add_parser("infer", help="Suggest ingredients with the trained model (vs the exact search)")
+    add_engine_arguments(infer_parser)
+    infer_parser.add_argument("--model", required=True, help="The saved Keras model")
+    infer_parser.add_argument("--training", required=True, help="Directory of the model's training export")
+    infer_parser.add_argument("--recipes", required=True, help="JSON array or JSON Lines (.jsonl) file")
+    infer_parser.add_argument("--output", required=True, help="JSON Lines output")
+    infer_parser.add_argument("--threads", type=int, default=None, help="CPU threads of TensorFlow")
+    infer_parser.add_argument("--batch-size", type=int, default=1024, help="Recipes per model call")
+    infer_parser.add_argument("--cache-size", type=int, default=100_000, help="Ingredient sets kept in the cache")
+    infer_parser.add_argument("--trace", default=None, help="Write a JSON trace of the stages to this file")
+    infer_parser.set_defaults(func=command_infer)
+
+    return parser
+
+
+if __name__ == '__main__':
+    arguments = build_parser().parse_args()
+    arguments.func(arguments)
@@ -0,0 +1,16 @@
+'''
+Small script that converts a recipe JSON array file (e.g. updated_recipes_with_losses-huge.json)
+to JSON Lines, so it can be processed in streaming mode.
+'''
+
+import sys
+from helper_functions.helper_recipes import convert_json_to_jsonl
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python convert_recipes.py <input.json> <output.jsonl>")
+        sys.exit(1)
+
+    count = convert_json_to_jsonl(sys.argv[1], sys.argv[2])
+    print(f"Converted {count} recipes into {sys.argv[2]}")
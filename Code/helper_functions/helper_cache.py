@@ -0,0 +1,179 @@
+"""
+This file contains a small columnar cache for the (slow to parse) input files of the pipeline:
+
+1. `read_csv_cached` / `read_flavour_json_cached`:
+   - Parse a CSV or the FlavourDB JSON once, and store every column as a NumPy `.npy` file.
+   - The cache is keyed by a hash of the source file and the parse options, so it is rebuilt when either changes.
+   - Later runs load only the requested columns (numeric ones optionally memory-mapped) instead of re-parsing
+     the source.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+CACHE_FORMAT_VERSION = 1
+
+
+def default_cache_dir(source_path: str) -> str:
+    """
+    Returns the cache directory: $CHEFGPT_CACHE_DIR, or a '.chefgpt_cache' folder next to the source file.
+    """
+    return os.environ.get('CHEFGPT_CACHE_DIR') or \
+        os.path.join(os.path.dirname(os.path.abspath(source_path)), '.chefgpt_cache')
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Returns the sha256 hex digest of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_columns(df: pd.DataFrame, directory: str):
+    """
+    Stores every column of a DataFrame as a separate .npy file, plus a meta.json with the names and dtypes.
+    """
+    meta = {'version': CACHE_FORMAT_VERSION, 'n_rows': len(df), 'columns': []}
+
+    for i, column in enumerate(df.columns):
+        series = df[column]
+        file_name = f'col_{i}.npy'
+
+        # Plain NumPy columns are stored as-is (and can be memory-mapped), everything else as an object array
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind != 'O':
+            np.save(os.path.join(directory, file_name), series.to_numpy())
+            pickled = False
+        else:
+            np.save(os.path.join(directory, file_name), series.to_numpy(dtype=object), allow_pickle=True)
+            pickled = True
+
+        meta['columns'].append({'name': column, 'file': file_name, 'dtype': str(series.dtype), 'pickled': pickled})
+
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+
+def _read_columns(directory: str, columns: Optional[List[str]] = None, mmap: bool = False) -> pd.DataFrame:
+    """
+    Loads (a subset of) the columns stored by `_write_columns`. Numeric columns are memory-mapped
+    (read-only) if `mmap` is True.
+    """
+    with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+
+    stored = {column['name']: column for column in meta['columns']}
+    names = list(stored) if columns is None else list(columns)
+
+    missing = [name for name in names if name not in stored]
+    if missing:
+        raise KeyError(f"Columns not in cache: {missing}")
+
+    data = {}
+    for name in names:
+        column = stored[name]
+        path = os.path.join(directory, column['file'])
+        if column['pickled']:
+            values = pd.Series(np.load(path, allow_pickle=True), dtype=object)
+            data[name] = values if column['dtype'] == 'object' else values.astype(column['dtype'])
+        else:
+            data[name] = np.load(path, mmap_mode='r' if mmap else None)
+
+    return pd.DataFrame(data, columns=names)
+
+
+def cached_frame(source_path: str, loader: Callable[[], pd.DataFrame], options: dict,
+                 columns: Optional[List[str]] = None, cache_dir: Optional[str] = None,
+                 mmap: bool = False) -> pd.DataFrame:
+    """
+    Returns the DataFrame `loader` builds from `source_path`, using a columnar cache.
+
+    Args:
+        source_path (str): The file the DataFrame is parsed from.
+        loader (Callable[[], pd.DataFrame]): Parses the source file; only called on a cache miss.
+        options (dict): The parse options, part of the cache key (must be JSON serializable).
+        columns (Optional[List[str]]): Columns to load. Default is all columns.
+        cache_dir (Optional[str]): Where the cache is stored. Default is `default_cache_dir(source_path)`.
+        mmap (bool): Memory-map the numeric columns (read-only) instead of loading them. Default is False.
+
+    Returns:
+        pd.DataFrame: The (selected columns of the) parsed DataFrame.
+    """
+    cache_dir = cache_dir or default_cache_dir(source_path)
+
+    key = hashlib.sha256(
+        (file_hash(source_path) + json.dumps(options, sort_keys=True, default=str)).encode()
+    ).hexdigest()[:16]
+    directory = os.path.join(cache_dir, f"{os.path.basename(source_path)}-{key}")
+
+    if not os.path.exists(os.path.join(directory, 'meta.json')):
+        df = loader().reset_index(drop=True)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Write to a temporary directory first, so an interrupted run never leaves a half-written cache
+        tmp_directory = tempfile.mkdtemp(dir=cache_dir)
+        try:
+            _write_columns(df, tmp_directory)
+            os.replace(tmp_directory, directory)
+        except OSError:
+            # Another process wrote the same cache in the meantime
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            if not os.path.exists(os.path.join(directory, 'meta.json')):
+                raise
+
+    return _read_columns(directory, columns, mmap)
+
+
+def read_csv_cached(path: str, columns: Optional[List[str]] = None, cache_dir: Optional[str] = None,
+                    **read_csv_kwargs) -> pd.DataFrame:
+    """
+    Cached version of `pd.read_csv(path, **read_csv_kwargs)`.
+
+    Args:
+        path (str): The CSV file.
+        columns (Optional[List[str]]): Columns to load. Default is all columns.
+        cache_dir (Optional[str]): Where the cache is stored.
+        **read_csv_kwargs: Passed to `pd.read_csv`, e.g. `sep='|'`.
+
+    Returns:
+        pd.DataFrame: The (selected columns of the) CSV.
+    """
+    return cached_frame(
+        path,
+        lambda: pd.read_csv(path, **read_csv_kwargs),
+        {'reader': 'read_csv', **read_csv_kwargs},
+        columns,
+        cache_dir
+    )
+
+
+def read_flavour_json_cached(path: str, json_columns: List[str], columns: Optional[List[str]] = None,
+                             cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    Cached version of loading the FlavourDB JSON and keeping only `json_columns`.
+
+    Args:
+        path (str): The FlavourDB JSON file (a list of entities).
+        json_columns (List[str]): The entity fields to keep.
+        columns (Optional[List[str]]): Columns to load. Default is all of `json_columns`.
+        cache_dir (Optional[str]): Where the cache is stored.
+
+    Returns:
+        pd.DataFrame: One row per entity.
+    """
+    def loader():
+        with open(path) as file:
+            return pd.DataFrame(json.load(file), columns=json_columns)
+
+    return cached_frame(path, loader, {'reader': 'flavour_json', 'columns': list(json_columns)}, columns, cache_dir)
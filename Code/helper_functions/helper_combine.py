@@ -0,0 +1,141 @@
+"""
+This file contains the functions that combine the flavour and nutrition datasets into one dataset:
+
+1. `clean_ingredient_names`:
+   - Lowercases and strips names and removes everything that is not a letter, digit or whitespace.
+   - Used on both datasets, so their names can be joined. Every distinct name is cleaned once.
+
+2. `combine_flavour_nutrition`:
+   - Groups the joined NEVO rows per flavour ingredient and merges them with the flavour molecules.
+   - The (name, ID) keys are encoded as integers once: the other columns take their first value in one groupby
+     pass, the numeric columns are averaged as a block (in slices of `MEAN_COLUMNS_PER_PASS` columns), and the
+     flavour rows find their groups by an index lookup instead of a string merge.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Everything that is removed from a name
+NAME_NOISE_PATTERN = re.compile(r'[^a-zA-Z0-9\s]')
+
+# Numeric columns averaged per groupby call (pandas averages a float32 block as a float64 copy, so large blocks are
+# averaged in slices to bound the peak memory)
+MEAN_COLUMNS_PER_PASS = 32
+
+
+def clean_ingredient_names(names: pd.Series) -> pd.Series:
+    """
+    Cleans ingredient names for the join (missing names become 'nan').
+
+    Args:
+        names (pd.Series): The names to clean.
+
+    Returns:
+        pd.Series: The cleaned names, with the same index.
+    """
+    # Names repeat a lot (NEVO has several rows per ingredient), so only the distinct names are cleaned and the
+    # result is spread back by their codes. `str` keeps the 'nan' of missing names.
+    codes, unique_names = pd.factorize(names, use_na_sentinel=False)
+    cleaned = np.array([NAME_NOISE_PATTERN.sub('', str(name).lower().strip()) for name in unique_names], dtype=object)
+    return pd.Series(cleaned[codes], index=names.index, name=names.name)
+
+
+def _group_codes(nevo_df: pd.DataFrame):
+    """
+    Encodes the ('clean_flavour_name', 'ID') key of every row as an integer, in the order `groupby` sorts them.
+
+    Returns:
+        Tuple of the group code of every row (-1 if its name or ID is missing), the sorted unique names, and the
+        name code of every group.
+    """
+    names, ids = nevo_df['clean_flavour_name'], nevo_df['ID']
+    name_codes, unique_names = pd.factorize(names, sort=True)
+    id_codes, unique_ids = pd.factorize(ids, sort=True)
+    valid = (name_codes >= 0) & (id_codes >= 0)
+
+    combined_codes = name_codes[valid].astype(np.int64) * len(unique_ids) + id_codes[valid]
+    group_keys, valid_group_codes = np.unique(combined_codes, return_inverse=True)
+
+    group_codes = np.full(len(nevo_df), -1, dtype=np.int64)
+    group_codes[valid] = valid_group_codes
+    return group_codes, unique_names, group_keys // max(len(unique_ids), 1)
+
+
+def combine_flavour_nutrition(flavour_df: pd.DataFrame, nevo_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combines the flavour molecules and the (joined) NEVO nutrition into one dataset.
+
+    The NEVO rows are grouped per (cleaned flavour name, ID): numeric columns are averaged, the other columns
+    keep their first value. The groups are then inner-joined with the flavour rows on the cleaned name.
+
+    Args:
+        flavour_df (pd.DataFrame): The flavour dataset, with 'ingredient' and 'molecule_list' columns.
+        nevo_df (pd.DataFrame): The joined NEVO dataset, with 'flavour_name' and 'flavour_index' columns
+            (nutrient columns already numeric).
+
+    Returns:
+        pd.DataFrame: The combined dataset, with 'molecule_list' as its last column.
+
+    Notes:
+    -----
+    - Both DataFrames are modified directly: they get their cleaned name column, and 'flavour_index' of
+      `nevo_df` is renamed to 'ID'.
+    """
+    # Clean and tokenize both nutritional and flavour datasets
+    flavour_df['clean_ingredient'] = clean_ingredient_names(flavour_df['ingredient'])
+    nevo_df['clean_flavour_name'] = clean_ingredient_names(nevo_df['flavour_name'])
+
+    # Renaming columns and reformatting column types
+    # (ID was changed due to it causing errors. It was changed to a string)
+    nevo_df.rename(columns={'flavour_index': 'ID'}, inplace=True)
+    nevo_df['ID'] = nevo_df['ID'].dropna().astype(int).astype(str)
+
+    # Distinguishijng between columns based on the type of data in said column.
+    non_numeric_columns = nevo_df.select_dtypes(exclude='number').columns
+    numeric_columns = nevo_df.select_dtypes(include='number').columns
+
+    # Group on integer codes: one 'first' pass over the text columns, and 'mean' passes over slices of the numeric
+    # block. Rows with a missing name or ID form group -1, which comes first and is skipped, so they are dropped
+    # like groupby does
+    group_codes, unique_names, group_name_codes = _group_codes(nevo_df)
+    grouped = nevo_df.groupby(group_codes, sort=True)
+    first_values = grouped[list(non_numeric_columns)].first()
+    # Without numeric columns there is nothing to average, only the group index ('ID' is always a text column)
+    mean_values = pd.concat([
+        grouped[list(numeric_columns[start:start + MEAN_COLUMNS_PER_PASS])].mean()
+        for start in range(0, len(numeric_columns), MEAN_COLUMNS_PER_PASS)
+    ], axis=1) if len(numeric_columns) else pd.DataFrame(index=first_values.index)
+    skipped = int((group_codes < 0).any())
+
+    # The groups are sorted by name, so the groups of a name are a contiguous range
+    name_range = np.arange(len(unique_names))
+    starts = np.searchsorted(group_name_codes, name_range, side='left') + skipped
+    ends = np.searchsorted(group_name_codes, name_range, side='right') + skipped
+
+    # Every flavour row is repeated for each group of its name (in group order), like an inner merge
+    name_code = unique_names.get_indexer(flavour_df['clean_ingredient'])
+    counts = np.where(name_code >= 0, ends[name_code] - starts[name_code], 0)
+    left_rows = np.repeat(np.arange(len(flavour_df)), counts)
+    offsets = np.arange(len(left_rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    right_rows = starts[name_code[left_rows]] + offsets
+
+    parts = [
+        flavour_df.iloc[left_rows].reset_index(drop=True),
+        first_values.iloc[right_rows].reset_index(drop=True),
+        mean_values.iloc[right_rows].reset_index(drop=True)
+    ]
+
+    # Column names in both datasets get the same suffixes as in a merge
+    overlap = flavour_df.columns.intersection(non_numeric_columns.append(numeric_columns))
+    parts = [
+        part.rename(columns={column: f'{column}{"_x" if number == 0 else "_y"}' for column in overlap})
+        for number, part in enumerate(parts)
+    ]
+    combined_df = pd.concat(parts, axis=1)
+
+    molecules_column = combined_df.pop('molecule_list')
+    combined_df['molecule_list'] = molecules_column
+    return combined_df
@@ -0,0 +1,104 @@
+"""
+This file contains a recipe completion engine that adds several ingredients to a recipe:
+
+1. `complete_recipe`:
+   - Beam search over the same molecule overlap and macro deviation losses as the single best target ingredient.
+   - Every beam keeps a `RecipeState`, so each step is one batched scoring pass per beam instead of a rescan.
+
+2. `complete_recipes`:
+   - Completes a stream of recipes and reports the throughput in recipes per second.
+"""
+
+import time
+from typing import Iterable, Iterator
+
+from helper_functions.helper_pairing import PairingEngine, RecipeState, top_k
+
+
+def complete_recipe(engine: PairingEngine, recipe: dict, steps: int = 3, beam_width: int = 4,
+                    exclude: Iterable[str] = ()) -> dict:
+    """
+    Adds `steps` ingredients to a recipe with beam search.
+
+    A partial completion is scored by the sum of the total losses of its added ingredients, each taken at the
+    moment it was added. With `beam_width=1` this is greedy completion (the first step equals
+    `best_target_ingredient`).
+
+    Args:
+        engine (PairingEngine): The engine with the precomputed tables.
+        recipe (dict): A recipe with 'matched_ingredients'.
+        steps (int): Number of ingredients to add.
+        beam_width (int): Number of partial completions kept per step.
+        exclude (Iterable[str]): Ingredient names that should never be added.
+
+    Returns:
+        dict: 'added' (the added ingredients, in order, with their losses) and 'total_loss' (their summed loss).
+        Fewer ingredients are added if no candidate with a finite loss is left.
+    """
+    exclude = list(exclude)
+
+    # A beam is (summed loss, state, added ingredients)
+    beams = [(0.0, RecipeState(engine, recipe), [])]
+
+    for _ in range(steps):
+        expansions = []
+        for beam_number, (beam_loss, state, added) in enumerate(beams):
+            losses = state.losses(exclude)
+            for row in top_k(losses['total_loss'], beam_width):
+                expansions.append((beam_loss + losses['total_loss'][row], beam_number, int(row), losses))
+
+        if not expansions:
+            break
+
+        # Keep the best expansions, skipping ones that add the same set of ingredients in another order
+        expansions.sort(key=lambda expansion: expansion[:3])
+        new_beams, seen = [], set()
+        for loss, beam_number, row, losses in expansions:
+            _, state, added = beams[beam_number]
+            key = frozenset([item['index'] for item in added] + [row])
+            if key in seen:
+                continue
+            seen.add(key)
+
+            new_state = state.copy()
+            new_state.add(row)
+            new_beams.append((loss, new_state, added + [{
+                'index': row,
+                'name': engine.names[row],
+                'ID': engine.ids[row],
+                'molecule_loss': float(losses['molecule_loss'][row]),
+                'nutrition_loss': float(losses['nutrition_loss'][row]),
+                'total_loss': float(losses['total_loss'][row])
+            }]))
+            if len(new_beams) == beam_width:
+                break
+
+        beams = new_beams
+
+    best_loss, _, best_added = min(beams, key=lambda beam: beam[0])
+    return {
+        'added': [{key: value for key, value in item.items() if key != 'index'} for item in best_added],
+        'total_loss': float(best_loss)
+    }
+
+
+def complete_recipes(engine: PairingEngine, recipes: Iterable[dict], steps: int = 3, beam_width: int = 4,
+                     report_every: int = 1000) -> Iterator[dict]:
+    """
+    Adds a 'completion' (see `complete_recipe`) to every recipe, printing the throughput as it goes.
+
+    Yields:
+        dict: The recipes, with their 'completion'.
+    """
+    start = time.perf_counter()
+    count = 0
+    for recipe in recipes:
+        recipe['completion'] = complete_recipe(engine, recipe, steps, beam_width)
+        count += 1
+        if report_every and count % report_every == 0:
+            print(f"{count} recipes, {count / (time.perf_counter() - start):.1f} recipes/s")
+        yield recipe
+
+    elapsed = time.perf_counter() - start
+    if count:
+        print(f"Completed {count} recipes in {elapsed:.1f}s ({count / elapsed:.1f} recipes/s)")
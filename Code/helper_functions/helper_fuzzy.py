@@ -0,0 +1,197 @@
+"""
+This file contains a reusable fuzzy matcher for linking NEVO food names to FlavourDB entities:
+
+1. `FuzzyMatcher`:
+   - Preprocesses the FlavourDB name columns once and scores all NEVO names against them with
+     `rapidfuzz.process.cdist` (multi-threaded), instead of one `process.extract` call per name and column.
+   - Optionally uses a character n-gram blocking index so only plausible candidates are scored.
+   - Returns the same top-n long table (`nutrition_index`, `flavour_index`, `fuzz_score`, `name_column`, ...)
+     that the matching conditions in the analysis and join scripts consume, or (`top_k`) just the best k
+     matches over all name columns as (n_names, k) arrays for `resolve_matches`.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import process, fuzz  # type: ignore
+
+
+def _ngrams(text: str, n: int) -> set:
+    """
+    Returns the character n-grams of a string (the string itself if it is shorter than n).
+    """
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class FuzzyMatcher:
+    """
+    Top-n fuzzy matcher over one or more name columns of the flavour dataset.
+
+    Args:
+        flavour_df (pd.DataFrame): The flavour dataset.
+        name_columns (List[str]): The name columns to match against, in the order they are reported.
+        limit (int): Number of matches to keep per name and column. Default is 3.
+        scorer: A rapidfuzz scorer. Default is `fuzz.partial_ratio`.
+        ngram_size (Optional[int]): If set, only choices sharing a character n-gram of this size with the
+            name are scored. This is much faster, but (unlike the default exhaustive search) it can miss
+            low-scoring matches that share no n-gram at all.
+        workers (int): Threads used by `process.cdist`. Default is -1 (all cores).
+    """
+
+    def __init__(self, flavour_df: pd.DataFrame, name_columns: List[str], limit: int = 3,
+                 scorer=fuzz.partial_ratio, ngram_size: Optional[int] = None, workers: int = -1):
+        self.name_columns = list(name_columns)
+        self.limit = limit
+        self.scorer = scorer
+        self.ngram_size = ngram_size
+        self.workers = workers
+
+        # Keep only the string choices (like process.extract, missing names are skipped), with their row positions
+        self.choices: Dict[str, List[str]] = {}
+        self.positions: Dict[str, np.ndarray] = {}
+        self.blocks: Dict[str, Dict[str, List[int]]] = {}
+
+        for name_column in self.name_columns:
+            values = flavour_df[name_column].tolist()
+            positions = [i for i, value in enumerate(values) if isinstance(value, str)]
+
+            self.choices[name_column] = [values[i] for i in positions]
+            self.positions[name_column] = np.array(positions, dtype=np.int64)
+
+            if ngram_size:
+                block = defaultdict(list)
+                for choice_index, choice in enumerate(self.choices[name_column]):
+                    for gram in _ngrams(choice, ngram_size):
+                        block[gram].append(choice_index)
+                self.blocks[name_column] = dict(block)
+
+    def _top_n(self, scores: np.ndarray):
+        """
+        Picks the top-n choices per row: highest score first, lowest index first on ties (like process.extract).
+        """
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :self.limit]
+        return order, np.take_along_axis(scores, order, axis=1)
+
+    def _match_column(self, names: List[str], name_column: str, chunk_size: int):
+        """
+        Scores all names against one name column.
+
+        Returns:
+            Tuple of (choice index, score) arrays of shape (n_names, limit); missing entries are -1 / NaN.
+        """
+        choices = self.choices[name_column]
+        indices = np.full((len(names), self.limit), -1, dtype=np.int64)
+        scores = np.full((len(names), self.limit), np.nan)
+
+        valid_rows = [i for i, name in enumerate(names) if isinstance(name, str)]
+
+        if not self.ngram_size:
+            # Score the whole names x choices matrix in chunks, using all cores
+            for start in range(0, len(valid_rows), chunk_size):
+                rows = valid_rows[start:start + chunk_size]
+                matrix = process.cdist([names[i] for i in rows], choices, scorer=self.scorer,
+                                       dtype=np.float64, workers=self.workers)
+                order, top_scores = self._top_n(matrix)
+                width = order.shape[1]
+                indices[rows, :width] = order
+                scores[rows, :width] = top_scores
+            return indices, scores
+
+        # Blocking: only score the choices that share an n-gram with the name
+        block = self.blocks[name_column]
+        for row in valid_rows:
+            candidates = sorted({
+                choice_index
+                for gram in _ngrams(names[row], self.ngram_size)
+                for choice_index in block.get(gram, ())
+            })
+            if not candidates:
+                continue
+
+            matrix = process.cdist([names[row]], [choices[i] for i in candidates], scorer=self.scorer,
+                                   dtype=np.float64, workers=1)
+            order, top_scores = self._top_n(matrix)
+            width = order.shape[1]
+            indices[row, :width] = np.asarray(candidates)[order[0]]
+            scores[row, :width] = top_scores[0]
+
+        return indices, scores
+
+    def extract(self, names, chunk_size: int = 1024) -> pd.DataFrame:
+        """
+        Finds the top-n matches for every name in every name column.
+
+        Args:
+            names: The (cleaned) NEVO names, e.g. a pandas Series or list.
+            chunk_size (int): Number of names scored per `cdist` call.
+
+        Returns:
+            pd.DataFrame: Long table with one row per match, ordered by name, name column and rank, with the
+            columns 'nutrition_index', 'nutrition_name', 'flavour_index' (row position in `flavour_df`),
+            'flavour_name', 'fuzz_score' and 'name_column'.
+        """
+        names = list(names)
+
+        frames = []
+        for column_number, name_column in enumerate(self.name_columns):
+            indices, scores = self._match_column(names, name_column, chunk_size)
+            nutrition_index, rank = np.nonzero(indices >= 0)
+            choice_index = indices[nutrition_index, rank]
+
+            frames.append(pd.DataFrame({
+                'nutrition_index': nutrition_index,
+                'nutrition_name': [names[i] for i in nutrition_index],
+                'flavour_index': self.positions[name_column][choice_index],
+                'flavour_name': [self.choices[name_column][i] for i in choice_index],
+                'fuzz_score': scores[nutrition_index, rank],
+                'name_column': name_column,
+                '_column_number': column_number,
+                '_rank': rank
+            }))
+
+        # Same row order as looping over names, then columns, then matches
+        top_matches_df = pd.concat(frames, ignore_index=True) \
+            .sort_values(['nutrition_index', '_column_number', '_rank'], kind='stable') \
+            .drop(columns=['_column_number', '_rank']) \
+            .reset_index(drop=True)
+
+        return top_matches_df
+
+    def top_k(self, names, k: int = 3, chunk_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k best matches of every name over all name columns, without building the long table.
+
+        Gives the same matches as `top_k_arrays(self.extract(names), len(names), k)`: highest score first, and
+        on ties the order of the long table (name column, then rank).
+
+        Args:
+            names: The (cleaned) NEVO names, e.g. a pandas Series or list.
+            k (int): Number of matches kept per name.
+            chunk_size (int): Number of names scored per `cdist` call.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Row positions in `flavour_df` (int64, -1 if missing) and scores
+            (float64, NaN if missing), both of shape (n_names, k).
+        """
+        names = list(names)
+
+        # Candidates of all name columns side by side, in the order of the long table
+        all_rows, all_scores = [], []
+        for name_column in self.name_columns:
+            indices, scores = self._match_column(names, name_column, chunk_size)
+            all_rows.append(np.where(indices >= 0, self.positions[name_column][np.maximum(indices, 0)], -1))
+            all_scores.append(scores)
+        rows = np.concatenate(all_rows, axis=1)
+        scores = np.concatenate(all_scores, axis=1)
+
+        # Stable sort on the score (missing matches last)
+        order = np.argsort(-np.nan_to_num(scores, nan=-np.inf), axis=1, kind='stable')[:, :k]
+        top_rows = np.full((len(names), k), -1, dtype=np.int64)
+        top_scores = np.full((len(names), k), np.nan)
+        top_rows[:, :order.shape[1]] = np.take_along_axis(rows, order, axis=1)
+        top_scores[:, :order.shape[1]] = np.take_along_axis(scores, order, axis=1)
+        return top_rows, top_scores
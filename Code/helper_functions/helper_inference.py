@@ -0,0 +1,225 @@
+"""
+This file contains the batched inference of the trained ChefGPT model, next to the exact loss-based search:
+
+1. `ingredient_set_key`:
+   - Hash of the normalised ingredient set of a recipe (names stripped, lowercased, distinct and sorted). Recipes
+     with the same ingredients get the same key, whatever their order or title.
+
+2. `ModelPredictor`:
+   - Scores recipes with the model in large padded batches (the tokens of the training export, see
+     helper_training), with an LRU cache of the predictions per ingredient set.
+   - The suggestion is the most probable ingredient that is not padding, unknown or already in the recipe.
+   - `ModelPredictor.load` loads a saved Keras model once, with a configurable number of CPU threads.
+     TensorFlow is only imported there, so any object with `predict_on_batch` can be used as the model.
+
+3. `compare_with_engine`:
+   - Runs the model and `PairingEngine.best_target_ingredient` ([4] Ingredient_Pairing.py) on the same recipes
+     and records, per recipe, whether they agree and how long each took.
+
+The model sees the sorted ingredient set of a recipe (like the training export), so a cached prediction is exactly
+the prediction of any recipe with the same key.
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from helper_functions.helper_instrumentation import LatencyHistogram
+from helper_functions.helper_pairing import PairingEngine
+from helper_functions.helper_training import (UNKNOWN_TOKEN, VOCABULARY_FILE, check_manifest, normalise_ingredient,
+                                              normalised_ingredients, read_manifest)
+
+
+def ingredient_set_key(ingredients: List[str]) -> str:
+    """
+    Hash of a normalised ingredient set (see `normalised_ingredients`).
+    """
+    return hashlib.sha256('\n'.join(ingredients).encode()).hexdigest()
+
+
+def configure_threads(threads: Optional[int]):
+    """
+    Sets the number of CPU threads TensorFlow uses within and between operations (before the model is loaded).
+    """
+    import tensorflow as tf
+
+    if threads:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(threads)
+
+
+class ModelPredictor:
+    """
+    Batched, cached ingredient suggestions of the trained model.
+
+    Args:
+        model: The model: `model.predict_on_batch(tokens)` returns the ingredient probabilities and the scores,
+            as a list or as a dict with 'ingredient_output' and 'score_output'.
+        vocabulary (List[str]): The token vocabulary of the training export.
+        max_length (int): Length of the padded token sequences the model was trained on.
+        batch_size (int): Recipes per model call.
+        cache_size (int): Maximum number of ingredient sets whose prediction is kept.
+    """
+
+    def __init__(self, model, vocabulary: List[str], max_length: int, batch_size: int = 1024,
+                 cache_size: int = 100_000):
+        self.model = model
+        self.vocabulary = vocabulary
+        self.token_ids = {token: token_id for token_id, token in enumerate(vocabulary)}
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.cache: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, model_path: str, training_directory: str, threads: Optional[int] = None,
+             batch_size: int = 1024, cache_size: int = 100_000) -> 'ModelPredictor':
+        """
+        Loads a saved Keras model and the vocabulary of its training export.
+
+        Raises a ValueError if the export was encoded differently from the current code (see `check_manifest`).
+
+        Args:
+            model_path (str): The saved model ('.keras' file or SavedModel directory).
+            training_directory (str): The training export ('vocabulary.json' and 'manifest.json').
+            threads (Optional[int]): CPU threads of TensorFlow. Default is TensorFlow's choice (all cores).
+            batch_size (int): Recipes per model call.
+            cache_size (int): Maximum number of cached ingredient sets.
+        """
+        # The export is checked before TensorFlow loads the (much larger) model
+        manifest = read_manifest(training_directory)
+        check_manifest(manifest)
+        with open(os.path.join(training_directory, VOCABULARY_FILE), 'r') as file:
+            vocabulary = json.load(file)
+
+        import tensorflow as tf
+
+        configure_threads(threads)
+        model = tf.keras.models.load_model(model_path, compile=False)
+        return cls(model, vocabulary, manifest['max_length'], batch_size, cache_size)
+
+    def encode(self, ingredient_sets: List[List[str]]) -> np.ndarray:
+        """
+        Pads the tokens of normalised ingredient sets into one int32 batch (later ingredients are cut off).
+        """
+        unknown = self.token_ids[UNKNOWN_TOKEN]
+        tokens = np.zeros((len(ingredient_sets), self.max_length), dtype=np.int32)
+        for row, ingredients in enumerate(ingredient_sets):
+            ids = [self.token_ids.get(ingredient, unknown) for ingredient in ingredients[:self.max_length]]
+            tokens[row, :len(ids)] = ids
+        return tokens
+
+    def _predict_batch(self, ingredient_sets: List[List[str]]) -> List[Optional[dict]]:
+        tokens = self.encode(ingredient_sets)
+        outputs = self.model.predict_on_batch(tokens)
+        if isinstance(outputs, dict):
+            probabilities, scores = outputs['ingredient_output'], outputs['score_output']
+        else:
+            probabilities, scores = outputs
+        probabilities = np.array(probabilities, dtype=np.float64)
+        scores = np.asarray(scores, dtype=np.float64).reshape(len(tokens), -1)[:, 0]
+
+        # Padding, unknown and the recipe's own ingredients can't be suggested
+        probabilities[:, :self.token_ids[UNKNOWN_TOKEN] + 1] = -np.inf
+        np.put_along_axis(probabilities, tokens, -np.inf, axis=1)
+        best = probabilities.argmax(axis=1)
+
+        return [
+            {
+                'name': self.vocabulary[token],
+                'probability': float(probabilities[row, token]),
+                'score': float(scores[row])
+            } if np.isfinite(probabilities[row, token]) else None
+            for row, token in enumerate(best)
+        ]
+
+    def predict(self, recipes: List[dict]) -> List[Optional[dict]]:
+        """
+        Suggests an ingredient for every recipe.
+
+        The ingredient sets that are not cached are scored together in batches of `batch_size`.
+
+        Returns:
+            List[Optional[dict]]: Per recipe the suggestion ('name', 'probability' and the predicted 'score',
+            i.e. total loss), or None if every ingredient of the vocabulary is already in the recipe.
+        """
+        ingredient_sets = [normalised_ingredients(recipe) for recipe in recipes]
+        keys = [ingredient_set_key(ingredients) for ingredients in ingredient_sets]
+
+        # Every distinct uncached set is scored once, even if several recipes of the batch share it
+        missing = {}
+        for key, ingredients in zip(keys, ingredient_sets):
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+            elif key in missing:
+                self.hits += 1
+            else:
+                self.misses += 1
+                missing[key] = ingredients
+
+        predictions = {key: self.cache[key] for key in keys if key in self.cache}
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch_keys = missing_keys[start:start + self.batch_size]
+            for key, prediction in zip(batch_keys, self._predict_batch([missing[key] for key in batch_keys])):
+                predictions[key] = prediction
+                self.cache[key] = prediction
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+        return [predictions[key] for key in keys]
+
+    def cache_stats(self) -> dict:
+        return {'cache_hits': self.hits, 'cache_misses': self.misses, 'cached_sets': len(self.cache)}
+
+
+def compare_with_engine(recipes: Iterable[dict], predictor: ModelPredictor, engine: PairingEngine,
+                        model_latency: LatencyHistogram, engine_latency: LatencyHistogram,
+                        batch_size: Optional[int] = None) -> Iterator[dict]:
+    """
+    Adds the model's suggestion ('model_target_ingredient') and the exact 'best_target_ingredient' to every recipe.
+
+    The model scores the recipes a batch at a time, so its latency per recipe is the batch time divided by the
+    number of recipes in the batch. The engine's latency is measured per recipe.
+
+    Args:
+        recipes (Iterable[dict]): Recipes with 'matched_ingredients' (read lazily).
+        predictor (ModelPredictor): The model.
+        engine (PairingEngine): The exact loss-based search.
+        model_latency (LatencyHistogram): Records the model's time per recipe.
+        engine_latency (LatencyHistogram): Records the engine's time per recipe.
+        batch_size (Optional[int]): Recipes read per model call. Default is the predictor's batch size.
+
+    Yields:
+        dict: The recipes, with 'model_target_ingredient', 'best_target_ingredient' and 'agree' (same name).
+    """
+    recipes = iter(recipes)
+    batch_size = batch_size or predictor.batch_size
+    while True:
+        batch = list(islice(recipes, batch_size))
+        if not batch:
+            return
+
+        start = time.perf_counter_ns()
+        predictions = predictor.predict(batch)
+        per_recipe_ns = (time.perf_counter_ns() - start) // len(batch)
+
+        for recipe, prediction in zip(batch, predictions):
+            model_latency.record_ns(per_recipe_ns)
+            with engine_latency.time():
+                best = engine.best_target_ingredient(recipe)
+            recipe['model_target_ingredient'] = prediction
+            recipe['best_target_ingredient'] = best
+            recipe['agree'] = (prediction is not None and best is not None
+                               and prediction['name'] == normalise_ingredient(best['name']))
+            yield recipe
+
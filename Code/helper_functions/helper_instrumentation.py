@@ -0,0 +1,233 @@
+"""
+This file contains the instrumentation shared by the pipeline stages:
+
+1. `LatencyHistogram`:
+   - Counts per-item latencies in power-of-two nanosecond buckets (one integer increment per item), and
+     estimates percentiles from the buckets. Cheap enough for the hot loops of production runs.
+
+2. `Tracer`:
+   - Records wall time, CPU time, peak RSS and row counts of every stage (`with tracer.stage(...)`), keeps the
+     latency histograms, and writes everything as a JSON trace.
+
+3. `profiled` / `run_traced`:
+   - Optionally runs a block under cProfile (a '.prof' dump) or pyinstrument (an '.html' report), and runs a
+     pipeline stage with a fresh tracer (used by the numbered scripts with `--trace` / `--profile`).
+"""
+
+import argparse
+import cProfile
+import json
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """
+    Returns the peak resident set size of this process (or of its finished child processes) in MB.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies with power-of-two nanosecond buckets.
+
+    Bucket b counts the latencies in [2**(b-1), 2**b) ns, so percentiles are accurate to a factor of two.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * 64
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record_ns(self, nanoseconds: int):
+        """
+        Adds one latency, in nanoseconds.
+        """
+        self.buckets[min(nanoseconds.bit_length(), 63)] += 1
+        self.count += 1
+        self.total_ns += nanoseconds
+        if nanoseconds > self.max_ns:
+            self.max_ns = nanoseconds
+
+    @contextmanager
+    def time(self):
+        """
+        Records the latency of the block.
+        """
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record_ns(time.perf_counter_ns() - start)
+
+    def timed(self, items: Iterable) -> Iterator:
+        """
+        Yields the items and records, per item, the time the consumer spent on it (until the next item is asked).
+        """
+        for item in items:
+            start = time.perf_counter_ns()
+            yield item
+            self.record_ns(time.perf_counter_ns() - start)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Returns an upper bound of the q-th percentile in ms (the upper edge of its bucket).
+        """
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(2 ** bucket, self.max_ns) / 1e6
+        return self.max_ns / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_ms': self.total_ns / self.count / 1e6 if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max_ns / 1e6,
+            'buckets': {f'<{2 ** bucket}ns': count for bucket, count in enumerate(self.buckets) if count}
+        }
+
+
+class Tracer:
+    """
+    Collects the stage records and latency histograms of a pipeline run.
+
+    Usage:
+        tracer = Tracer()
+        with tracer.stage('fuzzy_search', rows_in=len(names)) as record:
+            top_matches_df = matcher.extract(names)
+            record['rows_out'] = len(top_matches_df)
+        tracer.write('trace.json')
+    """
+
+    def __init__(self):
+        self.stages: List[dict] = []
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.start = time.time()
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None) -> Iterator[dict]:
+        """
+        Records a stage. The yielded record can be updated with 'rows_out' (or any other value).
+        """
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = time.perf_counter() - wall_start
+            record['cpu_s'] = time.process_time() - cpu_start
+            record['peak_rss_mb'] = peak_rss_mb()
+            record['peak_rss_children_mb'] = peak_rss_mb(children=True)
+            self.stages.append(record)
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        """
+        Returns the histogram with this name (created on first use).
+        """
+        if name not in self.histograms:
+            self.histograms[name] = LatencyHistogram()
+        return self.histograms[name]
+
+    def report(self) -> dict:
+        return {
+            'started': self.start,
+            'stages': self.stages,
+            'histograms': {name: histogram.to_dict() for name, histogram in self.histograms.items()}
+        }
+
+    def summary(self):
+        """
+        Prints one line per stage and per histogram.
+        """
+        for record in self.stages:
+            rows = f"{record['rows_in']} -> {record['rows_out']} rows" if record['rows_in'] is not None else ''
+            print(f"{record['stage']:24s} wall {record['wall_s']:8.2f}s  cpu {record['cpu_s']:8.2f}s  "
+                  f"peak rss {record['peak_rss_mb'] or 0:8.1f} MB  {rows}")
+        for name, histogram in self.histograms.items():
+            stats = histogram.to_dict()
+            if stats['count']:
+                print(f"{name:24s} {stats['count']} items, p50 <= {stats['p50_ms']:.3f} ms, "
+                      f"p99 <= {stats['p99_ms']:.3f} ms")
+
+    def write(self, path: str):
+        """
+        Writes the JSON trace.
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=4)
+
+
+@contextmanager
+def profiled(path: Optional[str]):
+    """
+    Profiles the block and writes the result to `path`: a pyinstrument HTML report for '.html' paths
+    (pyinstrument must be installed), a cProfile dump otherwise. Does nothing if `path` is None.
+    """
+    if path is None:
+        yield
+        return
+
+    if path.endswith('.html'):
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+def add_trace_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--trace", default=None, help="Write a JSON trace of the stages to this file")
+    parser.add_argument("--profile", default=None,
+                        help="Write a cProfile dump to this file (a pyinstrument report if it ends with .html)")
+
+
+def run_traced(stage: Callable, trace_path: Optional[str] = None, profile_path: Optional[str] = None,
+               *args, **kwargs):
+    """
+    Runs a pipeline stage with a new `Tracer`, prints the stage summary and writes the trace and profile.
+
+    Returns:
+        The return value of the stage.
+    """
+    tracer = Tracer()
+    with profiled(profile_path):
+        result = stage(*args, tracer=tracer, **kwargs)
+    tracer.summary()
+    if trace_path:
+        tracer.write(trace_path)
+    return result
@@ -1,5 +1,5 @@
 """
-This file contains two functions for processing and analyzing text data:
+This file contains functions for processing and analyzing text data:
 
 1. `find_frequent_words`:
    - Takes a pandas Series containing text data and returns the most frequent words along with their counts.
@@ -9,14 +9,25 @@ This file contains two functions for processing and analyzing text data:
    - Takes a string and a list of words (stopwords) to remove, and returns the cleaned string.
    - Useful for cleaning text data by removing irrelevant words like common stopwords.
 
-Both functions can be used in text analysis tasks, data cleaning, or feature engineering processes.
+3. `NameCleaner` / `get_name_cleaner`:
+   - Compiles the stopword pattern once (cached per list of words) and cleans a whole pandas Series at once.
+   - Useful when the same stopwords are applied to many names, like in the stop word search and the join script.
+
+4. `resolve_top_matches`:
+   - Takes the top 3 fuzzy matches of every nutrition row and picks its flavour row (perfect, clear or threshold match)
+     with the vectorized `resolve_matches`.
+   - Useful for linking the nutrition rows to the flavour dataset.
+
+These functions can be used in text analysis tasks, data cleaning, or feature engineering processes.
 """
 
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
 import pandas as pd
 import string
 from collections import Counter
+from functools import lru_cache
 import re
+from helper_functions.helper_resolve import matches_frame, resolve_matches, top_k_arrays
 
 
 def find_frequent_words(column: pd.Series, top_n: int = 10) -> List[Tuple[str, int]]:
@@ -50,12 +61,52 @@ def clean_name(name: str, removal_words: List[str]) -> str:
     Returns:
         str: The cleaned string with stopwords removed.
     """
-    # Create a regex pattern to match any stopword as a whole word
-    # With help of ChatGPT
-    pattern = r'\b(?:' + '|'.join(map(re.escape, removal_words)) + r')\b'
+    return get_name_cleaner(removal_words).clean(name)
+
+
+class NameCleaner:
+    """
+    Removes a fixed list of (stop)words from strings, with the regex pattern compiled only once.
+
+    Args:
+        removal_words (Iterable[str]): The words to remove from the strings.
+    """
+
+    def __init__(self, removal_words: Iterable[str]):
+        # Create a regex pattern to match any stopword as a whole word
+        # With help of ChatGPT
+        self.pattern = re.compile(
+            r'\b(?:' + '|'.join(map(re.escape, removal_words)) + r')\b', flags=re.IGNORECASE)
+
+    def clean(self, name: str) -> str:
+        """
+        Replaces stopwords with an empty string and strips whitespace.
+        """
+        return self.pattern.sub('', name).strip()
+
+    def clean_many(self, names: pd.Series) -> pd.Series:
+        """
+        Cleans a whole pandas Series with vectorized string operations.
+
+        Args:
+            names (pd.Series): The strings to be cleaned.
+
+        Returns:
+            pd.Series: The cleaned strings, with the same index.
+        """
+        return names.str.replace(self.pattern, '', regex=True).str.strip()
+
+
+def get_name_cleaner(removal_words: Iterable[str]) -> NameCleaner:
+    """
+    Returns a (cached) NameCleaner for a list of words, so the pattern is only compiled once per list.
+    """
+    return _cached_name_cleaner(tuple(removal_words))
+
 
-    # Replace stopwords with an empty string and strip whitespace
-    return re.sub(pattern, '', name, flags=re.IGNORECASE).strip()
+@lru_cache(maxsize=1024)
+def _cached_name_cleaner(removal_words: Tuple[str, ...]) -> NameCleaner:
+    return NameCleaner(removal_words)
 
 
 def write_common_words_to_csv(df, name='common_words.csv', n=1000):
@@ -66,7 +117,9 @@ def write_common_words_to_csv(df, name='common_words.csv', n=1000):
     common_words_df = pd.DataFrame(common_words, columns=['Word', 'Frequency'])
 
     # Write the DataFrame to a CSV file
-    common_words_df.to_csv('common_words.csv', index=False)
+    common_words_df.to_csv(name, index=False)
+
+    return common_words_df['Word'].tolist()
 
 
 def clean_nutrition_df(nutrition_df: pd.DataFrame, flavour_df: pd.DataFrame, name_columns: List[str]) -> pd.DataFrame:
@@ -101,8 +154,29 @@ def clean_nutrition_df(nutrition_df: pd.DataFrame, flavour_df: pd.DataFrame, nam
     )
 
     # Use helper function to remove stopwords
-    nutrition_df['cleaned_name'] = nutrition_df['Engelse naam/Food name'].apply(
-        lambda x: clean_name(x, list(string.punctuation))
+    nutrition_df['cleaned_name'] = get_name_cleaner(string.punctuation).clean_many(
+        nutrition_df['Engelse naam/Food name']
     )
 
     return nutrition_df
+
+
+def resolve_top_matches(top_matches_df: pd.DataFrame, threshold: int = 90) -> pd.DataFrame:
+    """
+    Picks the matching flavour row for every nutrition row from its top 3 fuzzy matches.
+
+    The rules are applied in order, every row is only resolved by the first rule that applies:
+    1. Perfect match: one of the fuzz-scores is 100.
+    2. Clear match: the top 3 matches are the same flavour row and all fuzz-scores are above 80.
+    3. Threshold match: one of the fuzz-scores is above `threshold`.
+
+    Args:
+        top_matches_df (pd.DataFrame): Long DataFrame with 'nutrition_index', 'flavour_index' and 'fuzz_score'.
+        threshold (int): The fuzz-score a match needs for rule 3. Default is 90.
+
+    Returns:
+        pd.DataFrame: 'nutrition_index', 'flavour_index' and 'rule' of every resolved nutrition row.
+    """
+    n_rows = int(top_matches_df['nutrition_index'].max()) + 1 if len(top_matches_df) else 0
+    labels, scores = top_k_arrays(top_matches_df, n_rows, k=3)
+    return matches_frame(*resolve_matches(labels, scores, consensus_score=80, threshold=threshold))
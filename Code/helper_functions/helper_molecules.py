@@ -0,0 +1,174 @@
+"""
+This file contains a compact representation of the molecules of every ingredient:
+
+1. `MoleculeIndex`:
+   - Interns every molecule name to an integer id and stores each ingredient as a packed uint64 bitset.
+   - Jaccard overlap becomes popcount(a & b) / popcount(a | b), computed against all ingredients in one call.
+
+This replaces building Python intersection/union sets for every ingredient pair.
+
+2. The inverted index of `MoleculeIndex` (molecule -> ingredient rows):
+   - `sharing_mask` marks the ingredients that share at least one molecule with a set of ingredients, by only
+     following the postings of their molecules (used to prune the pairing search).
+   - `widest_posting` is, per ingredient, the number of ingredients that have its most common molecule: a lower
+     bound on the ingredients sharing a molecule with it, known without building the mask.
+"""
+
+from typing import Dict, Iterable, List, Set
+
+import numpy as np
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """
+    Counts the set bits of packed uint64 bitsets.
+
+    Args:
+        words (np.ndarray): Bitsets of shape (..., n_words).
+
+    Returns:
+        np.ndarray: Number of set bits per bitset, shape (...).
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+
+    # Older NumPy: count per byte with a lookup table
+    as_bytes = np.ascontiguousarray(words).view(np.uint8)
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # The concatenation of np.arange(start, end) for every (start, end) pair
+    counts = ends - starts
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return offsets + np.arange(counts.sum())
+
+
+class MoleculeIndex:
+    """
+    Packed bitset index over the molecule sets of a list of ingredients.
+
+    Args:
+        molecule_sets (List[Set[str]]): The molecules of every ingredient, in row order.
+    """
+
+    def __init__(self, molecule_sets: List[Set[str]]):
+        self.vocabulary: Dict[str, int] = {}
+        for molecules in molecule_sets:
+            for molecule in molecules:
+                self.vocabulary.setdefault(molecule, len(self.vocabulary))
+
+        self.n_words = max(1, -(-len(self.vocabulary) // 64))
+        self.bits = np.zeros((len(molecule_sets), self.n_words), dtype=np.uint64)
+        for row, molecules in enumerate(molecule_sets):
+            self.bits[row] = self.encode(molecules)
+
+        self.sizes = popcount(self.bits)
+
+        # Molecule ids per row and the inverted index, both as CSR arrays: the molecules of row r are
+        # row_molecules[row_indptr[r]:row_indptr[r + 1]], the rows of molecule m are
+        # molecule_rows[molecule_indptr[m]:molecule_indptr[m + 1]] (in row order)
+        row_ids = [np.fromiter((self.vocabulary[molecule] for molecule in molecules), dtype=np.int64)
+                   for molecules in molecule_sets]
+        self.row_indptr = np.concatenate([[0], np.cumsum([len(ids) for ids in row_ids], dtype=np.int64)])
+        self.row_molecules = np.concatenate(row_ids) if row_ids else np.empty(0, dtype=np.int64)
+        entry_rows = np.repeat(np.arange(len(molecule_sets)), np.diff(self.row_indptr))
+        self.molecule_rows = entry_rows[np.argsort(self.row_molecules, kind='stable')]
+        self.molecule_indptr = np.concatenate([[0], np.cumsum(np.bincount(self.row_molecules,
+                                                                          minlength=len(self.vocabulary)))])
+
+        # Per row, the length of the longest posting list of its molecules (0 without molecules)
+        self.widest_posting = np.zeros(len(molecule_sets), dtype=np.int64)
+        np.maximum.at(self.widest_posting, entry_rows, np.diff(self.molecule_indptr)[self.row_molecules])
+
+    def __len__(self) -> int:
+        return self.bits.shape[0]
+
+    def encode(self, molecules: Iterable[str]) -> np.ndarray:
+        """
+        Packs a set of molecules into a bitset. Molecules that are not in the index are ignored.
+
+        Args:
+            molecules (Iterable[str]): Molecule names.
+
+        Returns:
+            np.ndarray: A uint64 bitset of shape (n_words,).
+        """
+        ids = np.fromiter(
+            (self.vocabulary[molecule] for molecule in set(molecules) if molecule in self.vocabulary),
+            dtype=np.int64
+        )
+        bits = np.zeros(self.n_words, dtype=np.uint64)
+        np.bitwise_or.at(bits, ids // 64, np.left_shift(np.uint64(1), (ids % 64).astype(np.uint64)))
+        return bits
+
+    def overlap(self, query: np.ndarray, extra_molecules: int = 0) -> np.ndarray:
+        """
+        Jaccard overlap of one query bitset with every ingredient in the index.
+
+        Args:
+            query (np.ndarray): A bitset from `encode` (or a row of `bits`).
+            extra_molecules (int): Query molecules that are not in the index; they only count towards the union.
+
+        Returns:
+            np.ndarray: Jaccard overlap per ingredient (float64).
+        """
+        intersection = popcount(self.bits & query)
+        union = self.sizes + (popcount(query) + extra_molecules) - intersection
+        return intersection / union
+
+    def pair_overlap(self, row_a: int, row_b: int) -> float:
+        """
+        Jaccard overlap between two ingredients in the index.
+        """
+        intersection = int(popcount(self.bits[row_a] & self.bits[row_b]))
+        return intersection / (int(self.sizes[row_a]) + int(self.sizes[row_b]) - intersection)
+
+    def overlap_molecules(self, molecules: Iterable[str]) -> np.ndarray:
+        """
+        Jaccard overlap of a set of molecule names with every ingredient in the index.
+        """
+        molecules = set(molecules)
+        unknown = sum(1 for molecule in molecules if molecule not in self.vocabulary)
+        return self.overlap(self.encode(molecules), unknown)
+
+    def sharing_mask(self, rows: Iterable[int]) -> np.ndarray:
+        """
+        Marks, through the inverted index, every ingredient that shares at least one molecule with the given rows.
+
+        Args:
+            rows (Iterable[int]): Ingredient rows.
+
+        Returns:
+            np.ndarray: Boolean mask over the ingredients (the given rows included if they have molecules).
+        """
+        rows = np.asarray(list(rows), dtype=np.int64)
+        molecules = np.zeros(len(self.vocabulary), dtype=bool)
+        molecules[self.row_molecules[_ranges(self.row_indptr[rows], self.row_indptr[rows + 1])]] = True
+        molecules = np.flatnonzero(molecules)
+
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.molecule_rows[_ranges(self.molecule_indptr[molecules], self.molecule_indptr[molecules + 1])]] = True
+        return mask
+
+    def jaccard_matrix(self, chunk_size: int = 64) -> np.ndarray:
+        """
+        Jaccard overlap between every pair of ingredients in the index.
+
+        Args:
+            chunk_size (int): Number of query rows that are broadcast against the index at once.
+
+        Returns:
+            np.ndarray: Symmetric float64 matrix of shape (n, n).
+        """
+        n = len(self)
+        matrix = np.empty((n, n), dtype=np.float64)
+        for start in range(0, n, chunk_size):
+            queries = self.bits[start:start + chunk_size, None, :]
+            intersection = popcount(self.bits[None, :, :] & queries)
+            union = self.sizes[start:start + chunk_size, None] + self.sizes[None, :] - intersection
+            matrix[start:start + chunk_size] = intersection / union
+        return matrix
@@ -0,0 +1,197 @@
+"""
+This file contains a persistent cache for pairwise molecule overlap scores:
+
+1. `PairScoreCache`:
+   - Caches the overlap of (ingredient ID, candidate ID) pairs, so popular ingredients (salt, butter, onion, ...)
+     are not recomputed for every recipe.
+   - Two tiers: a bounded in-memory LRU, and an on-disk memory-mapped triangular float32 matrix that survives
+     between runs. The disk tier is rebuilt when the IDs or the fingerprint of the scored data change.
+   - Counts memory hits, disk hits and misses, so the saved work can be reported.
+
+2. `molecule_pair_cache`:
+   - Builds a cache whose misses are computed with the bitset `MoleculeIndex` of a `PairingEngine`.
+
+3. `average_overlap_cached` / `measure_pair_cache`:
+   - The average molecule overlap of a candidate with the ingredients of a recipe, through the cache, and a
+     run over a stream of recipes that reports how many pair computations the cache saved.
+
+Scores read back from the disk tier are rounded to float32.
+
+The cache is only used by `chefgpt pair-cache`, which measures how much pair work it saves. The labelling,
+suggestion and substitute paths (`PairingEngine`) don't read it: the engine precomputes the whole Jaccard matrix
+once, so every pair is already a single lookup there.
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+import numpy as np
+
+from helper_functions.helper_pairing import PairingEngine
+
+
+class PairScoreCache:
+    """
+    Two-tier cache of symmetric pair scores.
+
+    Args:
+        ids (List[Hashable]): The ingredient IDs that can be looked up (their order defines the disk layout).
+        compute (Callable[[int, int], float]): Computes the score of two positions in `ids` on a miss.
+        path (Optional[str]): File of the on-disk tier. Default is no disk tier.
+        lru_size (int): Maximum number of pairs in the in-memory tier.
+        fingerprint (str): Identifies the data the scores are computed from (e.g. a hash of it); a disk tier
+            written for another fingerprint is rebuilt.
+    """
+
+    def __init__(self, ids: List[Hashable], compute: Callable[[int, int], float], path: Optional[str] = None,
+                 lru_size: int = 100_000, fingerprint: str = ''):
+        self.ids = list(ids)
+        self.fingerprint = fingerprint
+        self.compute = compute
+        self.lru_size = lru_size
+        self.lru: OrderedDict = OrderedDict()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+        # An ID that occurs more than once maps to its first position
+        self.positions: Dict[Hashable, int] = {}
+        for position, ingredient_id in enumerate(self.ids):
+            self.positions.setdefault(ingredient_id, position)
+
+        self.disk = self._open_disk(path) if path else None
+
+    def _open_disk(self, path: str) -> np.memmap:
+        """
+        Opens (or creates) the triangular matrix; it is recreated when the IDs or the fingerprint changed. Unknown
+        pairs are NaN.
+        """
+        n = len(self.ids)
+        size = n * (n + 1) // 2
+        meta_path = path + '.json'
+        meta = {'ids': [str(ingredient_id) for ingredient_id in self.ids], 'dtype': 'float32',
+                'fingerprint': self.fingerprint}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        valid = os.path.exists(path) and os.path.exists(meta_path)
+        if valid:
+            with open(meta_path, encoding='utf-8') as f:
+                valid = json.load(f) == meta and os.path.getsize(path) == size * 4
+
+        if valid:
+            return np.memmap(path, dtype=np.float32, mode='r+', shape=(size,))
+
+        disk = np.memmap(path, dtype=np.float32, mode='w+', shape=(size,))
+        disk[:] = np.nan
+        disk.flush()
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        return disk
+
+    def get(self, id_a: Hashable, id_b: Hashable) -> float:
+        """
+        Returns the score of a pair of ingredient IDs (in either order).
+        """
+        i, j = self.positions[id_a], self.positions[id_b]
+        if i > j:
+            i, j = j, i
+        key = j * (j + 1) // 2 + i
+
+        score = self.lru.get(key)
+        if score is not None:
+            self.counters['memory_hits'] += 1
+            self.lru.move_to_end(key)
+            return score
+
+        if self.disk is not None and not np.isnan(self.disk[key]):
+            self.counters['disk_hits'] += 1
+            score = float(self.disk[key])
+        else:
+            self.counters['misses'] += 1
+            score = float(self.compute(i, j))
+            if self.disk is not None:
+                self.disk[key] = score
+
+        self.lru[key] = score
+        if len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+        return score
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters and the hit rate.
+        """
+        lookups = sum(self.counters.values())
+        hits = self.counters['memory_hits'] + self.counters['disk_hits']
+        return {**self.counters, 'lookups': lookups, 'hit_rate': hits / lookups if lookups else None}
+
+    def flush(self):
+        """
+        Writes the disk tier to disk.
+        """
+        if self.disk is not None:
+            self.disk.flush()
+
+
+def average_overlap_cached(cache: PairScoreCache, recipe_ids: List[Hashable], candidate_id: Hashable) -> float:
+    """
+    Calculates the average molecule overlap between a candidate and the ingredients of a recipe, through the cache.
+    """
+    overlaps = [cache.get(ingredient_id, candidate_id) for ingredient_id in recipe_ids]
+    return float(np.mean(overlaps)) if overlaps else 0
+
+
+def molecule_sets_hash(molecule_sets: Iterable[Iterable[str]]) -> str:
+    """
+    Returns a sha256 hex digest of molecule sets (in order; the molecules of a set sorted).
+    """
+    digest = hashlib.sha256()
+    for molecules in molecule_sets:
+        digest.update(json.dumps(sorted(molecules)).encode())
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def molecule_pair_cache(engine: PairingEngine, path: Optional[str] = None, lru_size: int = 100_000) -> PairScoreCache:
+    """
+    Builds a molecule overlap cache keyed by the ingredient IDs of an engine.
+
+    The molecule sets of the engine are the fingerprint of the disk tier, so scores written for other molecules
+    (e.g. before the combined dataset was regenerated with the same IDs) are never read back.
+
+    Args:
+        engine (PairingEngine): The engine whose molecule sets are scored.
+        path (Optional[str]): File of the on-disk tier. Default is no disk tier.
+        lru_size (int): Maximum number of pairs in the in-memory tier.
+
+    Returns:
+        PairScoreCache: The cache.
+    """
+    return PairScoreCache(engine.ids, engine.molecule_index.pair_overlap, path, lru_size,
+                          molecule_sets_hash(engine.molecule_sets))
+
+
+def measure_pair_cache(engine: PairingEngine, cache: PairScoreCache, recipes: Iterable[dict]) -> dict:
+    """
+    Scores the molecule overlap of every candidate for every recipe through the cache (the way the scalar
+    functions loop), and checks the result against the engine's precomputed overlaps.
+
+    Returns:
+        dict: The cache stats, the number of recipes, the elapsed time and the largest difference to the engine.
+    """
+    start = time.perf_counter()
+    count = 0
+    max_difference = 0.0
+    for recipe in recipes:
+        matched_ingredients = recipe.get('matched_ingredients', [])
+        recipe_ids = [engine.ids[engine.name_to_row[ing['ingredient']]] for ing in matched_ingredients]
+        overlaps = np.array([average_overlap_cached(cache, recipe_ids, candidate_id) for candidate_id in engine.ids])
+        difference = np.abs(overlaps - engine.molecule_overlap(matched_ingredients))
+        max_difference = max(max_difference, float(difference.max()))
+        count += 1
+
+    cache.flush()
+    return {**cache.stats(), 'recipes': count, 'seconds': time.perf_counter() - start,
+            'max_difference': max_difference}
@@ -0,0 +1,659 @@
+"""
+This file contains the scoring logic used to pick a target ingredient for a recipe:
+
+1. The scalar loss functions (`calculate_molecule_overlap`, `calculate_normalized_nutrition_loss`, ...):
+   - Score a single candidate ingredient against a recipe, one pair at a time.
+   - Useful as the readable reference for how the losses are defined.
+
+2. `PairingEngine`:
+   - Precomputes a candidate x candidate Jaccard matrix and the macro-nutrient arrays once.
+   - Scores every candidate for a recipe in one batched NumPy pass and returns the same
+     `best_target_ingredient` dict as the scalar functions would.
+   - `suggest` returns the top-k candidates (with their component losses) as a structured array.
+   - `best_target_ingredient_pruned` gives the same result, but only gathers the overlaps of the candidates that
+     share molecules with the recipe, and skips the others when a lower bound on their loss shows none can win.
+     It only pays off when few candidates share a molecule: above `PRUNE_MAX_SHARING` (e.g. on the FlavourDB
+     data, where common molecules make almost every candidate share one) it falls back to the exhaustive search.
+"""
+
+import json
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+import numpy as np
+import pandas as pd
+
+from helper_functions.helper_cache import read_csv_cached
+from helper_functions.helper_molecules import MoleculeIndex
+from helper_functions.helper_nutrition import normalise_nutrient_columns
+
+
+# Nutrition columns in the combined dataset and the recipe keys they map to
+NUTRITION_COLUMNS = ['PROT (g)', 'FAT (g)', 'CHO (g)']
+MACRO_KEYS = ['protein', 'fat', 'carbohydrates']
+
+# Target macro ratio used when no other target is given
+DEFAULT_TARGET_MACROS = {"protein": 30, "fat": 20, "carbohydrates": 50}
+
+# Fraction of sharing candidates above which the pruned search falls back to the exhaustive one (measured break-even:
+# gathering the overlaps of the sharing candidates is slower than scoring all of them from about half onwards)
+PRUNE_MAX_SHARING = 0.5
+
+
+def get_molecule_list(molecule_string: str) -> Set[str]:
+    """
+    Splits a comma-separated molecule string into a set of molecule names.
+
+    Args:
+        molecule_string (str): The 'molecule_list' value of an ingredient.
+
+    Returns:
+        Set[str]: The molecules of the ingredient.
+    """
+    return set(molecule.strip() for molecule in molecule_string.split(','))
+
+
+def calculate_molecule_overlap(molecules1: Set[str], molecules2: Set[str]) -> float:
+    """
+    Calculates the Jaccard overlap between the molecules of two ingredients.
+    """
+    overlap = molecules1.intersection(molecules2)
+    return len(overlap) / len(molecules1.union(molecules2))
+
+
+def calculate_average_molecule_overlap(recipe_ingredients: List[dict], new_ingredient_molecules: Set[str],
+                                       combined_df: pd.DataFrame) -> float:
+    """
+    Calculates the average molecule overlap between a new ingredient and all ingredients of a recipe.
+    """
+    overlaps = []
+    for ing in recipe_ingredients:
+        ing_name = ing['ingredient']
+        ing_molecules = set(
+            combined_df[combined_df['clean_ingredient'] == ing_name]['molecule_set'].iloc[0])
+        overlap = calculate_molecule_overlap(
+            ing_molecules, new_ingredient_molecules)
+        overlaps.append(overlap)
+    return np.mean(overlaps) if overlaps else 0
+
+
+def calculate_molecule_overlap_loss(overlap_score: float) -> float:
+    """
+    Turns a molecule overlap score into a loss.
+    """
+    return 1 - overlap_score
+
+
+def calculate_normalized_nutrition_loss(current_nutrition: Dict[str, float], ingredient_nutrition: Dict[str, float],
+                                        target_macros: Dict[str, float]) -> float:
+    """
+    Calculates how far the macro ratio of a recipe (plus a new ingredient) deviates from the target ratio.
+
+    Args:
+        current_nutrition (Dict[str, float]): Macro totals of the recipe.
+        ingredient_nutrition (Dict[str, float]): Macros of the new ingredient.
+        target_macros (Dict[str, float]): Target percentage per macro.
+
+    Returns:
+        float: Deviation divided by the maximum deviation, or inf if the recipe has no macros at all.
+    """
+    updated_nutrition = {
+        key: current_nutrition.get(key, 0) + ingredient_nutrition.get(key, 0)
+        for key in target_macros
+    }
+    total = sum(updated_nutrition.values())
+    if total == 0:
+        return float('inf')
+    deviation = sum(abs((updated_nutrition[key] / total * 100) - target_macros[key]) for key in target_macros)
+    max_deviation = sum(target_macros.values())
+    return deviation / max_deviation
+
+
+def recipe_nutrition(matched_ingredients: List[dict]) -> Dict[str, float]:
+    """
+    Sums the macro nutrients of the matched ingredients of a recipe.
+
+    Args:
+        matched_ingredients (List[dict]): The 'matched_ingredients' of a recipe.
+
+    Returns:
+        Dict[str, float]: Totals for 'protein', 'fat' and 'carbohydrates'.
+    """
+    current_nutrition = {key: 0 for key in MACRO_KEYS}
+    for ing in matched_ingredients:
+        if isinstance(ing, dict) and 'nutrition' in ing:
+            for key, column in zip(MACRO_KEYS, NUTRITION_COLUMNS):
+                current_nutrition[key] += float(ing['nutrition'].get(column, "0"))
+    return current_nutrition
+
+
+# Fields of the suggestions returned by `PairingEngine.suggest`
+SUGGESTION_DTYPE = np.dtype([
+    ('index', np.int64),
+    ('name', object),
+    ('ID', object),
+    ('molecule_loss', np.float64),
+    ('nutrition_loss', np.float64),
+    ('total_loss', np.float64)
+])
+
+
+def top_k(losses: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the indices of the k lowest finite losses, lowest first (lowest index first on ties).
+
+    Uses `argpartition`, so only the selected candidates are sorted.
+    """
+    finite = np.isfinite(losses)
+    k = min(k, int(finite.sum()))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    if k < len(losses):
+        # Everything up to the k-th lowest loss, including all ties of the k-th one
+        kth_loss = losses[np.argpartition(losses, k - 1)[k - 1]]
+        candidates = np.flatnonzero(losses <= kth_loss)
+    else:
+        candidates = np.flatnonzero(finite)
+
+    order = np.lexsort((candidates, losses[candidates]))
+    return candidates[order[:k]]
+
+
+class PairingEngine:
+    """
+    Batched version of the scalar loss functions above.
+
+    The Jaccard overlap between every pair of candidates and the macro nutrients of every candidate
+    are computed once, so scoring a recipe is a handful of array operations instead of a loop over
+    `combined_df` per recipe ingredient.
+
+    Args:
+        combined_df (pd.DataFrame): The combined flavour/nutrition dataset, with a 'molecule_set' column.
+        target_macros (Dict[str, float]): Target percentage per macro ('protein', 'fat', 'carbohydrates').
+        w_molecule (float): Weight of the molecule loss.
+        w_nutrition (float): Weight of the nutrition loss.
+    """
+
+    def __init__(self, combined_df: pd.DataFrame, target_macros: Dict[str, float],
+                 w_molecule: float = 0.5, w_nutrition: float = 0.5):
+        self.target_macros = target_macros
+        self.w_molecule = w_molecule
+        self.w_nutrition = w_nutrition
+
+        self.names = combined_df['clean_ingredient'].tolist()
+        self.ids = combined_df['ID'].tolist()
+        self.molecule_sets = combined_df['molecule_set'].tolist()
+        self.molecule_lists = [list(molecules) for molecules in self.molecule_sets]
+
+        # Parsed once here (decimal commas included), so scoring never touches strings
+        nutrition_df, _ = normalise_nutrient_columns(combined_df[NUTRITION_COLUMNS].copy(), dtype=np.float64)
+        self.nutrition = nutrition_df.to_numpy()
+
+        # Bitset index over the molecules, used to compute all pairwise overlaps at once
+        self.molecule_index = MoleculeIndex(self.molecule_sets)
+        self.jaccard = self.molecule_index.jaccard_matrix()
+
+        self._setup()
+
+    @classmethod
+    def from_csv(cls, combined_path: str, target_macros: Dict[str, float] = None,
+                 w_molecule: float = 0.5, w_nutrition: float = 0.5) -> 'PairingEngine':
+        """
+        Builds an engine from the combined flavour/nutrition CSV (read through the columnar cache).
+
+        Args:
+            combined_path (str): Path to 'combined_flavour_nutrition.csv'.
+            target_macros (Dict[str, float]): Target percentage per macro. Default is `DEFAULT_TARGET_MACROS`.
+            w_molecule (float): Weight of the molecule loss.
+            w_nutrition (float): Weight of the nutrition loss.
+
+        Returns:
+            PairingEngine: The engine.
+        """
+        combined_df = read_csv_cached(combined_path, low_memory=False)
+        combined_df['molecule_set'] = combined_df['molecule_list'].apply(get_molecule_list)
+        return cls(combined_df, target_macros or DEFAULT_TARGET_MACROS, w_molecule, w_nutrition)
+
+    def recipe_from_names(self, ingredient_names: List[str]) -> dict:
+        """
+        Builds a recipe from ingredient names, using the macros of the dataset as their nutrition.
+
+        Raises:
+            KeyError: If a name is not a known ingredient.
+        """
+        matched_ingredients = []
+        for name in ingredient_names:
+            row = self.name_to_row[name]
+            matched_ingredients.append({
+                'ingredient': name,
+                'nutrition': dict(zip(NUTRITION_COLUMNS, self.nutrition[row].tolist()))
+            })
+        return {'matched_ingredients': matched_ingredients}
+
+    def _setup(self):
+        """
+        Derives the lookup tables from the stored attributes.
+        """
+        # A recipe ingredient is looked up by the first row with that name (like `.iloc[0]` did)
+        self.name_to_row = {}
+        self.name_rows = {}
+        for row, name in enumerate(self.names):
+            self.name_to_row.setdefault(name, row)
+            self.name_rows.setdefault(name, []).append(row)
+
+        self.target = np.array([self.target_macros[key] for key in MACRO_KEYS], dtype=float)
+        self.max_deviation = sum(self.target_macros.values())
+
+    def save(self, directory: str):
+        """
+        Stores the precomputed tables, so other processes can load them with `PairingEngine.load`.
+
+        Args:
+            directory (str): An existing directory.
+        """
+        np.save(os.path.join(directory, 'jaccard.npy'), self.jaccard)
+        np.save(os.path.join(directory, 'nutrition.npy'), self.nutrition)
+        with open(os.path.join(directory, 'engine.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'target_macros': self.target_macros,
+                'w_molecule': self.w_molecule,
+                'w_nutrition': self.w_nutrition,
+                'names': self.names,
+                'ids': self.ids,
+                'molecule_lists': self.molecule_lists
+            }, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = 'r') -> 'PairingEngine':
+        """
+        Loads an engine stored with `save`.
+
+        Args:
+            directory (str): The directory the engine was saved to.
+            mmap_mode (Optional[str]): Memory-map the arrays (read-only by default), so processes that load the
+                same directory share them instead of each holding a copy.
+
+        Returns:
+            PairingEngine: The loaded engine.
+        """
+        with open(os.path.join(directory, 'engine.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+
+        engine = cls.__new__(cls)
+        engine.target_macros = meta['target_macros']
+        engine.w_molecule = meta['w_molecule']
+        engine.w_nutrition = meta['w_nutrition']
+        engine.names = meta['names']
+        engine.ids = meta['ids']
+        engine.molecule_lists = meta['molecule_lists']
+        engine.molecule_sets = [set(molecules) for molecules in engine.molecule_lists]
+
+        engine.nutrition = np.load(os.path.join(directory, 'nutrition.npy'), mmap_mode=mmap_mode)
+        engine.jaccard = np.load(os.path.join(directory, 'jaccard.npy'), mmap_mode=mmap_mode)
+        engine.molecule_index = MoleculeIndex(engine.molecule_sets)
+
+        engine._setup()
+        return engine
+
+    def molecule_overlap(self, matched_ingredients: List[dict]) -> np.ndarray:
+        """
+        Average molecule overlap of every candidate with the ingredients of a recipe.
+        """
+        rows = [self.name_to_row[ing['ingredient']] for ing in matched_ingredients]
+        if not rows:
+            return np.zeros(len(self.names))
+
+        # Contiguous (candidate x recipe ingredient) block, so `mean` sums in the same order as np.mean(list)
+        return np.ascontiguousarray(self.jaccard[:, rows]).mean(axis=1)
+
+    def nutrition_loss(self, current_nutrition: Union[Dict[str, float], np.ndarray]) -> np.ndarray:
+        """
+        Normalized nutrition loss of every candidate when added to a recipe.
+
+        Args:
+            current_nutrition: Macro totals of the recipe, as a dict or as an array in `MACRO_KEYS` order. An
+                array of shape (recipes, 3) gives a (recipes x candidates) loss.
+        """
+        if isinstance(current_nutrition, dict):
+            current_nutrition = [current_nutrition.get(key, 0) for key in MACRO_KEYS]
+        updated = np.asarray(current_nutrition, dtype=float)[..., None, :] + self.nutrition
+        total = updated[..., 0] + updated[..., 1] + updated[..., 2]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentages = updated / total[..., None] * 100
+            deviation = np.abs(percentages - self.target)
+            loss = (deviation[..., 0] + deviation[..., 1] + deviation[..., 2]) / self.max_deviation
+
+        return np.where(total == 0, np.inf, loss)
+
+    def score(self, recipe: dict, exclude: Iterable[str] = ()) -> Dict[str, np.ndarray]:
+        """
+        Scores every candidate ingredient for a recipe.
+
+        Args:
+            recipe (dict): A recipe with 'matched_ingredients'.
+            exclude (Iterable[str]): Extra ingredient names that get a total loss of inf.
+
+        Returns:
+            Dict[str, np.ndarray]: The logged 'molecule_loss', 'nutrition_loss' and the weighted 'total_loss'
+            per candidate. Candidates already in the recipe get a total loss of inf.
+        """
+        matched_ingredients = recipe.get('matched_ingredients', [])
+
+        return self.combine_losses(
+            self.molecule_overlap(matched_ingredients),
+            self.nutrition_loss(recipe_nutrition(matched_ingredients)),
+            [ing['ingredient'] for ing in matched_ingredients] + list(exclude)
+        )
+
+    def score_batch(self, recipes: List[dict], excludes: Optional[List[Iterable[str]]] = None) -> Dict[str, np.ndarray]:
+        """
+        Scores every candidate ingredient for several recipes at once (the same values as `score` per recipe).
+
+        The Jaccard columns of all recipe ingredients are gathered in one pass and the nutrition losses of all
+        recipes are computed as one (recipes x candidates) block.
+
+        Args:
+            recipes (List[dict]): Recipes with 'matched_ingredients'.
+            excludes (Optional[List[Iterable[str]]]): Extra ingredient names per recipe that get a total loss of inf.
+
+        Returns:
+            Dict[str, np.ndarray]: 'molecule_loss', 'nutrition_loss' and 'total_loss', one row per recipe.
+
+        Raises:
+            KeyError: If a recipe ingredient is not a known ingredient.
+        """
+        matched = [recipe.get('matched_ingredients', []) for recipe in recipes]
+        rows = [[self.name_to_row[ing['ingredient']] for ing in matched_ingredients] for matched_ingredients in matched]
+
+        # One gather of the Jaccard columns the batch needs; every recipe averages its own (contiguous) columns, so
+        # the sums are taken in the same order as `molecule_overlap`
+        columns, positions = np.unique(np.array([row for recipe_rows in rows for row in recipe_rows], dtype=np.int64),
+                                       return_inverse=True)
+        block = np.ascontiguousarray(self.jaccard[:, columns])
+        molecule_overlap = np.zeros((len(recipes), len(self.names)))
+        offset = 0
+        for number, recipe_rows in enumerate(rows):
+            if recipe_rows:
+                recipe_block = np.ascontiguousarray(block[:, positions[offset:offset + len(recipe_rows)]])
+                molecule_overlap[number] = recipe_block.mean(axis=1)
+            offset += len(recipe_rows)
+
+        nutrition = np.array([[recipe_nutrition(matched_ingredients)[key] for key in MACRO_KEYS]
+                              for matched_ingredients in matched], dtype=float).reshape(len(recipes), 3)
+        losses = self.combine_losses(molecule_overlap, self.nutrition_loss(nutrition))
+
+        excludes = excludes or [()] * len(recipes)
+        for number, (matched_ingredients, exclude) in enumerate(zip(matched, excludes)):
+            excluded_names = [ing['ingredient'] for ing in matched_ingredients] + list(exclude)
+            excluded_rows = [row for name in excluded_names for row in self.name_rows.get(name, ())]
+            losses['total_loss'][number, excluded_rows] = np.inf
+        return losses
+
+    def combine_losses(self, molecule_overlap: np.ndarray, nutrition_loss: np.ndarray,
+                       excluded_names: Iterable[str] = (),
+                       candidates: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Turns the molecule overlap and nutrition loss of every candidate into the logged and weighted losses.
+
+        Args:
+            molecule_overlap (np.ndarray): Average molecule overlap per candidate.
+            nutrition_loss (np.ndarray): Normalized nutrition loss per candidate.
+            excluded_names (Iterable[str]): Ingredient names that get a total loss of inf.
+            candidates (Optional[np.ndarray]): The candidate rows the losses belong to. Default is all candidates.
+
+        Returns:
+            Dict[str, np.ndarray]: 'molecule_loss', 'nutrition_loss' and 'total_loss' per candidate.
+        """
+        molecule_loss = 1 - molecule_overlap
+
+        # Apply a log transformation to both losses
+        log_molecule_loss = np.log(np.maximum(molecule_loss, 1e-10) + 1)
+        with np.errstate(invalid='ignore'):
+            log_nutrition_loss = np.log(np.maximum(nutrition_loss, 1e-10) + 1)
+            total_loss = self.w_molecule * log_molecule_loss + self.w_nutrition * log_nutrition_loss
+
+        # Skip already matched ingredients, and never pick a candidate with a missing (NaN) loss
+        excluded_rows = [row for name in excluded_names for row in self.name_rows.get(name, ())]
+        if candidates is None:
+            total_loss[excluded_rows] = np.inf
+        else:
+            is_excluded = np.zeros(len(self.names), dtype=bool)
+            is_excluded[excluded_rows] = True
+            total_loss[is_excluded[candidates]] = np.inf
+        total_loss[np.isnan(total_loss)] = np.inf
+
+        return {
+            'molecule_loss': log_molecule_loss,
+            'nutrition_loss': log_nutrition_loss,
+            'total_loss': total_loss,
+        }
+
+    def candidate_info(self, index: int, losses: Dict[str, np.ndarray]) -> dict:
+        """
+        Builds the `best_target_ingredient` dict for one candidate.
+        """
+        return {
+            "name": self.names[index],
+            "ID": self.ids[index],
+            "molecule_loss": round(float(losses['molecule_loss'][index]), 10),
+            "nutrition_loss": round(float(losses['nutrition_loss'][index]), 10),
+            "total_loss": round(float(losses['total_loss'][index]), 10),
+            "nutritional_info": dict(zip(MACRO_KEYS, self.nutrition[index].tolist())),
+            "molecules": self.molecule_lists[index]
+        }
+
+    def best_target_ingredient(self, recipe: dict) -> Optional[dict]:
+        """
+        Finds the candidate with the lowest total loss for a recipe.
+
+        Args:
+            recipe (dict): A recipe with 'matched_ingredients'.
+
+        Returns:
+            Optional[dict]: The best ingredient (first one on ties), or None if no candidate has a finite loss.
+        """
+        losses = self.score(recipe)
+        best = int(np.argmin(losses['total_loss']))
+        if not math.isfinite(losses['total_loss'][best]):
+            return None
+        return self.candidate_info(best, losses)
+
+    def best_target_ingredient_pruned(self, recipe: dict, stats: Optional[dict] = None,
+                                      max_sharing: float = PRUNE_MAX_SHARING) -> Optional[dict]:
+        """
+        Same result as `best_target_ingredient`, without computing the molecule overlap of every candidate.
+
+        The candidates that share a molecule with a recipe ingredient are marked through the inverted index of
+        `molecule_index`, and only their overlaps are gathered from the Jaccard matrix. All other candidates have
+        an overlap of exactly 0, so their losses only differ by nutrition: the group is skipped as a whole when the
+        loss of its best nutrition loss is strictly worse than the best sharing candidate, and scored (without any
+        overlap lookups) otherwise, so ties are resolved like the exhaustive search. Nothing is skipped with a
+        negative weight.
+
+        When more than `max_sharing` of the candidates share a molecule, the recipe is scored by
+        `best_target_ingredient` instead, which is faster then.
+
+        Args:
+            recipe (dict): A recipe with 'matched_ingredients'.
+            stats (Optional[dict]): If given, 'candidates', 'sharing' (candidates whose overlap was gathered),
+                'pruned' (candidates skipped by the bound) and 'exhaustive' (whether it fell back) are set.
+            max_sharing (float): Fraction of sharing candidates above which the exhaustive search is used.
+
+        Returns:
+            Optional[dict]: The best ingredient, or None if no candidate has a finite loss.
+        """
+        matched_ingredients = recipe.get('matched_ingredients', [])
+        rows = [self.name_to_row[ing['ingredient']] for ing in matched_ingredients]
+
+        # Too many sharing candidates: the exhaustive search is faster. The candidates with the most common molecule
+        # of the recipe all share it, so that is checked first, without building the mask. Candidates without
+        # molecules are scored exactly as well (their overlap with an empty set is NaN)
+        exhaustive = bool(rows) and self.molecule_index.widest_posting[rows].max() > max_sharing * len(self.names)
+        if not exhaustive:
+            sharing = self.molecule_index.sharing_mask(rows) | (self.molecule_index.sizes == 0)
+            exhaustive = sharing.mean() > max_sharing
+        if exhaustive:
+            if stats is not None:
+                stats.update(candidates=len(self.names), sharing=len(self.names), pruned=0, exhaustive=True)
+            return self.best_target_ingredient(recipe)
+
+        excluded_names = [ing['ingredient'] for ing in matched_ingredients]
+        nutrition_loss = self.nutrition_loss(recipe_nutrition(matched_ingredients))
+        candidates, others = np.flatnonzero(sharing), np.flatnonzero(~sharing)
+
+        if rows:
+            molecule_overlap = np.ascontiguousarray(self.jaccard[np.ix_(candidates, rows)]).mean(axis=1)
+        else:
+            molecule_overlap = np.zeros(len(candidates))
+        losses = self.combine_losses(molecule_overlap, nutrition_loss[candidates], excluded_names, candidates)
+        best_loss = losses['total_loss'].min() if len(candidates) else np.inf
+
+        # Lowest total loss the other candidates can have: an overlap of 0 with their lowest nutrition loss (the
+        # same monotone operations as for every single candidate, so none of them can be below it)
+        pruned = 0
+        if len(others):
+            bound = np.nan
+            if self.w_molecule >= 0 and self.w_nutrition >= 0:
+                bound = self.combine_losses(np.zeros(1), nutrition_loss[others].min(keepdims=True))['total_loss'][0]
+
+            if bound > best_loss:
+                pruned = len(others)
+            else:
+                other_losses = self.combine_losses(np.zeros(len(others)), nutrition_loss[others], excluded_names,
+                                                   others)
+                candidates = np.concatenate([candidates, others])
+                losses = {key: np.concatenate([losses[key], other_losses[key]]) for key in losses}
+
+        if stats is not None:
+            stats.update(candidates=len(self.names), sharing=int(sharing.sum()), pruned=pruned, exhaustive=False)
+
+        if not len(candidates) or not math.isfinite(losses['total_loss'].min()):
+            return None
+
+        # Lowest loss, first candidate on ties (like np.argmin over all candidates)
+        is_best = losses['total_loss'] == losses['total_loss'].min()
+        position = np.flatnonzero(is_best)[np.argmin(candidates[is_best])]
+        best = int(candidates[position])
+        full_losses = {}
+        for key, values in losses.items():
+            full_losses[key] = np.full(len(self.names), np.inf)
+            full_losses[key][best] = values[position]
+        return self.candidate_info(best, full_losses)
+
+    def suggest(self, recipe: dict, k: int = 10, exclude: Iterable[str] = ()) -> np.ndarray:
+        """
+        Finds the k candidates with the lowest total loss for a recipe.
+
+        Args:
+            recipe (dict): A recipe with 'matched_ingredients' (these are never suggested).
+            k (int): Number of suggestions. Default is 10.
+            exclude (Iterable[str]): Extra ingredient names that should not be suggested.
+
+        Returns:
+            np.ndarray: Structured array (see `SUGGESTION_DTYPE`) sorted by total loss, first candidate first on
+            ties. Contains fewer than k rows if fewer candidates have a finite loss.
+        """
+        return self._suggestions(self.score(recipe, exclude), k)
+
+    def suggest_batch(self, recipes: List[dict], ks: List[int],
+                      excludes: Optional[List[Iterable[str]]] = None) -> List[np.ndarray]:
+        """
+        `suggest` for several recipes, scored together with `score_batch`.
+
+        Args:
+            recipes (List[dict]): Recipes with 'matched_ingredients'.
+            ks (List[int]): Number of suggestions per recipe.
+            excludes (Optional[List[Iterable[str]]]): Extra ingredient names per recipe that are not suggested.
+
+        Returns:
+            List[np.ndarray]: The suggestions of every recipe (see `suggest`).
+        """
+        losses = self.score_batch(recipes, excludes)
+        return [
+            self._suggestions({field: values[number] for field, values in losses.items()}, k)
+            for number, k in enumerate(ks)
+        ]
+
+    def _suggestions(self, losses: Dict[str, np.ndarray], k: int) -> np.ndarray:
+        rows = top_k(losses['total_loss'], k)
+
+        suggestions = np.empty(len(rows), dtype=SUGGESTION_DTYPE)
+        suggestions['index'] = rows
+        suggestions['name'] = [self.names[row] for row in rows]
+        suggestions['ID'] = [self.ids[row] for row in rows]
+        for field in ('molecule_loss', 'nutrition_loss', 'total_loss'):
+            suggestions[field] = losses[field][rows]
+        return suggestions
+
+
+class RecipeState:
+    """
+    Running totals of a recipe, so ingredients can be added or removed without rescanning it.
+
+    Holds the macro totals as a float array and, per candidate, the sum of its molecule overlaps with the
+    recipe ingredients. Adding or removing an ingredient is one vector update, and `losses` scores every
+    candidate at once. The overlap mean is taken as sum / count, so it can differ from `PairingEngine.score`
+    in the last bits.
+
+    Args:
+        engine (PairingEngine): The engine the tables come from.
+        recipe (dict): A recipe with 'matched_ingredients'. Default is an empty recipe.
+    """
+
+    def __init__(self, engine: PairingEngine, recipe: Optional[dict] = None):
+        matched_ingredients = (recipe or {}).get('matched_ingredients', [])
+        nutrition = recipe_nutrition(matched_ingredients)
+
+        self.engine = engine
+        self.names = [ing['ingredient'] for ing in matched_ingredients]
+        self.rows = [engine.name_to_row[name] for name in self.names]
+        self.macros = np.array([nutrition[key] for key in MACRO_KEYS], dtype=float)
+        self.overlap_sum = np.zeros(len(engine.names))
+        for row in self.rows:
+            self.overlap_sum += engine.jaccard[row]
+
+    def copy(self) -> 'RecipeState':
+        state = RecipeState.__new__(RecipeState)
+        state.engine = self.engine
+        state.names = list(self.names)
+        state.rows = list(self.rows)
+        state.macros = self.macros.copy()
+        state.overlap_sum = self.overlap_sum.copy()
+        return state
+
+    def add(self, row: int, macros: Optional[np.ndarray] = None):
+        """
+        Adds a candidate (by row) to the recipe, with its dataset macros unless `macros` is given.
+        """
+        self.names.append(self.engine.names[row])
+        self.rows.append(row)
+        self.macros += self.engine.nutrition[row] if macros is None else macros
+        self.overlap_sum += self.engine.jaccard[row]
+
+    def remove(self, row: int, macros: Optional[np.ndarray] = None):
+        """
+        Removes an ingredient (by row) from the recipe, undoing `add`.
+        """
+        position = self.rows.index(row)
+        del self.rows[position]
+        del self.names[position]
+        self.macros -= self.engine.nutrition[row] if macros is None else macros
+        self.overlap_sum -= self.engine.jaccard[row]
+
+    def losses(self, exclude: Iterable[str] = ()) -> Dict[str, np.ndarray]:
+        """
+        The losses of every candidate if it were added to the recipe now (same output as `PairingEngine.score`).
+        """
+        if self.rows:
+            molecule_overlap = self.overlap_sum / len(self.rows)
+        else:
+            molecule_overlap = np.zeros(len(self.overlap_sum))
+
+        return self.engine.combine_losses(
+            molecule_overlap,
+            self.engine.nutrition_loss(self.macros),
+            self.names + list(exclude)
+        )
@@ -0,0 +1,128 @@
+"""
+This file contains the sharded, multi-process versions of the recipe jobs:
+
+1. `label_recipes_parallel`:
+   - Splits the recipe stream into chunks and labels them in a `ProcessPoolExecutor`.
+   - The engine's tables are saved once to a temporary directory and memory-mapped by every worker,
+     instead of pickling `combined_df` into each worker.
+   - Results are yielded in input order, so the output is the same for any number of workers.
+
+2. `recognise_recipes_parallel`:
+   - Recognises the ingredients in the lines of every recipe the same way; the recogniser is sent to every
+     worker once, when it starts.
+"""
+
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List
+
+from helper_functions.helper_pairing import PairingEngine
+from helper_functions.helper_recognise import IngredientRecogniser, recognise_recipe
+
+
+# The engine (or recogniser) of a worker process, loaded once per process
+_worker_state = {}
+
+
+def _init_worker(engine_directory: str):
+    _worker_state['engine'] = PairingEngine.load(engine_directory, mmap_mode='r')
+
+
+def _label_chunk(recipes: List[dict], prune: bool = False) -> List[dict]:
+    engine = _worker_state['engine']
+    best_target_ingredient = engine.best_target_ingredient_pruned if prune else engine.best_target_ingredient
+    for recipe in recipes:
+        recipe['best_target_ingredient'] = best_target_ingredient(recipe)
+    return recipes
+
+
+def _init_recognise_worker(recogniser: IngredientRecogniser, lines_field: str):
+    _worker_state['recogniser'] = recogniser
+    _worker_state['lines_field'] = lines_field
+
+
+def _recognise_chunk(recipes: List[dict]) -> List[dict]:
+    return [recognise_recipe(recipe, _worker_state['recogniser'], _worker_state['lines_field'])
+            for recipe in recipes]
+
+
+def _chunks(recipes: Iterable[dict], chunk_size: int) -> Iterator[List[dict]]:
+    recipes = iter(recipes)
+    while True:
+        chunk = list(islice(recipes, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _map_chunks(executor: ProcessPoolExecutor, function: Callable, recipes: Iterable[dict], chunk_size: int,
+                max_pending: int) -> Iterator[dict]:
+    # Submits the chunks of recipes and yields the results in input order, with at most `max_pending` in flight
+    pending = deque()
+
+    for chunk in _chunks(recipes, chunk_size):
+        pending.append(executor.submit(function, chunk))
+
+        # Wait for the oldest chunk first, so shards come out in input order
+        if len(pending) >= max_pending:
+            yield from pending.popleft().result()
+
+    while pending:
+        yield from pending.popleft().result()
+
+
+def label_recipes_parallel(recipes: Iterable[dict], engine: PairingEngine, workers: int,
+                           chunk_size: int = 500, max_pending: int = None, prune: bool = False) -> Iterator[dict]:
+    """
+    Adds the `best_target_ingredient` to every recipe, using several processes.
+
+    Args:
+        recipes (Iterable[dict]): The recipes, e.g. from `iter_recipes` (read lazily).
+        engine (PairingEngine): The engine whose tables the workers share.
+        workers (int): Number of worker processes.
+        chunk_size (int): Number of recipes sent to a worker at once.
+        max_pending (int): Maximum number of chunks in flight. Default is 2 per worker, which bounds memory.
+        prune (bool): Use the pruned search (same result).
+
+    Yields:
+        dict: The labelled recipes, in input order.
+    """
+    max_pending = max_pending or 2 * workers
+    engine_directory = tempfile.mkdtemp(prefix='chefgpt_engine_')
+
+    try:
+        engine.save(engine_directory)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(engine_directory,)) as executor:
+            yield from _map_chunks(executor, partial(_label_chunk, prune=prune), recipes, chunk_size, max_pending)
+    finally:
+        shutil.rmtree(engine_directory, ignore_errors=True)
+
+
+def recognise_recipes_parallel(recipes: Iterable[dict], recogniser: IngredientRecogniser, workers: int,
+                               lines_field: str = 'ingredients', chunk_size: int = 2000,
+                               max_pending: int = None) -> Iterator[dict]:
+    """
+    Adds the recognised 'matched_ingredients' to every recipe, using several processes.
+
+    Args:
+        recipes (Iterable[dict]): The recipes, e.g. from `iter_recipes` (read lazily).
+        recogniser (IngredientRecogniser): The recogniser (pickled once per worker).
+        workers (int): Number of worker processes.
+        lines_field (str): The field with the ingredient lines of a recipe.
+        chunk_size (int): Number of recipes sent to a worker at once.
+        max_pending (int): Maximum number of chunks in flight. Default is 2 per worker.
+
+    Yields:
+        dict: The recipes with their 'matched_ingredients', in input order.
+    """
+    max_pending = max_pending or 2 * workers
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_recognise_worker,
+                             initargs=(recogniser, lines_field)) as executor:
+        yield from _map_chunks(executor, _recognise_chunk, recipes, chunk_size, max_pending)
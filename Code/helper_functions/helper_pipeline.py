@@ -0,0 +1,276 @@
+"""
+This file contains a small DAG runner for the pipeline stages:
+
+1. `Stage`:
+   - A stage function with its declared input files, output files and parameters.
+   - Its key is a hash of the contents of its inputs and of its parameters.
+
+2. `Pipeline`:
+   - Orders the stages by their files (a stage runs after the stages that produce its inputs), and skips every
+     stage whose stamp still matches its key and whose outputs are unchanged since it ran.
+   - So changing `W_NUTRITION` only reruns the pairing stage, and a stage that rewrites an identical output does
+     not invalidate the stages after it.
+
+3. `default_pipeline`:
+   - The stop word search, the NEVO/flavour join, the combination and the recipe labelling, wired through
+     their files.
+"""
+
+import hashlib
+import json
+import os
+from typing import Callable, Dict, Iterable, List, Optional
+
+from helper_functions.helper_cache import file_hash
+from helper_functions.helper_instrumentation import Tracer
+from helper_functions.helper_pairing import DEFAULT_TARGET_MACROS
+from helper_functions.helper_recipes import jsonl_path
+from helper_functions.helper_stages import combine_datasets, find_stop_words, join_nutrition_flavour, \
+    label_recipes_file
+
+
+# Bump to rerun every stage after a change to the stage code that changes its outputs
+PIPELINE_VERSION = 1
+
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    Args:
+        name (str): Name of the stage.
+        function (Callable): The stage function; it is called with the inputs, outputs, params and options as
+            keyword arguments, plus `tracer`.
+        inputs (Dict[str, str]): Keyword argument -> path of every file the stage reads.
+        outputs (Dict[str, str]): Keyword argument -> path of every file the stage writes.
+        params (Optional[dict]): Keyword arguments that change the outputs (part of the key).
+        options (Optional[dict]): Keyword arguments that don't change the outputs, like the number of workers.
+    """
+
+    def __init__(self, name: str, function: Callable, inputs: Dict[str, str], outputs: Dict[str, str],
+                 params: Optional[dict] = None, options: Optional[dict] = None):
+        self.name = name
+        self.function = function
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params or {}
+        self.options = options or {}
+
+    def run(self, tracer: Tracer):
+        return self.function(**self.inputs, **self.outputs, **self.params, **self.options, tracer=tracer)
+
+
+class Pipeline:
+    """
+    Runs stages in dependency order and skips the ones that are up to date.
+
+    Args:
+        stages (List[Stage]): The stages.
+        stamp_dir (Optional[str]): Where the stamps are kept. Default is '$CHEFGPT_CACHE_DIR/stamps', or
+            '.chefgpt_cache/stamps' in the working directory.
+    """
+
+    def __init__(self, stages: List[Stage], stamp_dir: Optional[str] = None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.stamp_dir = stamp_dir or os.path.join(os.environ.get('CHEFGPT_CACHE_DIR') or '.chefgpt_cache', 'stamps')
+        self.producers = {
+            os.path.abspath(path): stage.name for stage in stages for path in stage.outputs.values()
+        }
+        self._hashes = None
+
+    def dependencies(self, name: str) -> List[str]:
+        """
+        Returns the stages that produce the inputs of a stage.
+        """
+        paths = [os.path.abspath(path) for path in self.stages[name].inputs.values()]
+        return [self.producers[path] for path in paths if path in self.producers]
+
+    def order(self, targets: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Returns the targets (default: all stages) and the stages they depend on, dependencies first.
+
+        Raises:
+            KeyError: If a target is not a stage.
+            ValueError: If the stages depend on each other in a cycle.
+        """
+        ordered, visiting = [], set()
+
+        def visit(name):
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage '{name}' depends on itself")
+            visiting.add(name)
+            for dependency in self.dependencies(name):
+                visit(dependency)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for name in (targets or self.stages):
+            if name not in self.stages:
+                raise KeyError(f"Unknown stage '{name}', choose from {list(self.stages)}")
+            visit(name)
+        return ordered
+
+    def _file_hash(self, path: str) -> str:
+        # Hashes are remembered per (size, modification time), so unchanged large files are not read again
+        if self._hashes is None:
+            self._hashes = self._read_json('hashes.json') or {}
+        stat = os.stat(path)
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        path = os.path.abspath(path)
+        cached = self._hashes.get(path)
+        if cached and cached['signature'] == signature:
+            return cached['sha256']
+        digest = file_hash(path)
+        self._hashes[path] = {'signature': signature, 'sha256': digest}
+        self._write_json('hashes.json', self._hashes)
+        return digest
+
+    def _read_json(self, name: str) -> Optional[dict]:
+        path = os.path.join(self.stamp_dir, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_json(self, name: str, data: dict):
+        os.makedirs(self.stamp_dir, exist_ok=True)
+        path = os.path.join(self.stamp_dir, name)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+        os.replace(path + '.tmp', path)
+
+    def key(self, name: str) -> str:
+        """
+        Returns the hash of the input contents and the parameters of a stage.
+
+        Raises:
+            FileNotFoundError: If an input is missing.
+        """
+        stage = self.stages[name]
+        inputs = {}
+        for argument, path in stage.inputs.items():
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Input '{path}' of stage '{name}' does not exist")
+            inputs[argument] = self._file_hash(path)
+        payload = json.dumps({'version': PIPELINE_VERSION, 'stage': name, 'inputs': inputs, 'params': stage.params},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def status(self, name: str) -> Optional[str]:
+        """
+        Returns why a stage has to run, or None if it is up to date.
+        """
+        stage = self.stages[name]
+        stamp = self._read_json(f'{name}.json')
+        if stamp is None:
+            return 'never ran'
+        if stamp['key'] != self.key(name):
+            return 'inputs or parameters changed'
+        for path in stage.outputs.values():
+            if not os.path.exists(path):
+                return f"output '{path}' is missing"
+            if self._file_hash(path) != stamp['outputs'].get(path):
+                return f"output '{path}' was changed"
+        return None
+
+    def run(self, targets: Optional[Iterable[str]] = None, force: Iterable[str] = (), dry_run: bool = False,
+            tracer: Optional[Tracer] = None) -> Dict[str, str]:
+        """
+        Runs the targets (default: all stages) and their dependencies, skipping the stages that are up to date.
+
+        Args:
+            targets (Optional[Iterable[str]]): Stages to bring up to date.
+            force (Iterable[str]): Stages that run even if they are up to date.
+            dry_run (bool): Only report what would run.
+            tracer (Optional[Tracer]): Records the sub-steps of the stages that run.
+
+        Returns:
+            Dict[str, str]: Per stage 'ran', 'skipped' or (dry run) the reason it would run.
+        """
+        tracer = tracer or Tracer()
+        force = set(force)
+        result = {}
+
+        for name in self.order(targets):
+            stage = self.stages[name]
+
+            # In a dry run, a stage after one that would run is assumed to run as well
+            upstream_pending = any(result.get(dependency, 'skipped') != 'skipped'
+                                   for dependency in self.dependencies(name))
+            if dry_run and upstream_pending:
+                result[name] = 'an input will be rebuilt'
+                print(f"[{name}] would run: {result[name]}")
+                continue
+
+            reason = 'forced' if name in force else self.status(name)
+            if reason is None:
+                print(f"[{name}] up to date, skipped")
+                result[name] = 'skipped'
+                continue
+
+            if dry_run:
+                result[name] = reason
+                print(f"[{name}] would run: {reason}")
+                continue
+
+            print(f"[{name}] running: {reason}")
+            with tracer.stage(name):
+                stage.run(tracer)
+            self._write_json(f'{name}.json', {
+                'key': self.key(name),
+                'params': stage.params,
+                'outputs': {path: self._file_hash(path) for path in stage.outputs.values()}
+            })
+            result[name] = 'ran'
+
+        return result
+
+
+def default_pipeline(nutrition_file: str = 'NEVO2023_8.0.csv', flavour_json: str = 'flavourDB2.json',
+                     stop_words_path: str = 'stop_words.csv', nevo_joined_path: str = 'NEVO_Joined.csv',
+                     nevo_cleaned_path: str = 'chefgpt/resources/NEVO_Joined_cleaned.csv',
+                     flavour_molecules_path: str = 'chefgpt/resources/flavourDB2_molecules.csv',
+                     combined_path: str = 'chefgpt/resources/combined_flavour_nutrition.csv',
+                     nevo_names_path: str = 'chefgpt/resources/nevo_names.csv',
+                     recipes_path: str = 'chefgpt/resources/matched_recipe_data_with_common_molecules.json',
+                     labelled_path: str = 'chefgpt/resources/updated_recipes_with_losses-huge.json',
+                     consensus_score: float = 70, stop_word_threshold: float = 75, match_threshold: int = 90,
+                     target_macros: Optional[Dict[str, float]] = None, w_molecule: float = 0.5,
+                     w_nutrition: float = 0.5, stream: bool = False, workers: Optional[int] = None,
+                     prune: bool = False, stamp_dir: Optional[str] = None) -> Pipeline:
+    """
+    Builds the pipeline of the numbered scripts [2], [3], [5] and [4].
+
+    The joined NEVO rows ('NEVO_Joined.csv') are cleaned by hand before they are combined, so by default the
+    combination reads `nevo_cleaned_path`; pass the same path as `nevo_joined_path` to combine the join output
+    directly. The FlavourDB JSON is scraped with [1] and is an input here. With `stream` the labelled recipes are
+    JSON Lines, so they go to the '.jsonl' variant of `labelled_path`.
+    """
+    if stream:
+        labelled_path = jsonl_path(labelled_path)
+
+    stages = [
+        Stage('stop_words', find_stop_words,
+              inputs={'nutrition_file': nutrition_file, 'flavour_json': flavour_json},
+              outputs={'output_path': stop_words_path,
+                       'common_words_path': os.path.join(os.path.dirname(stop_words_path), 'common_words.csv')},
+              params={'consensus_score': consensus_score, 'threshold': stop_word_threshold},
+              options={'workers': workers or os.cpu_count() or 1}),
+        Stage('join', join_nutrition_flavour,
+              inputs={'nutrition_file': nutrition_file, 'flavour_json': flavour_json,
+                      'stop_words_path': stop_words_path},
+              outputs={'output_path': nevo_joined_path},
+              params={'threshold': match_threshold}),
+        Stage('combine', combine_datasets,
+              inputs={'flavour_db_path': flavour_molecules_path, 'nevo_path': nevo_cleaned_path},
+              outputs={'output_path': combined_path, 'names_output_path': nevo_names_path}),
+        Stage('pairing', label_recipes_file,
+              inputs={'combined_path': combined_path, 'recipes_path': recipes_path},
+              outputs={'output_path': labelled_path},
+              params={'target_macros': target_macros or DEFAULT_TARGET_MACROS, 'w_molecule': w_molecule,
+                      'w_nutrition': w_nutrition, 'stream': stream},
+              options={'workers': workers or 1, 'prune': prune})
+    ]
+    return Pipeline(stages, stamp_dir)
@@ -0,0 +1,104 @@
+"""
+This file contains functions to read and write (large) recipe files without loading them into memory at once:
+
+1. `iter_recipes`:
+   - Yields recipes one by one from a JSON Lines file, or from a JSON array file (streamed with ijson if it
+     is installed; with `stream=True` a missing ijson is an error instead of a silent full load).
+
+2. `write_jsonl` / `convert_json_to_jsonl`:
+   - Write recipes as JSON Lines as they are produced, and convert existing JSON array files. `jsonl_path` gives
+     the '.jsonl' path JSON Lines output goes to.
+"""
+
+import importlib.util
+import json
+import os
+from typing import Iterable, Iterator
+
+
+def is_jsonl(path: str) -> bool:
+    """
+    Returns whether a path is a JSON Lines file (by extension).
+    """
+    return path.endswith('.jsonl') or path.endswith('.ndjson')
+
+
+def jsonl_path(path: str) -> str:
+    """
+    Returns the path itself if it is a JSON Lines path, otherwise the same path with a '.jsonl' extension.
+
+    JSON Lines must never be written under a '.json' name: the readers pick the format from the extension.
+    """
+    return path if is_jsonl(path) else os.path.splitext(path)[0] + '.jsonl'
+
+
+def iter_recipes(path: str, stream: bool = False) -> Iterator[dict]:
+    """
+    Yields the recipes of a JSON Lines file or a JSON array file one by one.
+
+    JSON array files are streamed with ijson when it is installed; otherwise the file is loaded at once.
+
+    Args:
+        path (str): The recipe file.
+        stream (bool): Require constant memory: a JSON array file without ijson raises instead of being loaded at
+            once.
+
+    Yields:
+        dict: One recipe.
+
+    Raises:
+        ImportError: With `stream`, if `path` is a JSON array file and ijson is not installed (checked right away).
+    """
+    if stream and not is_jsonl(path) and importlib.util.find_spec('ijson') is None:
+        raise ImportError(f"Streaming {path} needs ijson (pip install ijson), which is not installed; "
+                          f"install it, or convert the file to JSON Lines with convert_recipes.py")
+    return _iter_recipes(path)
+
+
+def _iter_recipes(path: str) -> Iterator[dict]:
+    if is_jsonl(path):
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    try:
+        import ijson  # type: ignore
+    except ImportError:
+        print(f"ijson is not installed, loading {path} at once")
+        with open(path, 'r') as file:
+            yield from json.load(file)
+        return
+
+    with open(path, 'rb') as file:
+        yield from ijson.items(file, 'item', use_float=True)
+
+
+def write_jsonl(records: Iterable[dict], path: str) -> int:
+    """
+    Writes records to a JSON Lines file, one at a time.
+
+    Args:
+        records (Iterable[dict]): The records, e.g. a generator.
+        path (str): The output file.
+
+    Returns:
+        int: Number of records written.
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(record) + '\n')
+            count += 1
+    return count
+
+
+def convert_json_to_jsonl(json_path: str, jsonl_path: str) -> int:
+    """
+    Converts a JSON array file (like `updated_recipes_with_losses-huge.json`) to JSON Lines.
+
+    Returns:
+        int: Number of records converted.
+    """
+    return write_jsonl(iter_recipes(json_path), jsonl_path)
@@ -0,0 +1,199 @@
+"""
+This file contains the recogniser that maps free-text ingredient lines ('2 tbsp peanut butter') to the ingredients
+of the combined dataset:
+
+1. `line_tokens` / `line_segments`:
+   - Cleans a line like the ingredient names are cleaned, splits it into words and makes plural words singular.
+     Aliases and lines are both split this way, so they are compared on the same tokens.
+   - A line is first cut at list separators (',', ';', '/', brackets), and every segment is scanned on its own, so
+     a match never runs across them ('peanut, butter' is peanut and butter). Hyphens only separate words.
+
+2. `IngredientRecogniser`:
+   - A token trie over the aliases of every ingredient. A segment is scanned once from left to right; at every
+     position the longest alias that starts there wins and the scan continues after it, so 'peanut butter' is
+     never read as 'butter'.
+
+3. `ingredient_aliases`:
+   - Collects the aliases: the `clean_ingredient` names, the FlavourDB synonyms of their entities and the NEVO
+     food names that were joined to them ('nevo_names.csv').
+
+4. `recognise_recipes`:
+   - Adds the recognised ingredients of every recipe as its 'matched_ingredients', so the recipes can be labelled
+     by the pairing stage (`recognise_recipes_parallel` in helper_parallel runs it across processes).
+"""
+
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from helper_functions.helper_combine import NAME_NOISE_PATTERN, clean_ingredient_names
+
+
+# Key of the ingredient stored in a trie node (tokens are never empty)
+_INGREDIENT = ''
+
+# Characters that separate the items of an ingredient list; an alias never spans them
+LIST_SEPARATOR_PATTERN = re.compile(r'[,;/()\[\]]')
+
+
+def singular(word: str) -> str:
+    """
+    Crude singular of an English word ('tomatoes' -> 'tomato', 'berries' -> 'berry', 'peas' -> 'pea').
+
+    Words ending in 'ss' or 'us' are kept ('grass', 'asparagus'). Aliases and lines go through the same function,
+    so a wrong singular still matches.
+    """
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith('oes'):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us')):
+        return word[:-1]
+    return word
+
+
+def line_tokens(line: str) -> List[str]:
+    """
+    Splits a line into cleaned, singular, lowercase words (punctuation separates words: 'peanut-butter').
+    """
+    return [singular(word) for word in NAME_NOISE_PATTERN.sub(' ', str(line).lower()).split()]
+
+
+def line_segments(line: str) -> List[List[str]]:
+    """
+    Cuts a line at the list separators and returns the tokens of every non-empty segment (see `line_tokens`).
+    """
+    return [tokens for tokens in map(line_tokens, LIST_SEPARATOR_PATTERN.split(str(line))) if tokens]
+
+
+class IngredientRecogniser:
+    """
+    Finds the ingredients in free-text lines with a token trie over their aliases.
+
+    Args:
+        aliases (Iterable[Tuple[str, str]]): (alias, ingredient) pairs. If two ingredients share an alias, the
+            first pair wins, so the most reliable source should come first.
+    """
+
+    def __init__(self, aliases: Iterable[Tuple[str, str]]):
+        self.root: dict = {}
+        self.ingredients = set()
+        self.alias_count = 0
+
+        for alias, ingredient in aliases:
+            tokens = line_tokens(alias)
+            if not tokens:
+                continue
+            node = self.root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            if _INGREDIENT not in node:
+                node[_INGREDIENT] = ingredient
+                self.ingredients.add(ingredient)
+                self.alias_count += 1
+
+    def find(self, tokens: List[str]) -> List[Tuple[int, int, str]]:
+        """
+        Returns the non-overlapping matches in a list of tokens, leftmost first and longest at every position.
+
+        Returns:
+            List[Tuple[int, int, str]]: (start, end, ingredient) per match, `tokens[start:end]` being the alias.
+        """
+        matches = []
+        start = 0
+        while start < len(tokens):
+            node = self.root
+            end, ingredient = None, None
+
+            # Follow the trie as far as the tokens go and remember the last (longest) alias that ended on the way
+            for position in range(start, len(tokens)):
+                node = node.get(tokens[position])
+                if node is None:
+                    break
+                if _INGREDIENT in node:
+                    end, ingredient = position + 1, node[_INGREDIENT]
+
+            if ingredient is None:
+                start += 1
+            else:
+                matches.append((start, end, ingredient))
+                start = end
+        return matches
+
+    def recognise(self, line: str) -> List[str]:
+        """
+        Returns the ingredients in a line, in the order they appear (segments are matched separately).
+        """
+        return [ingredient for tokens in line_segments(line) for _, _, ingredient in self.find(tokens)]
+
+
+def _synonyms(value) -> List[str]:
+    # FlavourDB stores the synonyms as one comma separated string (lists are accepted as well)
+    if isinstance(value, str):
+        return [synonym for synonym in value.split(',') if synonym.strip()]
+    if isinstance(value, (list, tuple)):
+        return [synonym for synonym in value if isinstance(synonym, str)]
+    return []
+
+
+def ingredient_aliases(combined_df: pd.DataFrame, flavour_df: Optional[pd.DataFrame] = None,
+                       nevo_names_df: Optional[pd.DataFrame] = None) -> List[Tuple[str, str]]:
+    """
+    Collects the (alias, ingredient) pairs of the ingredients of the combined dataset, most reliable first.
+
+    Args:
+        combined_df (pd.DataFrame): The combined dataset ('clean_ingredient', and 'entity_id' for the synonyms).
+        flavour_df (Optional[pd.DataFrame]): FlavourDB entities with 'entity_id', 'entity_alias_readable' and
+            'entity_alias_synonyms'.
+        nevo_names_df (Optional[pd.DataFrame]): 'nevo_names.csv' ('Engelse naam/Food name', 'flavour_name').
+
+    Returns:
+        List[Tuple[str, str]]: The ingredient names themselves, then the FlavourDB names and synonyms of their
+        entities, then the NEVO food names joined to them.
+    """
+    ingredients = combined_df['clean_ingredient'].drop_duplicates()
+    aliases = [(name, name) for name in ingredients]
+
+    if flavour_df is not None and 'entity_id' in combined_df:
+        ingredient_by_entity = dict(zip(combined_df['entity_id'], combined_df['clean_ingredient']))
+        for entity_id, readable, synonyms in zip(flavour_df['entity_id'], flavour_df['entity_alias_readable'],
+                                                 flavour_df['entity_alias_synonyms']):
+            ingredient = ingredient_by_entity.get(entity_id)
+            if ingredient is not None:
+                aliases += [(alias, ingredient) for alias in [str(readable)] + _synonyms(synonyms)]
+
+    if nevo_names_df is not None:
+        known = set(ingredients)
+        flavour_names = clean_ingredient_names(nevo_names_df['flavour_name'])
+        for food_name, ingredient in zip(nevo_names_df['Engelse naam/Food name'], flavour_names):
+            if ingredient in known and isinstance(food_name, str):
+                aliases.append((food_name, ingredient))
+
+    return aliases
+
+
+def recognise_recipe(recipe: dict, recogniser: IngredientRecogniser, lines_field: str = 'ingredients') -> dict:
+    """
+    Adds the ingredients recognised in the lines of a recipe as its 'matched_ingredients'.
+
+    Every ingredient is added once, with the line it was first found in ({'ingredient': ..., 'line': ...}).
+    """
+    matched, seen = [], set()
+    for line in recipe.get(lines_field) or []:
+        for ingredient in recogniser.recognise(line):
+            if ingredient not in seen:
+                seen.add(ingredient)
+                matched.append({'ingredient': ingredient, 'line': line})
+    recipe['matched_ingredients'] = matched
+    return recipe
+
+
+def recognise_recipes(recipes: Iterable[dict], recogniser: IngredientRecogniser,
+                      lines_field: str = 'ingredients') -> Iterator[dict]:
+    """
+    Adds the 'matched_ingredients' to every recipe (see `recognise_recipe`).
+    """
+    for recipe in recipes:
+        yield recognise_recipe(recipe, recogniser, lines_field)
+
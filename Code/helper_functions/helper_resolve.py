@@ -0,0 +1,118 @@
+"""
+This file contains the resolver that links a NEVO row to a flavour row from its top-k fuzzy matches:
+
+1. `top_k_arrays`:
+   - Turns a long table of matches (from `FuzzyMatcher.extract`) into (n_rows, k) label and score arrays,
+     best match first. `FuzzyMatcher.top_k` returns the same arrays without building the table.
+
+2. `resolve_matches`:
+   - Applies the perfect / same-row consensus / threshold rules to all rows in one vectorized pass and returns
+     the chosen flavour label and the rule that fired per row.
+
+3. `matches_frame`:
+   - The resolved rows as a DataFrame ('nutrition_index', 'flavour_index', 'rule'), for merging.
+"""
+
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# The rule that resolved a row (in the order they are applied)
+NO_MATCH = 0
+PERFECT_MATCH = 1
+CONSENSUS_MATCH = 2
+THRESHOLD_MATCH = 3
+RULE_NAMES = np.array(['none', 'perfect', 'consensus', 'threshold'])
+
+
+def top_k_arrays(top_matches_df: pd.DataFrame, n_rows: int, k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Picks the k best matches of every row from a long table of matches.
+
+    Matches are ordered by score (descending); ties keep their order in the table.
+
+    Args:
+        top_matches_df (pd.DataFrame): Long table with 'nutrition_index', 'flavour_index' and 'fuzz_score'.
+        n_rows (int): Number of NEVO rows.
+        k (int): Number of matches kept per row.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Flavour labels (int64, -1 if missing) and scores (float64, NaN if missing),
+        both of shape (n_rows, k).
+    """
+    nutrition_index = top_matches_df['nutrition_index'].to_numpy()
+    fuzz_score = top_matches_df['fuzz_score'].to_numpy(dtype=float)
+    flavour_index = top_matches_df['flavour_index'].to_numpy()
+
+    # Sort by nutrition_index, then fuzz_score (descending), keeping the original order on ties
+    order = np.lexsort((-fuzz_score, nutrition_index))
+    nutrition_index, fuzz_score, flavour_index = nutrition_index[order], fuzz_score[order], flavour_index[order]
+
+    # Rank of every match within its row (distance to the first match of the row)
+    rank = np.arange(len(order)) - np.searchsorted(nutrition_index, nutrition_index)
+    keep = rank < k
+
+    labels = np.full((n_rows, k), -1, dtype=np.int64)
+    scores = np.full((n_rows, k), np.nan)
+    labels[nutrition_index[keep], rank[keep]] = flavour_index[keep]
+    scores[nutrition_index[keep], rank[keep]] = fuzz_score[keep]
+    return labels, scores
+
+
+def resolve_matches(labels: np.ndarray, scores: np.ndarray, consensus_score: float = 80,
+                    threshold: float = 90) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Picks the flavour label of every row from its top-k matches (best first).
+
+    The rules are applied in order, every row is only resolved by the first rule that applies:
+    1. Perfect match: one of the scores is 100 (the first such match is picked).
+    2. Consensus match: all k matches have the same label and all scores are above `consensus_score`.
+    3. Threshold match: one of the scores is above `threshold` (the first such match is picked).
+
+    Args:
+        labels (np.ndarray): Flavour labels of shape (n_rows, k), -1 for a missing match.
+        scores (np.ndarray): Scores of shape (n_rows, k), NaN for a missing match.
+        consensus_score (float): The score all matches need for rule 2. Default is 80.
+        threshold (float): The score a match needs for rule 3. Default is 90.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The chosen label per row (-1 if unresolved) and the rule that fired
+        (`NO_MATCH`, `PERFECT_MATCH`, `CONSENSUS_MATCH` or `THRESHOLD_MATCH`, as int8).
+    """
+    rows = np.arange(labels.shape[0])
+
+    # NaN compares as False, so missing matches never satisfy a rule
+    is_perfect = scores == 100
+    above_threshold = scores > threshold
+    perfect = is_perfect.any(axis=1)
+    consensus = (labels == labels[:, :1]).all(axis=1) & (scores > consensus_score).all(axis=1)
+    thresholded = above_threshold.any(axis=1)
+
+    rule = np.select(
+        [perfect, consensus, thresholded],
+        [PERFECT_MATCH, CONSENSUS_MATCH, THRESHOLD_MATCH],
+        default=NO_MATCH
+    ).astype(np.int8)
+
+    # Column of the picked match: the first perfect score, the first column, or the first score above the threshold
+    column = np.where(perfect, is_perfect.argmax(axis=1), np.where(consensus, 0, above_threshold.argmax(axis=1)))
+    label = np.where(rule != NO_MATCH, labels[rows, column], -1)
+    return label, rule
+
+
+def matches_frame(label: np.ndarray, rule: np.ndarray) -> pd.DataFrame:
+    """
+    Returns the resolved rows of `resolve_matches` as a DataFrame.
+
+    Returns:
+        pd.DataFrame: 'nutrition_index', 'flavour_index' (nullable Int64) and 'rule' (its name) of every
+        resolved row.
+    """
+    resolved = np.flatnonzero(rule != NO_MATCH)
+    return pd.DataFrame({
+        'nutrition_index': resolved,
+        'flavour_index': pd.array(label[resolved], dtype='Int64'),
+        'rule': RULE_NAMES[rule[resolved]]
+    })
@@ -0,0 +1,192 @@
+"""
+This file contains the functions used to scrape the entity JSONs from the FlavourDB2 website:
+
+1. `scrape_entities`:
+   - Fetches entities concurrently over a pooled session, with retries/backoff and an optional rate limit.
+   - Writes every entity to a JSON Lines file as soon as it arrives, as {"id": <requested ID>, "data": <response>},
+     and records its ID in a checkpoint file, so a rerun only fetches the IDs that are still missing.
+
+2. `combine_jsonl`:
+   - Turns the JSON Lines output into the single JSON list the rest of the pipeline reads: one response per
+     requested ID, in ID order. Responses that are not a JSON object are reported and left out.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, List, Optional, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+BASE_URL = "https://cosylab.iiitd.edu.in/flavordb2/entities_json?id="
+
+
+class RateLimiter:
+    """
+    Spaces out requests over all threads to at most `max_per_second` (no limit if it is None).
+    """
+
+    def __init__(self, max_per_second: Optional[float] = None):
+        self.interval = 1 / max_per_second if max_per_second else 0
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+def make_session(pool_size: int = 8, retries: int = 5, backoff: float = 0.5) -> requests.Session:
+    """
+    Creates a session with a connection pool and retry/backoff on connection errors and 429/5xx responses.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=['GET']
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def read_checkpoint(checkpoint_path: str) -> Set[int]:
+    """
+    Reads the IDs that were already fetched (one per line) from a checkpoint file.
+    """
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, encoding="utf-8") as f:
+        return {int(line) for line in f if line.strip()}
+
+
+def fetch_entity(session: requests.Session, entity_id: int, base_url: str = BASE_URL,
+                 timeout: float = 30, rate_limiter: Optional[RateLimiter] = None) -> dict:
+    """
+    Fetches the JSON of a single entity.
+    """
+    if rate_limiter is not None:
+        rate_limiter.wait()
+    response = session.get(f"{base_url}{entity_id}", timeout=timeout)
+    response.raise_for_status()  # Raise an exception for HTTP errors
+    return response.json()
+
+
+def scrape_entities(entity_ids: Iterable[int], output_path: str, checkpoint_path: str, base_url: str = BASE_URL,
+                    concurrency: int = 8, max_per_second: Optional[float] = None, retries: int = 5,
+                    backoff: float = 0.5, timeout: float = 30) -> Tuple[int, List[int]]:
+    """
+    Fetches entities concurrently and streams them to a JSON Lines file.
+
+    IDs listed in the checkpoint file are skipped. Every fetched entity is appended to `output_path` (keyed by the
+    requested ID, see the file docstring) and its ID to `checkpoint_path` right away, so an interrupted run loses at most the requests that were in flight.
+
+    Args:
+        entity_ids (Iterable[int]): The IDs to fetch.
+        output_path (str): JSON Lines file the entities are appended to.
+        checkpoint_path (str): File with the IDs that were fetched successfully.
+        base_url (str): URL the ID is appended to.
+        concurrency (int): Maximum number of requests in flight (and size of the connection pool).
+        max_per_second (Optional[float]): Maximum number of requests started per second. Default is no limit.
+        retries (int): Retries per request on connection errors and 429/5xx responses.
+        backoff (float): Backoff factor between retries.
+        timeout (float): Timeout per request in seconds.
+
+    Returns:
+        Tuple[int, List[int]]: Number of entities fetched in this run, and the IDs that failed.
+    """
+    done = read_checkpoint(checkpoint_path)
+    todo = [entity_id for entity_id in entity_ids if entity_id not in done]
+
+    session = make_session(concurrency, retries, backoff)
+    rate_limiter = RateLimiter(max_per_second)
+    fetched = 0
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor, \
+            open(output_path, "a", encoding="utf-8") as output_file, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint_file:
+
+        futures = {
+            executor.submit(fetch_entity, session, entity_id, base_url, timeout, rate_limiter): entity_id
+            for entity_id in todo
+        }
+
+        # Only this thread writes, so the files don't need a lock
+        for future in as_completed(futures):
+            entity_id = futures[future]
+            try:
+                data = future.result()
+            except requests.exceptions.RequestException as e:
+                print(f"Error fetching data for ID {entity_id}: {e}")
+                failed.append(entity_id)
+                continue
+            except json.JSONDecodeError:
+                print(f"Error decoding JSON for ID {entity_id}")
+                failed.append(entity_id)
+                continue
+
+            output_file.write(json.dumps({'id': entity_id, 'data': data}) + "\n")
+            output_file.flush()
+            checkpoint_file.write(f"{entity_id}\n")
+            checkpoint_file.flush()
+
+            fetched += 1
+            print(f"Got ID= {entity_id}")
+
+    session.close()
+    return fetched, sorted(failed)
+
+
+def combine_jsonl(jsonl_path: str, json_path: str) -> int:
+    """
+    Writes the entities of a JSON Lines file as one JSON list, sorted by requested ID and without duplicates.
+
+    A response that is not a JSON object (e.g. null or a list) and a line that can't be decoded (e.g. cut off by
+    a crash) are reported and skipped.
+
+    Args:
+        jsonl_path (str): JSON Lines file written by `scrape_entities`.
+        json_path (str): Output JSON file.
+
+    Returns:
+        int: Number of entities written.
+    """
+    # Keyed by the requested ID, so a refetched ID replaces its earlier line
+    entities = {}
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                line_data = json.loads(line)
+                entity_id, data = line_data['id'], line_data['data']
+            except (json.JSONDecodeError, TypeError, KeyError):
+                print(f"Skipping line {line_number} of {jsonl_path}: not an entity line")
+                continue
+            if not isinstance(data, dict):
+                print(f"Skipping ID {entity_id}: the response is not a JSON object")
+                entities.pop(entity_id, None)
+                continue
+            entities[entity_id] = data
+
+    combined_data = [entities[entity_id] for entity_id in sorted(entities)]
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(combined_data, f, indent=4)
+
+    return len(combined_data)
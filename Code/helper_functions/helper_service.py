@@ -0,0 +1,237 @@
+"""
+This file contains a small asyncio HTTP service that suggests ingredients for a recipe:
+
+1. `SuggestionService`:
+   - Keeps a `PairingEngine` in memory and answers suggestion requests in batches: requests that arrive
+     within a few milliseconds of each other are scored together in one worker-thread call, as one NumPy pass
+     (`PairingEngine.suggest_batch`).
+   - A bad request only fails itself: its error is returned to its client, the rest of the batch is answered.
+   - Records the latency of every request and reports p50/p99.
+
+2. `serve`:
+   - Runs the service over TCP or a Unix socket, with two endpoints:
+     `POST /suggest` with {"ingredients": [...], "k": 5, "exclude": [...]} (or a recipe with
+     "matched_ingredients"), and `GET /stats` with the latency percentiles.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from helper_functions.helper_pairing import PairingEngine, recipe_nutrition
+
+
+class SuggestionService:
+    """
+    Batched ingredient suggestions on top of a warm `PairingEngine`.
+
+    Args:
+        engine (PairingEngine): The engine, loaded once at startup.
+        max_batch (int): Maximum number of requests scored together.
+        max_wait_ms (float): How long the first request of a batch waits for more requests.
+        latency_window (int): Number of recent requests the latency percentiles are computed over.
+    """
+
+    def __init__(self, engine: PairingEngine, max_batch: int = 32, max_wait_ms: float = 1.0,
+                 latency_window: int = 10000):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.latencies = deque(maxlen=latency_window)
+        self.batch_sizes = deque(maxlen=latency_window)
+        self.requests = 0
+        self.queue: Optional[asyncio.Queue] = None
+
+    def _recipe(self, body: dict) -> dict:
+        if 'matched_ingredients' in body:
+            return {'matched_ingredients': body['matched_ingredients']}
+        return self.engine.recipe_from_names(body.get('ingredients', []))
+
+    def _suggest_batch(self, batch: List[Tuple[dict, asyncio.Future]]) -> List[object]:
+        """
+        Scores a batch of requests (runs in a worker thread). Returns a result or an exception per request.
+        """
+        results: List[object] = [None] * len(batch)
+
+        # Every request is checked on its own (unknown ingredients, malformed nutrition, bad k), so one bad
+        # request can't fail the requests it is batched with
+        valid, recipes, ks, excludes = [], [], [], []
+        for number, (body, _) in enumerate(batch):
+            try:
+                recipe = self._recipe(body)
+                for ing in recipe['matched_ingredients']:
+                    self.engine.name_to_row[ing['ingredient']]
+                recipe_nutrition(recipe['matched_ingredients'])
+                k = int(body.get('k', 5))
+                exclude = list(body.get('exclude', ()))
+            except Exception as e:
+                results[number] = e
+                continue
+            valid.append(number)
+            recipes.append(recipe)
+            ks.append(k)
+            excludes.append(exclude)
+
+        try:
+            batch_suggestions = self.engine.suggest_batch(recipes, ks, excludes) if recipes else []
+        except Exception as e:
+            batch_suggestions = [e] * len(recipes)
+
+        for number, suggestions in zip(valid, batch_suggestions):
+            results[number] = suggestions if isinstance(suggestions, Exception) else [
+                {
+                    'name': suggestion['name'],
+                    'ID': suggestion['ID'],
+                    'molecule_loss': float(suggestion['molecule_loss']),
+                    'nutrition_loss': float(suggestion['nutrition_loss']),
+                    'total_loss': float(suggestion['total_loss'])
+                }
+                for suggestion in suggestions
+            ]
+        return results
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+
+            # Collect more requests until the batch is full or the first request waited long enough
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batch_sizes.append(len(batch))
+            try:
+                results = await loop.run_in_executor(None, self._suggest_batch, batch)
+            except Exception as e:
+                # Only this batch fails; the batcher keeps serving the next requests
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def suggest(self, body: dict) -> list:
+        """
+        Queues a request for the next batch and waits for its suggestions.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((body, future))
+        return await future
+
+    def stats(self) -> dict:
+        """
+        Returns the number of requests and the p50/p99 latency (in ms) over the recent requests.
+        """
+        latencies = np.array(self.latencies) * 1000
+        return {
+            'requests': self.requests,
+            'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            'mean_batch_size': float(np.mean(self.batch_sizes)) if self.batch_sizes else None
+        }
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: str, payload: dict, keep_alive: bool):
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Handles the HTTP/1.1 requests of one connection (keep-alive supported).
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                content = await reader.readexactly(int(headers.get('content-length', 0)))
+                keep_alive = headers.get('connection', '').lower() != 'close'
+
+                if method == 'GET' and path == '/stats':
+                    await self._respond(writer, '200 OK', self.stats(), keep_alive)
+                elif method == 'POST' and path == '/suggest':
+                    start = time.perf_counter()
+                    try:
+                        body = json.loads(content or b'{}')
+                        if not isinstance(body, dict):
+                            raise TypeError("The request body must be a JSON object")
+                        suggestions = await self.suggest(body)
+                    except KeyError as e:
+                        await self._respond(writer, '400 Bad Request', {'error': f"Unknown ingredient: {e}"},
+                                            keep_alive)
+                    except (TypeError, ValueError, AttributeError) as e:
+                        await self._respond(writer, '400 Bad Request', {'error': str(e)}, keep_alive)
+                    except Exception as e:
+                        await self._respond(writer, '500 Internal Server Error', {'error': str(e)}, keep_alive)
+                    else:
+                        latency = time.perf_counter() - start
+                        self.latencies.append(latency)
+                        self.requests += 1
+                        await self._respond(writer, '200 OK',
+                                            {'suggestions': suggestions, 'latency_ms': latency * 1000}, keep_alive)
+                else:
+                    await self._respond(writer, '404 Not Found', {'error': f"No route for {method} {path}"},
+                                        keep_alive)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8000, unix_path: Optional[str] = None):
+        """
+        Starts the batcher and the server, and returns the server.
+        """
+        self.queue = asyncio.Queue()
+        self._batcher_task = asyncio.create_task(self._batcher())
+        if unix_path:
+            return await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+def serve(engine: PairingEngine, host: str = '127.0.0.1', port: int = 8000, unix_path: Optional[str] = None,
+          max_batch: int = 32, max_wait_ms: float = 1.0):
+    """
+    Runs the suggestion service until it is interrupted.
+    """
+    service = SuggestionService(engine, max_batch, max_wait_ms)
+
+    async def run():
+        server = await service.start(host, port, unix_path)
+        print(f"Serving suggestions on {unix_path or f'http://{host}:{port}'}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print(f"Stopped, stats: {service.stats()}")
@@ -0,0 +1,527 @@
+"""
+This file contains the pipeline steps of the numbered scripts as callable stages:
+
+1. `scrape_flavourdb` ([1] scraper.py):
+   - Scrapes the FlavourDB2 entities and combines them into one JSON file.
+
+2. `find_stop_words` ([2] analyse_nutritional_df.py):
+   - Greedily picks the stop words that don't lower the number of nutrition/flavour matches.
+
+3. `join_nutrition_flavour` ([3] match_nutrition_&_flavour.py):
+   - Links every NEVO row to its flavour entity ("NEVO_Joined.csv").
+
+4. `combine_datasets` ([5] combining_datasets.py):
+   - Combines the flavour molecules and the (cleaned) joined NEVO rows into one dataset.
+
+5. `label_recipes_file` ([4] Ingredient_Pairing.py):
+   - Labels every recipe with its best target ingredient.
+
+6. `recognise_recipes_file` (`chefgpt recognise`):
+   - Maps the free-text ingredient lines of every recipe to ingredients of the combined dataset.
+
+7. `export_training_data` (`chefgpt export-training`):
+   - Writes the labelled recipes as sharded, padded token sequences for training the model.
+
+8. `compare_inference_file` (`chefgpt infer`):
+   - Suggests an ingredient for every recipe with the trained model, next to the exact best target ingredient.
+
+Every stage records its sub-steps (wall/CPU time, peak RSS, row counts) and the per-item latency of its hot loop
+in a `Tracer`, so a run shows where the time goes.
+"""
+
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from helper_functions.helper_cache import read_csv_cached, read_flavour_json_cached
+from helper_functions.helper_combine import combine_flavour_nutrition
+from helper_functions.helper_fuzzy import FuzzyMatcher
+from helper_functions.helper_instrumentation import LatencyHistogram, Tracer
+from helper_functions.helper_merge import clean_nutrition_df, get_name_cleaner, write_common_words_to_csv
+from helper_functions.helper_nutrition import normalise_nutrient_columns, report_coerced_columns
+from helper_functions.helper_pairing import DEFAULT_TARGET_MACROS, PairingEngine
+from helper_functions.helper_recipes import is_jsonl, iter_recipes, jsonl_path, write_jsonl
+from helper_functions.helper_recognise import IngredientRecogniser, ingredient_aliases, recognise_recipes
+from helper_functions.helper_resolve import RULE_NAMES, matches_frame, resolve_matches
+from helper_functions.helper_training import build_vocabulary, export_training_shards
+from helper_functions.helper_stop_words import StopWordSearch
+
+
+# Columns of flavourDB2.json that are loaded
+FLAVOUR_JSON_COLUMNS = [
+    'category',
+    'entity_id',
+    'category_readable',
+    'entity_alias_basket',
+    'entity_alias_readable',
+    'natural_source_name',
+    'entity_alias', 'entity_alias_synonyms'
+]
+
+# NEVO columns that are only in Dutch (or not needed)
+NEVO_COLUMNS_TO_REMOVE = [
+    'NEVO-versie/NEVO-version',             # NEVO versie
+    'Voedingsmiddelgroep',                  # In het Nederlands
+    'Voedingsmiddelnaam/Dutch food name',   # In het Nederlands
+    'Synoniem'                              # In het Nederlands
+]
+
+
+def scrape_flavourdb(start_id: int, end_id: int, jsonl_path: str, checkpoint_path: str, output_path: str,
+                     tracer: Optional[Tracer] = None, **scrape_options) -> int:
+    """
+    Fetches the entities that are not in the checkpoint yet and combines all of them into `output_path`.
+
+    Args:
+        start_id (int): First entity ID.
+        end_id (int): Last entity ID (inclusive).
+        jsonl_path (str): Streaming output, one entity per line.
+        checkpoint_path (str): IDs that were already fetched.
+        output_path (str): Combined JSON list.
+        tracer (Optional[Tracer]): Records the sub-steps.
+        **scrape_options: Passed on to `scrape_entities` (base_url, concurrency, max_per_second, retries).
+
+    Returns:
+        int: The number of entities in the combined file.
+    """
+    from helper_functions.helper_scraper import scrape_entities, combine_jsonl
+
+    tracer = tracer or Tracer()
+
+    with tracer.stage('scrape', rows_in=end_id - start_id + 1) as record:
+        fetched, failed = scrape_entities(range(start_id, end_id + 1), jsonl_path, checkpoint_path, **scrape_options)
+        record['rows_out'] = fetched
+        record['failed'] = len(failed)
+    print(f"Fetched {fetched} entities, {len(failed)} failed")
+    if failed:
+        print(f"Rerun the script to retry IDs: {failed}")
+
+    with tracer.stage('combine_jsonl') as record:
+        total = record['rows_out'] = combine_jsonl(jsonl_path, output_path)
+    print(f"Data successfully combined into {output_path} ({total} entities)")
+    return total
+
+
+def find_stop_words(nutrition_file: str, flavour_json: str, output_path: str = 'stop_words.csv',
+                    common_words_path: Optional[str] = None, consensus_score: float = 70, threshold: float = 75,
+                    workers: Optional[int] = None, tracer: Optional[Tracer] = None) -> pd.DataFrame:
+    """
+    Picks the stop words: common words of the NEVO names that are kept only if the number of matches doesn't drop.
+
+    Also writes the common words to `common_words_path` (by default 'common_words.csv' next to `output_path`).
+
+    Returns:
+        pd.DataFrame: The stop words and the matches each of them added (also written to `output_path`).
+    """
+    tracer = tracer or Tracer()
+
+    with tracer.stage('load') as record:
+        nutrition_df = read_csv_cached(nutrition_file, sep='|')
+        flavour_df = read_flavour_json_cached(flavour_json, FLAVOUR_JSON_COLUMNS)
+        record['rows_out'] = len(nutrition_df)
+
+    # flavourdf has multiple name columns
+    name_columns = [
+        'entity_alias_basket',
+        'entity_alias_readable',
+        'entity_alias',
+        'entity_alias_synonyms'
+    ]
+
+    with tracer.stage('clean', rows_in=len(nutrition_df)):
+        # Create 'cleaned_name' column
+        clean_nutrition_df(nutrition_df, flavour_df, name_columns)
+
+        # Save the common words in a file
+        common_words_path = common_words_path or os.path.join(os.path.dirname(output_path), 'common_words.csv')
+        common_words = write_common_words_to_csv(nutrition_df, common_words_path)
+
+    # Greedily add the common words as stop words, and keep a word only if the amount of matches doesn't drop.
+    # Only the rows containing a word are re-cleaned and re-matched, upcoming words are pre-matched in parallel.
+    with tracer.stage('stop_word_search', rows_in=len(common_words)) as record:
+        search = StopWordSearch(nutrition_df['Engelse naam/Food name'], flavour_df, name_columns,
+                                consensus_score=consensus_score, threshold=threshold,
+                                workers=workers or os.cpu_count() or 1)
+        stop_words_df = search.run(common_words, latency=tracer.histogram('stop_word'))
+        record['rows_out'] = len(stop_words_df)
+
+    stop_words_df.to_csv(output_path, index=False)
+    return stop_words_df
+
+
+def join_nutrition_flavour(nutrition_file: str, flavour_json: str, stop_words_path: str = 'stop_words.csv',
+                           output_path: str = 'NEVO_Joined.csv', threshold: int = 90,
+                           tracer: Optional[Tracer] = None) -> pd.DataFrame:
+    """
+    Links every NEVO row to its flavour entity with the fuzzy top 3 matches, and writes the result.
+
+    Returns:
+        pd.DataFrame: The NEVO rows with 'flavour_index' and 'flavour_name' (also written to `output_path`).
+    """
+    tracer = tracer or Tracer()
+
+    with tracer.stage('load') as record:
+        nutrition_df = read_csv_cached(nutrition_file, sep='|')
+        nutrition_df.drop(NEVO_COLUMNS_TO_REMOVE, inplace=True, axis=1)
+        flavour_df = read_flavour_json_cached(flavour_json, FLAVOUR_JSON_COLUMNS)
+        stop_words = pd.read_csv(stop_words_path)['stop_word']
+        record['rows_out'] = len(nutrition_df)
+
+    # flavourdf has multiple name columns, so creat this list to possibly look at multiple
+    name_columns = [
+        'entity_alias_readable'
+    ]
+
+    with tracer.stage('clean', rows_in=len(nutrition_df)):
+        clean_nutrition_df(nutrition_df, flavour_df, name_columns)
+        nutrition_df['cleaned_name'] = get_name_cleaner(stop_words).clean_many(
+            nutrition_df['Engelse naam/Food name'])
+
+    # Get the top 3 matches of every name in every flavour_df column, scored in one multi-threaded pass
+    with tracer.stage('fuzzy_search', rows_in=len(nutrition_df)) as record:
+        matcher = FuzzyMatcher(flavour_df, name_columns, limit=3)
+        flavour_rows, scores = matcher.top_k(nutrition_df['Engelse naam/Food name'], k=3)
+
+        # Replace the flavour_df row positions by the corresponding entity_id
+        entity_ids = flavour_df['entity_id'].to_numpy()
+        labels = np.where(flavour_rows >= 0, entity_ids[np.maximum(flavour_rows, 0)], -1)
+        record['rows_out'] = int((flavour_rows >= 0).sum())
+
+    # Pick the flavour row of every nutrition row: a perfect match, a clear match or a match above the threshold
+    with tracer.stage('resolve_matches', rows_in=len(labels)) as record:
+        flavour_index, rule = resolve_matches(labels, scores, consensus_score=80, threshold=threshold)
+        result_df = matches_frame(flavour_index, rule)
+        record['rows_out'] = len(result_df)
+        record['rules'] = {name: int((rule == code).sum()) for code, name in enumerate(RULE_NAMES)}
+
+    with tracer.stage('merge', rows_in=len(nutrition_df)) as record:
+        # Merge nutrition_df with result_df on 'NEVO-code' and 'nutrition_index'
+        nutrition_df = nutrition_df.merge(result_df[['nutrition_index', 'flavour_index']],
+                                          left_index=True,
+                                          right_on='nutrition_index',
+                                          how='left')
+
+        # Also save the corresponding 'entity_name' from the flavour_df
+        nutrition_df = nutrition_df.merge(flavour_df[['entity_id', 'entity_alias_readable']],
+                                          left_on='flavour_index',
+                                          right_on='entity_id',
+                                          how='left') \
+            .rename(columns={'entity_alias_readable': 'flavour_name'})
+
+        # Drop the extra 'entity_id' column
+        nutrition_df.drop(columns=['entity_id'], inplace=True)
+        record['rows_out'] = len(nutrition_df)
+
+    # Check the updated nutrition_df
+    print(f'\nAfter:\n{nutrition_df.head(20)}')
+
+    with tracer.stage('write', rows_in=len(nutrition_df)):
+        nutrition_df.to_csv(output_path, index=False)
+    return nutrition_df
+
+
+def combine_datasets(flavour_db_path: str, nevo_path: str, output_path: str, names_output_path: str,
+                     tracer: Optional[Tracer] = None) -> pd.DataFrame:
+    """
+    Combines the flavour molecules with the cleaned, joined NEVO rows, and writes the combined dataset and the
+    NEVO names.
+
+    Returns:
+        pd.DataFrame: The combined dataset (also written to `output_path`).
+    """
+    tracer = tracer or Tracer()
+
+    with tracer.stage('load') as record:
+        flavour_df = read_csv_cached(flavour_db_path)
+        nevo_df = read_csv_cached(nevo_path, sep=';')
+        record['rows_out'] = len(nevo_df)
+
+    # Convert all nutrient columns to numbers (the file mixes '1,8' and '0.0'), so none of them drop out of the mean
+    with tracer.stage('normalise_nutrients', rows_in=len(nevo_df)):
+        nevo_df, coerced_columns = normalise_nutrient_columns(nevo_df)
+        report_coerced_columns(coerced_columns)
+
+    # Clean both datasets, group the NEVO rows per flavour ingredient and join them with the flavour molecules
+    with tracer.stage('group_and_merge', rows_in=len(nevo_df)) as record:
+        combined_df = combine_flavour_nutrition(flavour_df, nevo_df)
+        record['rows_out'] = len(combined_df)
+
+    with tracer.stage('write', rows_in=len(combined_df)):
+        nevo_df[['Engelse naam/Food name', 'flavour_name']].to_csv(names_output_path, index=False)
+        combined_df.to_csv(output_path, index=False)
+    print(f"saved to {output_path}")
+    return combined_df
+
+
+def label_recipes(recipes: Iterable[dict], engine: PairingEngine, latency: Optional[LatencyHistogram] = None,
+                  prune: bool = False, pruned: Optional[List[int]] = None) -> Iterator[dict]:
+    """
+    Adds the best matching ingredient (lowest total loss, already matched ingredients skipped) to every recipe.
+
+    With `prune`, the search skips the candidates that can't win (same result); the number of skipped candidates
+    of every recipe is appended to `pruned` if it is given.
+    """
+    def best(recipe):
+        if not prune:
+            return engine.best_target_ingredient(recipe)
+        stats = {}
+        result = engine.best_target_ingredient_pruned(recipe, stats)
+        if pruned is not None:
+            pruned.append(stats['pruned'])
+        return result
+
+    for recipe in recipes:
+        if latency is None:
+            recipe['best_target_ingredient'] = best(recipe)
+        else:
+            with latency.time():
+                recipe['best_target_ingredient'] = best(recipe)
+        yield recipe
+
+
+def pruning_summary(pruned: List[int], candidates: int) -> dict:
+    """
+    Summarises the number of candidates the pruned search skipped per recipe.
+    """
+    if not pruned:
+        return {}
+    counts = np.asarray(pruned)
+    return {
+        'candidates': candidates,
+        'pruned_total': int(counts.sum()),
+        'pruned_mean': float(counts.mean()),
+        'pruned_p50': float(np.percentile(counts, 50)),
+        'pruned_p90': float(np.percentile(counts, 90)),
+        'recipes_pruned': int((counts > 0).sum())
+    }
+
+
+def label_recipes_file(combined_path: str, recipes_path: str, output_path: str,
+                       target_macros: Optional[Dict[str, float]] = None, w_molecule: float = 0.5,
+                       w_nutrition: float = 0.5, stream: bool = False, workers: int = 1, chunk_size: int = 500,
+                       prune: bool = False, tracer: Optional[Tracer] = None) -> int:
+    """
+    Labels every recipe of `recipes_path` with its best target ingredient and writes the result.
+
+    Args:
+        combined_path (str): 'combined_flavour_nutrition.csv'.
+        recipes_path (str): JSON array or JSON Lines (.jsonl) file.
+        output_path (str): Output file (JSON Lines with `stream`, so it must end in '.jsonl'; an indented JSON array
+            otherwise).
+        target_macros (Optional[Dict[str, float]]): Target percentage per macro. Default is `DEFAULT_TARGET_MACROS`.
+        w_molecule (float): Weight of the molecule loss.
+        w_nutrition (float): Weight of the nutrition loss.
+        stream (bool): Read the recipes incrementally and write every result as a JSON line right away.
+        workers (int): Number of processes that label recipes.
+        chunk_size (int): Recipes per chunk sent to a worker.
+        prune (bool): Skip the candidates that can't win (`PairingEngine.best_target_ingredient_pruned`, same
+            result). Recipes whose molecules are shared by most candidates are scored exhaustively.
+        tracer (Optional[Tracer]): Records the sub-steps, the per-recipe latency and the number of pruned
+            candidates (single process only).
+
+    Returns:
+        int: The number of labelled recipes.
+    """
+    from helper_functions.helper_parallel import label_recipes_parallel
+
+    if stream and not is_jsonl(output_path):
+        raise ValueError(f"Streamed output is JSON Lines, so it needs a .jsonl path (not {output_path}), "
+                         f"e.g. {jsonl_path(output_path)}")
+
+    tracer = tracer or Tracer()
+
+    # Precompute the molecule overlaps and nutrition arrays once, instead of looping over combined_df for every recipe
+    with tracer.stage('build_engine') as record:
+        engine = PairingEngine.from_csv(combined_path, target_macros or DEFAULT_TARGET_MACROS, w_molecule, w_nutrition)
+        record['rows_out'] = len(engine.names)
+
+    pruned = []
+
+    def label(recipes):
+        # With several workers, chunks of recipes are labelled in parallel (results keep the input order)
+        if workers > 1:
+            return label_recipes_parallel(recipes, engine, workers, chunk_size, prune=prune)
+        return label_recipes(recipes, engine, tracer.histogram('recipe_scoring'), prune, pruned)
+
+    if stream:
+        # Constant memory: one recipe at a time in, one JSON line out
+        with tracer.stage('label_recipes') as record:
+            recipes = tqdm(iter_recipes(recipes_path, stream=True), desc="Processing recipes")
+            count = record['rows_out'] = write_jsonl(label(recipes), output_path)
+            record.update(pruning_summary(pruned, len(engine.names)))
+        print(f"Wrote {count} recipes to {output_path}")
+        return count
+
+    with tracer.stage('load_recipes') as record:
+        with open(recipes_path, 'r') as file:
+            recipes_data: List[dict] = json.load(file)
+        record['rows_out'] = len(recipes_data)
+
+    #tqdm used due to long running time, in order to get an indication of how long this process would take
+    with tracer.stage('label_recipes', rows_in=len(recipes_data)) as record:
+        recipes_data = list(label(tqdm(recipes_data, desc="Processing recipes")))
+        record['rows_out'] = len(recipes_data)
+        record.update(pruning_summary(pruned, len(engine.names)))
+
+    # Make a new json file containing lists (of lists) with the recipe data,
+    # as well as the new best matched ingredient and its loss
+    with tracer.stage('write', rows_in=len(recipes_data)):
+        with open(output_path, 'w') as json_file:
+            json.dump(recipes_data, json_file, indent=4) #explanation on this was asked in chat-gpt
+    return len(recipes_data)
+
+
+def recognise_recipes_file(combined_path: str, recipes_path: str, output_path: str,
+                           flavour_json: Optional[str] = None, nevo_names_path: Optional[str] = None,
+                           lines_field: str = 'ingredients', workers: int = 1, chunk_size: int = 2000,
+                           tracer: Optional[Tracer] = None) -> int:
+    """
+    Recognises the ingredients in the free-text lines of every recipe and writes the recipes with their
+    'matched_ingredients' as JSON Lines.
+
+    Args:
+        combined_path (str): 'combined_flavour_nutrition.csv'.
+        recipes_path (str): JSON array or JSON Lines (.jsonl) file of recipes with ingredient lines.
+        output_path (str): Output JSON Lines file.
+        flavour_json (Optional[str]): 'flavourDB2.json', to add the FlavourDB synonyms as aliases.
+        nevo_names_path (Optional[str]): 'nevo_names.csv', to add the joined NEVO food names as aliases.
+        lines_field (str): The field with the ingredient lines of a recipe.
+        workers (int): Number of processes that recognise recipes.
+        chunk_size (int): Recipes per chunk sent to a worker.
+        tracer (Optional[Tracer]): Records the sub-steps and the per-recipe latency (single process only).
+
+    Returns:
+        int: The number of recipes written.
+    """
+    from helper_functions.helper_parallel import recognise_recipes_parallel
+
+    tracer = tracer or Tracer()
+
+    with tracer.stage('build_recogniser') as record:
+        combined_df = read_csv_cached(combined_path, low_memory=False)
+        flavour_df = read_flavour_json_cached(flavour_json, FLAVOUR_JSON_COLUMNS) if flavour_json else None
+        nevo_names_df = pd.read_csv(nevo_names_path) if nevo_names_path else None
+        recogniser = IngredientRecogniser(ingredient_aliases(combined_df, flavour_df, nevo_names_df))
+        record['rows_out'] = recogniser.alias_count
+    print(f"{recogniser.alias_count} aliases of {len(recogniser.ingredients)} ingredients")
+
+    counts = {'recipes_matched': 0, 'ingredients': 0}
+
+    def count(recipes):
+        for recipe in recipes:
+            counts['recipes_matched'] += bool(recipe['matched_ingredients'])
+            counts['ingredients'] += len(recipe['matched_ingredients'])
+            yield recipe
+
+    with tracer.stage('recognise_recipes') as record:
+        recipes = tqdm(iter_recipes(recipes_path), desc="Recognising ingredients")
+        if workers > 1:
+            recognised = recognise_recipes_parallel(recipes, recogniser, workers, lines_field, chunk_size)
+        else:
+            recognised = recognise_recipes(tracer.histogram('recipe_recognition').timed(recipes), recogniser,
+                                           lines_field)
+        written = record['rows_out'] = write_jsonl(count(recognised), output_path)
+        record.update(counts)
+
+    print(f"Wrote {written} recipes to {output_path} ({counts['recipes_matched']} with ingredients, "
+          f"{counts['ingredients']} ingredients)")
+    return written
+
+
+def export_training_data(combined_path: str, labelled_path: str, output_directory: str, max_length: int = 32,
+                         shard_size: int = 50_000, tracer: Optional[Tracer] = None) -> int:
+    """
+    Writes the labelled recipes as sharded training data (see helper_training).
+
+    Args:
+        combined_path (str): 'combined_flavour_nutrition.csv' (its ingredients are the vocabulary).
+        labelled_path (str): The labelled recipes ('updated_recipes_with_losses.json' or a .jsonl file).
+        output_directory (str): Directory of the shards.
+        max_length (int): Length of the padded ingredient sequences.
+        shard_size (int): Recipes per shard.
+        tracer (Optional[Tracer]): Records the sub-steps.
+
+    Returns:
+        int: The number of exported recipes.
+    """
+    tracer = tracer or Tracer()
+
+    with tracer.stage('build_vocabulary') as record:
+        vocabulary = build_vocabulary(read_csv_cached(combined_path, columns=['clean_ingredient'])['clean_ingredient'])
+        record['rows_out'] = len(vocabulary)
+
+    with tracer.stage('export_shards') as record:
+        recipes = tqdm(iter_recipes(labelled_path), desc="Exporting recipes")
+        manifest = export_training_shards(recipes, vocabulary, output_directory, max_length, shard_size)
+        record['rows_out'] = manifest['recipes']
+        record.update({key: manifest[key] for key in ('skipped', 'truncated')})
+        record['shards'] = len(manifest['shards'])
+
+    print(f"Wrote {manifest['recipes']} recipes in {len(manifest['shards'])} shards to {output_directory} "
+          f"({manifest['skipped']} skipped, {manifest['truncated']} cut to {max_length} ingredients)")
+    return manifest['recipes']
+
+
+def compare_inference_file(combined_path: str, model_path: str, training_directory: str, recipes_path: str,
+                           output_path: str, target_macros: Optional[Dict[str, float]] = None,
+                           w_molecule: float = 0.5, w_nutrition: float = 0.5, threads: Optional[int] = None,
+                           batch_size: int = 1024, cache_size: int = 100_000, tracer: Optional[Tracer] = None) -> dict:
+    """
+    Suggests an ingredient for every recipe with the trained model and with the exact loss-based search, and
+    writes both per recipe (JSON Lines) with whether they agree.
+
+    Args:
+        combined_path (str): 'combined_flavour_nutrition.csv'.
+        model_path (str): The saved Keras model.
+        training_directory (str): The training export of the model (its vocabulary and sequence length).
+        recipes_path (str): JSON array or JSON Lines (.jsonl) file of recipes with 'matched_ingredients'.
+        output_path (str): Output JSON Lines file.
+        target_macros (Optional[Dict[str, float]]): Target percentage per macro. Default is `DEFAULT_TARGET_MACROS`.
+        w_molecule (float): Weight of the molecule loss.
+        w_nutrition (float): Weight of the nutrition loss.
+        threads (Optional[int]): CPU threads of TensorFlow.
+        batch_size (int): Recipes per model call.
+        cache_size (int): Maximum number of ingredient sets whose prediction is cached.
+        tracer (Optional[Tracer]): Records the sub-steps and the per-recipe latency of the model and the engine.
+
+    Returns:
+        dict: The number of recipes, how many the model and the engine agree on (and the rate), how many had no
+        suggestion, and the cache hits and misses.
+    """
+    from helper_functions.helper_inference import ModelPredictor, compare_with_engine
+
+    tracer = tracer or Tracer()
+
+    with tracer.stage('load_model'):
+        predictor = ModelPredictor.load(model_path, training_directory, threads, batch_size, cache_size)
+
+    with tracer.stage('build_engine') as record:
+        engine = PairingEngine.from_csv(combined_path, target_macros or DEFAULT_TARGET_MACROS, w_molecule, w_nutrition)
+        record['rows_out'] = len(engine.names)
+
+    counts = {'recipes': 0, 'agree': 0, 'model_none': 0, 'engine_none': 0}
+
+    def count(recipes):
+        for recipe in recipes:
+            counts['recipes'] += 1
+            counts['agree'] += recipe['agree']
+            counts['model_none'] += recipe['model_target_ingredient'] is None
+            counts['engine_none'] += recipe['best_target_ingredient'] is None
+            yield recipe
+
+    with tracer.stage('compare') as record:
+        recipes = tqdm(iter_recipes(recipes_path), desc="Scoring recipes")
+        compared = compare_with_engine(recipes, predictor, engine, tracer.histogram('model_inference'),
+                                       tracer.histogram('engine_scoring'))
+        record['rows_out'] = write_jsonl(count(compared), output_path)
+        counts['agreement'] = counts['agree'] / max(counts['recipes'], 1)
+        counts.update(predictor.cache_stats())
+        record.update(counts)
+
+    print(f"Model and engine agree on {counts['agree']} of {counts['recipes']} recipes ({counts['agreement']:.1%}), "
+          f"{counts['cache_hits']} cached predictions")
+    return counts
@@ -0,0 +1,198 @@
+"""
+This file contains the greedy stop word search used by the analysis script:
+
+1. `match_rows`:
+   - Applies the matching conditions (perfect match / same flavour row / score threshold) to the top-n matches
+     of every name (with `resolve_matches`) and returns, per NEVO name, whether it counts as a match.
+
+2. `StopWordSearch`:
+   - Greedily adds common words as stop words and keeps a word only if the number of matches doesn't drop.
+   - Incremental: a word only changes the cleaned names of the rows that contain it, so only those rows are
+     re-cleaned and re-matched, and the match count is updated by the difference.
+   - Match results are memoized per cleaned name, and upcoming words can be pre-matched in parallel processes.
+"""
+
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from helper_functions.helper_fuzzy import FuzzyMatcher
+from helper_functions.helper_instrumentation import LatencyHistogram
+from helper_functions.helper_merge import get_name_cleaner
+from helper_functions.helper_resolve import NO_MATCH, resolve_matches
+
+
+def match_rows(matcher: FuzzyMatcher, names: List[str], consensus_score: float = 70,
+               threshold: float = 75, top_n: int = 3) -> np.ndarray:
+    """
+    Decides per NEVO name whether it is matched, using its top-n matches over all name columns.
+
+    A name is matched when one of its top-n scores is 100, when all top-n matches come from the same flavour row
+    with scores above `consensus_score`, or when any top-n score is above `threshold`.
+
+    Args:
+        matcher (FuzzyMatcher): The matcher over the flavour name columns.
+        names (List[str]): The (cleaned) NEVO names.
+        consensus_score (float): Minimum score of the same-flavour-row condition.
+        threshold (float): Minimum score of the threshold condition.
+        top_n (int): Number of best matches per name that are considered.
+
+    Returns:
+        np.ndarray: Boolean array with one value per name.
+    """
+    flavour_rows, scores = matcher.top_k(names, top_n)
+    _, rule = resolve_matches(flavour_rows, scores, consensus_score, threshold)
+    return rule != NO_MATCH
+
+
+# The matcher used by worker processes, created once per process
+_worker_state = {}
+
+
+def _init_worker(flavour_df: pd.DataFrame, name_columns: List[str], consensus_score: float, threshold: float):
+    _worker_state['matcher'] = FuzzyMatcher(flavour_df, name_columns, limit=3, workers=1)
+    _worker_state['consensus_score'] = consensus_score
+    _worker_state['threshold'] = threshold
+
+
+def _worker_match(names: List[str]) -> np.ndarray:
+    return match_rows(_worker_state['matcher'], names, _worker_state['consensus_score'], _worker_state['threshold'])
+
+
+class StopWordSearch:
+    """
+    Incremental greedy search for stop words that increase the number of NEVO -> FlavourDB matches.
+
+    Args:
+        names (List[str]): The (lowercased) NEVO food names.
+        flavour_df (pd.DataFrame): The flavour dataset.
+        name_columns (List[str]): The flavour name columns to match against.
+        consensus_score (float): Minimum score of the same-flavour-row condition. Default is 70.
+        threshold (float): Minimum score of the threshold condition. Default is 75.
+        workers (int): Number of processes used to pre-match upcoming words. Default is 1 (no processes).
+        batch_size (int): Number of upcoming words that are pre-matched at once.
+    """
+
+    def __init__(self, names: List[str], flavour_df: pd.DataFrame, name_columns: List[str],
+                 consensus_score: float = 70, threshold: float = 75, workers: int = 1, batch_size: int = 64):
+        self.names = list(names)
+        self.flavour_df = flavour_df
+        self.name_columns = name_columns
+        self.consensus_score = consensus_score
+        self.threshold = threshold
+        self.workers = workers
+        self.batch_size = batch_size
+
+        self.matcher = FuzzyMatcher(flavour_df, name_columns, limit=3)
+        self.memo: Dict[str, bool] = {}
+
+        # Rows per (lowercased) word, a stop word can only change the names of these rows
+        self.word_rows = defaultdict(list)
+        for row, name in enumerate(self.names):
+            for word in set(re.findall(r'\b\w+\b', name.lower())):
+                self.word_rows[word].append(row)
+
+    def _match_names(self, names: List[str], executor=None):
+        """
+        Matches all names that are not memoized yet and stores the results.
+        """
+        missing = list(dict.fromkeys(name for name in names if name not in self.memo))
+        if not missing:
+            return
+
+        if executor is None:
+            matched = match_rows(self.matcher, missing, self.consensus_score, self.threshold)
+        else:
+            chunk_size = -(-len(missing) // self.workers)
+            chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+            matched = np.concatenate(list(executor.map(_worker_match, chunks)))
+
+        self.memo.update(zip(missing, matched.tolist()))
+
+    def _clean_rows(self, rows: List[int], stop_words: List[str]) -> List[str]:
+        cleaner = get_name_cleaner(stop_words)
+        return [cleaner.clean(self.names[row]) for row in rows]
+
+    def run(self, common_words: List[str], verbose: bool = True,
+            latency: Optional[LatencyHistogram] = None) -> pd.DataFrame:
+        """
+        Runs the greedy search over the common words, in order.
+
+        Args:
+            common_words (List[str]): Candidate stop words, most frequent first.
+            verbose (bool): Print the effect of every word. Default is True.
+            latency (Optional[LatencyHistogram]): Records the time spent on every word.
+
+        Returns:
+            pd.DataFrame: The kept words ('stop_word') and the matches each of them added ('added_matches').
+        """
+        executor = None
+        if self.workers > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.flavour_df, self.name_columns, self.consensus_score, self.threshold)
+            )
+
+        try:
+            stop_words = []
+            added_matches = []
+            total_matches = 0
+
+            # Start from the names without any stop words removed
+            current_names = self._clean_rows(list(range(len(self.names))), stop_words)
+            self._match_names(current_names, executor)
+            current_matched = np.array([self.memo[name] for name in current_names], dtype=bool)
+            state_matches = int(current_matched.sum())
+
+            for batch_start in range(0, len(common_words), self.batch_size):
+                batch = common_words[batch_start:batch_start + self.batch_size]
+
+                # Pre-match the names every word of the batch would produce (given the current stop words)
+                if executor is not None:
+                    self._match_names([
+                        name
+                        for word in batch
+                        for name in self._clean_rows(self.word_rows.get(word.lower(), []), stop_words + [word])
+                    ], executor)
+
+                for common_word in batch:
+                    word_start = time.perf_counter_ns()
+
+                    # Only the rows containing the word are re-cleaned and re-matched
+                    rows = self.word_rows.get(common_word.lower(), [])
+                    new_names = self._clean_rows(rows, stop_words + [common_word])
+                    self._match_names(new_names)
+                    new_matched = np.array([self.memo[name] for name in new_names], dtype=bool)
+
+                    current_matches = state_matches + int(new_matched.sum()) - int(current_matched[rows].sum())
+
+                    # Check if removing common word has no improvement
+                    if current_matches < total_matches:
+                        if verbose:
+                            print(f"{common_word}: No improvement")
+                    else:
+                        if verbose:
+                            print(f"{common_word}: Amount of matches: {current_matches}")
+
+                        stop_words.append(common_word)
+                        added_matches.append(current_matches - total_matches)
+                        total_matches = current_matches
+
+                        state_matches = current_matches
+                        current_matched[rows] = new_matched
+                        for row, name in zip(rows, new_names):
+                            current_names[row] = name
+
+                    if latency is not None:
+                        latency.record_ns(time.perf_counter_ns() - word_start)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return pd.DataFrame({'stop_word': stop_words, 'added_matches': added_matches})
@@ -0,0 +1,243 @@
+"""
+This file contains the substitute search: ingredients with a similar nutrient profile, reranked by shared molecules:
+
+1. `nutrient_vectors`:
+   - Standardised (z-score) nutrient vectors of the combined dataset, either the macros (PROT/FAT/CHO) or all
+     NEVO nutrient columns. Missing values get the column mean, so they don't pull ingredients apart.
+
+2. `SubstituteIndex`:
+   - A KD-tree over the vectors (scipy's `cKDTree` when scipy is installed, an exact NumPy search otherwise).
+     The NumPy search gets its candidates from `|q|^2 + |v|^2 - 2 q.v` (one matrix product, no
+     queries x rows x columns array) and recomputes the exact distances of the candidates only.
+   - `substitutes(ingredient, k)` takes the `pool` nearest ingredients in nutrient space and reranks them by a
+     weighted sum of their nutrient distance (scaled to the pool) and their molecule Jaccard distance.
+   - `substitutes_batch` does the same for many ingredients in one call.
+
+Every row of the combined dataset has a FlavourDB match, so every substitute has molecules to compare.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from helper_functions.helper_cache import read_csv_cached
+from helper_functions.helper_molecules import MoleculeIndex, popcount
+from helper_functions.helper_nutrition import normalise_nutrient_columns, nutrient_columns
+from helper_functions.helper_pairing import NUTRITION_COLUMNS, get_molecule_list
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy is optional, the NumPy search gives the same neighbours
+    cKDTree = None
+
+
+# Maximum number of float64 values in one block of the NumPy search (32 MB): the queries are searched a block at a
+# time, so the memory doesn't grow with the number of queries times the number of rows
+MAX_BLOCK_VALUES = 4_000_000
+
+# Fields of the substitutes returned by `SubstituteIndex.substitutes`
+SUBSTITUTE_DTYPE = np.dtype([
+    ('index', np.int64),
+    ('name', object),
+    ('ID', object),
+    ('distance', np.float64),
+    ('jaccard', np.float64),
+    ('score', np.float64)
+])
+
+
+def nutrient_vectors(combined_df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    Standardises nutrient columns to zero mean and unit variance.
+
+    Args:
+        combined_df (pd.DataFrame): The combined dataset.
+        columns (List[str]): The nutrient columns.
+
+    Returns:
+        np.ndarray: float64 array of shape (rows, columns). Missing values and constant columns become 0.
+    """
+    nutrition_df, _ = normalise_nutrient_columns(combined_df[columns].copy(), columns, dtype=np.float64)
+    values = nutrition_df.to_numpy()
+
+    # Mean and standard deviation over the known values (a column without any gives 0 and 1)
+    counts = np.maximum((~np.isnan(values)).sum(axis=0), 1)
+    centred = values - np.nansum(values, axis=0) / counts
+    std = np.sqrt(np.nansum(centred ** 2, axis=0) / counts)
+    return np.nan_to_num(centred / np.where(std > 0, std, 1), nan=0.0)
+
+
+class SubstituteIndex:
+    """
+    Nearest-neighbour index over the nutrient vectors of the combined dataset.
+
+    Args:
+        combined_df (pd.DataFrame): The combined flavour/nutrition dataset, with a 'molecule_set' column.
+        nutrients (str): 'macros' (PROT/FAT/CHO) or 'all' (every NEVO nutrient column).
+        w_nutrition (float): Weight of the nutrient distance in the reranking.
+        w_molecule (float): Weight of the molecule Jaccard distance in the reranking.
+        pool (int): Number of nearest ingredients that are reranked.
+    """
+
+    def __init__(self, combined_df: pd.DataFrame, nutrients: str = 'macros', w_nutrition: float = 0.5,
+                 w_molecule: float = 0.5, pool: int = 50):
+        if nutrients not in ('macros', 'all'):
+            raise ValueError(f"nutrients must be 'macros' or 'all', not '{nutrients}'")
+
+        self.w_nutrition = w_nutrition
+        self.w_molecule = w_molecule
+        self.pool = pool
+
+        self.names = combined_df['clean_ingredient'].tolist()
+        self.ids = combined_df['ID'].tolist()
+        self.columns = NUTRITION_COLUMNS if nutrients == 'macros' else nutrient_columns(combined_df)
+        self.vectors = nutrient_vectors(combined_df, self.columns)
+        self.squared_norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        self.molecule_index = MoleculeIndex(combined_df['molecule_set'].tolist())
+        self.tree = cKDTree(self.vectors) if cKDTree is not None and len(self.vectors) else None
+
+        # An ingredient is looked up by its first row; all rows with its name are never its own substitute
+        self.name_to_row: Dict[str, int] = {}
+        for row, name in enumerate(self.names):
+            self.name_to_row.setdefault(name, row)
+        self.row_names = pd.factorize(pd.Series(self.names))[0]
+        self.name_rows = np.bincount(self.row_names, minlength=1)
+
+    @classmethod
+    def from_csv(cls, combined_path: str, nutrients: str = 'macros', w_nutrition: float = 0.5,
+                 w_molecule: float = 0.5, pool: int = 50) -> 'SubstituteIndex':
+        """
+        Builds the index from the combined flavour/nutrition CSV (read through the columnar cache).
+        """
+        combined_df = read_csv_cached(combined_path, low_memory=False)
+        combined_df['molecule_set'] = combined_df['molecule_list'].apply(get_molecule_list)
+        return cls(combined_df, nutrients, w_nutrition, w_molecule, pool)
+
+    def nearest(self, rows: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the n nearest rows (Euclidean, the query rows included) of every query row.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Distances and rows, both of shape (queries, n), nearest first.
+        """
+        if self.tree is not None:
+            distances, neighbours = self.tree.query(self.vectors[rows], k=n)
+            return distances.reshape(len(rows), n), neighbours.reshape(len(rows), n)
+
+        # Exact search, a block of queries at a time
+        block = max(1, MAX_BLOCK_VALUES // max(len(self.vectors), n * self.vectors.shape[1]))
+        distances = np.empty((len(rows), n))
+        neighbours = np.empty((len(rows), n), dtype=np.int64)
+        for start in range(0, len(rows), block):
+            part = slice(start, start + block)
+            distances[part], neighbours[part] = self._nearest_exact(rows[part], n)
+        return distances, neighbours
+
+    def _nearest_exact(self, rows: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        # The n smallest squared distances through one matrix product, then the exact distances of those n sorted
+        # (lowest row first on ties)
+        queries = self.vectors[rows]
+        squared = self.squared_norms[rows][:, None] + self.squared_norms[None, :] - 2 * (queries @ self.vectors.T)
+        if n < squared.shape[1]:
+            neighbours = np.argpartition(squared, n - 1, axis=1)[:, :n]
+
+            # A query with more rows than n within rounding of its n-th distance (a tie at the boundary) gets those
+            # rows ranked exactly, so the tie goes to the lowest row like everywhere else
+            tolerance = 1e-9 * (self.squared_norms[rows] + self.squared_norms.max() + 1)
+            boundary = np.take_along_axis(squared, neighbours, axis=1).max(axis=1) + tolerance
+            for query in np.flatnonzero((squared <= boundary[:, None]).sum(axis=1) > n):
+                candidates = np.flatnonzero(squared[query] <= boundary[query])
+                exact = ((self.vectors[candidates] - queries[query]) ** 2).sum(axis=-1)
+                neighbours[query] = candidates[np.lexsort((candidates, exact))[:n]]
+        else:
+            neighbours = np.tile(np.arange(squared.shape[1]), (len(rows), 1))
+        candidate_squared = ((self.vectors[neighbours] - queries[:, None, :]) ** 2).sum(axis=-1)
+        order = np.lexsort((neighbours, candidate_squared), axis=-1)
+        neighbours = np.take_along_axis(neighbours, order, axis=1)
+        return np.sqrt(np.take_along_axis(candidate_squared, order, axis=1)), neighbours
+
+    def substitutes_batch(self, ingredients: Iterable[str], k: int = 10,
+                          chunk_size: int = 1024) -> List[np.ndarray]:
+        """
+        Finds the k best substitutes of every ingredient.
+
+        The `pool` nearest ingredients in nutrient space (other than the ingredient itself) are scored with
+        `w_nutrition * distance / pool_max_distance + w_molecule * (1 - jaccard)`, and the k lowest scores are
+        kept (lowest row first on ties).
+
+        Args:
+            ingredients (Iterable[str]): Ingredient names ('clean_ingredient').
+            k (int): Number of substitutes per ingredient.
+            chunk_size (int): Ingredients that are reranked at once (the NumPy search also works in blocks of at
+                most `MAX_BLOCK_VALUES` values).
+
+        Returns:
+            List[np.ndarray]: Per ingredient a structured array (see `SUBSTITUTE_DTYPE`), best first.
+
+        Raises:
+            KeyError: If an ingredient is not in the combined dataset.
+        """
+        rows = np.array([self.name_to_row[name] for name in ingredients], dtype=np.int64)
+        results = []
+        for start in range(0, len(rows), chunk_size):
+            results += self._substitutes(rows[start:start + chunk_size], k)
+        return results
+
+    def _substitutes(self, rows: np.ndarray, k: int) -> List[np.ndarray]:
+        # Rows with the same name as the query take pool places, so the pool is widened by the largest name group
+        n = min(len(self.names), self.pool + int(self.name_rows[self.row_names[rows]].max(initial=0)))
+        if not len(rows) or not n:
+            return [np.empty(0, dtype=SUBSTITUTE_DTYPE) for _ in rows]
+        distances, neighbours = self.nearest(rows, n)
+
+        # Jaccard overlap of every query with its pool, on the molecule bitsets
+        bits = self.molecule_index.bits
+        sizes = self.molecule_index.sizes
+        intersection = popcount(bits[neighbours] & bits[rows][:, None, :])
+        union = sizes[neighbours] + sizes[rows][:, None] - intersection
+        jaccard = np.divide(intersection, union, out=np.zeros(union.shape), where=union > 0)
+
+        # The query itself (and its other rows) is not a substitute; only the first `pool` others are reranked
+        is_other = self.row_names[neighbours] != self.row_names[rows][:, None]
+        in_pool = is_other & (np.cumsum(is_other, axis=1) <= self.pool)
+        scale = np.where(in_pool, distances, 0).max(axis=1, keepdims=True)
+        scale[scale == 0] = 1
+        score = self.w_nutrition * distances / scale + self.w_molecule * (1 - jaccard)
+        score[~in_pool] = np.inf
+
+        order = np.lexsort((neighbours, score), axis=-1)[:, :k]
+        results = []
+        for query in range(len(rows)):
+            picked = order[query][np.isfinite(score[query, order[query]])]
+            result = np.empty(len(picked), dtype=SUBSTITUTE_DTYPE)
+            result['index'] = neighbours[query, picked]
+            result['name'] = [self.names[row] for row in result['index']]
+            result['ID'] = [self.ids[row] for row in result['index']]
+            result['distance'] = distances[query, picked]
+            result['jaccard'] = jaccard[query, picked]
+            result['score'] = score[query, picked]
+            results.append(result)
+        return results
+
+    def substitutes(self, ingredient: str, k: int = 10) -> np.ndarray:
+        """
+        Finds the k best substitutes of one ingredient (see `substitutes_batch`).
+        """
+        return self._substitutes(np.array([self.name_to_row[ingredient]]), k)[0]
+
+    def substitutes_dict(self, ingredient: str, k: int = 10, result: Optional[np.ndarray] = None) -> List[dict]:
+        """
+        The substitutes of an ingredient as JSON-ready dicts.
+        """
+        result = self.substitutes(ingredient, k) if result is None else result
+        return [
+            {
+                'name': row['name'],
+                'ID': row['ID'],
+                'distance': round(float(row['distance']), 6),
+                'jaccard': round(float(row['jaccard']), 6),
+                'score': round(float(row['score']), 6)
+            }
+            for row in result
+        ]
@@ -0,0 +1,294 @@
+"""
+This file contains the training data of the ChefGPT model: the labelled recipes as padded token sequences in
+sharded `.npz` files, so a training run doesn't parse the (huge) labelled JSON file every epoch:
+
+1. `build_vocabulary` / `encode_recipe`:
+   - Every ingredient of the combined dataset is one token (0 is padding, 1 an unknown ingredient); names are
+     stripped and lowercased, in the vocabulary, the recipes and the labels alike. A recipe becomes the tokens
+     of its normalised ingredient set (distinct and sorted, padded or cut to `max_length`), the token of its
+     best target ingredient (the `ingredient_output` label) and its `total_loss` (the `score_output` target).
+     Inference (helper_inference) encodes recipes the same way.
+
+2. `export_training_shards`:
+   - Streams the labelled recipes into shards of `shard_size` recipes ('shard-00000.npz', ...) with the arrays
+     'tokens' (int32, recipes x max_length), 'lengths', 'labels' (int32) and 'total_loss' (float32), and writes
+     'vocabulary.json' and 'manifest.json' (written last, so an export is only used once it is complete).
+   - The manifest records the `FORMAT_VERSION` and `ENCODING` of the export; `check_manifest` refuses an export
+     that was encoded differently from the current code (e.g. by an older version, before the normalisation).
+
+3. `iter_training_batches`:
+   - Reads the shards back as batches of NumPy arrays (no TensorFlow needed).
+
+4. `training_dataset`:
+   - The `tf.data` reader: the shards are read in parallel (`interleave`), cached after the first epoch, shuffled,
+     batched and prefetched, so the training steps don't wait for the input. TensorFlow is only imported here.
+"""
+
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+# Tokens of the padding and of ingredients that are not in the vocabulary
+PAD_TOKEN = '<pad>'
+UNKNOWN_TOKEN = '<unk>'
+
+# Arrays of every shard
+SHARD_ARRAYS = ['tokens', 'lengths', 'labels', 'total_loss']
+
+MANIFEST_FILE = 'manifest.json'
+VOCABULARY_FILE = 'vocabulary.json'
+
+# Version of the export layout, and how a recipe is turned into tokens. Change them when the encoding changes, so
+# old exports (and the models trained on them) are refused instead of silently getting the wrong tokens
+FORMAT_VERSION = 2
+ENCODING = 'normalised-ingredient-set'
+
+
+def normalise_ingredient(name: str) -> str:
+    """
+    Returns the ingredient name as it is tokenised: stripped and lowercased.
+    """
+    return name.strip().lower()
+
+
+def build_vocabulary(ingredients: Iterable[str]) -> List[str]:
+    """
+    Builds the token vocabulary: padding, unknown, then the distinct normalised ingredients sorted.
+
+    Args:
+        ingredients (Iterable[str]): Ingredient names, e.g. the 'clean_ingredient' column of the combined dataset.
+
+    Returns:
+        List[str]: The vocabulary; the token of an ingredient is its position.
+    """
+    names = {normalise_ingredient(ingredient) for ingredient in ingredients}
+    return [PAD_TOKEN, UNKNOWN_TOKEN] + sorted(names - {PAD_TOKEN, UNKNOWN_TOKEN})
+
+
+def normalised_ingredients(recipe: dict) -> List[str]:
+    """
+    Returns the distinct ingredient names of a recipe, stripped, lowercased and sorted.
+    """
+    return sorted({normalise_ingredient(ingredient['ingredient'])
+                   for ingredient in recipe.get('matched_ingredients', [])})
+
+
+def encode_recipe(recipe: dict, token_ids: Dict[str, int],
+                  max_length: int) -> Optional[Tuple[List[int], int, float]]:
+    """
+    Encodes a labelled recipe as (ingredient tokens, label token, total_loss).
+
+    Args:
+        recipe (dict): A recipe with 'matched_ingredients' and 'best_target_ingredient'.
+        token_ids (Dict[str, int]): Token per ingredient (see `build_vocabulary`).
+        max_length (int): Maximum number of ingredient tokens; the ingredients after it (sorted) are cut off.
+
+    Returns:
+        Optional[Tuple[List[int], int, float]]: None if the recipe has no best target ingredient, or one that
+        is not in the vocabulary.
+    """
+    target = recipe.get('best_target_ingredient')
+    label = normalise_ingredient(target['name']) if target and target.get('name') else None
+    if label not in token_ids:
+        return None
+
+    unknown = token_ids[UNKNOWN_TOKEN]
+    tokens = [token_ids.get(ingredient, unknown) for ingredient in normalised_ingredients(recipe)]
+    return tokens[:max_length], token_ids[label], float(target['total_loss'])
+
+
+def _write_shard(path: str, arrays: Dict[str, np.ndarray]):
+    # Written under a temporary name and renamed, so a shard file is always complete
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(tmp_path, path)
+
+
+def export_training_shards(recipes: Iterable[dict], vocabulary: List[str], output_directory: str,
+                           max_length: int = 32, shard_size: int = 50_000) -> dict:
+    """
+    Writes the labelled recipes as sharded, padded token sequences (see the file docstring for the layout).
+
+    Args:
+        recipes (Iterable[dict]): The labelled recipes, e.g. from `iter_recipes` (read lazily).
+        vocabulary (List[str]): The token vocabulary (see `build_vocabulary`).
+        output_directory (str): Directory of the shards, created if needed.
+        max_length (int): Length of the padded sequences.
+        shard_size (int): Recipes per shard.
+
+    Returns:
+        dict: The manifest: the shards with their number of recipes, and the numbers of written, skipped and
+        cut off recipes.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    token_ids = {token: token_id for token_id, token in enumerate(vocabulary)}
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'encoding': ENCODING,
+        'max_length': max_length,
+        'vocabulary_size': len(vocabulary),
+        'shards': [],
+        'recipes': 0,
+        'skipped': 0,
+        'truncated': 0
+    }
+
+    # One shard is filled in preallocated arrays and written when it is full
+    def empty_shard():
+        return {
+            'tokens': np.zeros((shard_size, max_length), dtype=np.int32),
+            'lengths': np.zeros(shard_size, dtype=np.int32),
+            'labels': np.zeros(shard_size, dtype=np.int32),
+            'total_loss': np.zeros(shard_size, dtype=np.float32)
+        }
+
+    def flush(arrays, rows):
+        name = f'shard-{len(manifest["shards"]):05d}.npz'
+        _write_shard(os.path.join(output_directory, name), {key: values[:rows] for key, values in arrays.items()})
+        manifest['shards'].append({'path': name, 'recipes': rows})
+
+    arrays, rows = empty_shard(), 0
+    for recipe in recipes:
+        encoded = encode_recipe(recipe, token_ids, max_length)
+        if encoded is None:
+            manifest['skipped'] += 1
+            continue
+
+        tokens, label, total_loss = encoded
+        manifest['truncated'] += len(normalised_ingredients(recipe)) > max_length
+        arrays['tokens'][rows, :len(tokens)] = tokens
+        arrays['lengths'][rows] = len(tokens)
+        arrays['labels'][rows] = label
+        arrays['total_loss'][rows] = total_loss
+        rows += 1
+
+        if rows == shard_size:
+            flush(arrays, rows)
+            arrays['tokens'][:] = 0
+            rows = 0
+    if rows:
+        flush(arrays, rows)
+
+    manifest['recipes'] = sum(shard['recipes'] for shard in manifest['shards'])
+    with open(os.path.join(output_directory, VOCABULARY_FILE), 'w') as file:
+        json.dump(vocabulary, file)
+    with open(os.path.join(output_directory, MANIFEST_FILE), 'w') as file:
+        json.dump(manifest, file, indent=4)
+    return manifest
+
+
+def read_manifest(directory: str) -> dict:
+    """
+    Reads the manifest of an export (see `export_training_shards`).
+    """
+    with open(os.path.join(directory, MANIFEST_FILE), 'r') as file:
+        return json.load(file)
+
+
+def check_manifest(manifest: dict):
+    """
+    Raises a ValueError if an export was not encoded like the current code encodes recipes.
+    """
+    found = (manifest.get('format_version'), manifest.get('encoding'))
+    if found != (FORMAT_VERSION, ENCODING):
+        raise ValueError(f"The training export has format version {found[0]} and encoding {found[1]!r}, expected "
+                         f"{FORMAT_VERSION} and {ENCODING!r}. Export the training data again (chefgpt "
+                         f"export-training) and retrain the model on it.")
+
+
+def load_shard(path: str) -> Dict[str, np.ndarray]:
+    """
+    Loads the arrays of one shard.
+    """
+    with np.load(path) as shard:
+        return {key: shard[key] for key in SHARD_ARRAYS}
+
+
+def iter_training_batches(directory: str, batch_size: int = 32,
+                          seed: Optional[int] = None) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+    """
+    Yields the exported recipes as batches, one shard in memory at a time.
+
+    Args:
+        directory (str): The export directory.
+        batch_size (int): Recipes per batch (the last batch of a shard can be smaller).
+        seed (Optional[int]): Shuffle the shard order and the recipes within a shard with this seed.
+
+    Yields:
+        Tuple[np.ndarray, Dict[str, np.ndarray]]: The tokens, and the 'ingredient_output' labels and
+        'score_output' targets of a batch.
+    """
+    shards = [os.path.join(directory, shard['path']) for shard in read_manifest(directory)['shards']]
+    random = np.random.default_rng(seed) if seed is not None else None
+    if random is not None:
+        shards = [shards[position] for position in random.permutation(len(shards))]
+
+    for path in shards:
+        shard = load_shard(path)
+        order = random.permutation(len(shard['labels'])) if random is not None else None
+        for start in range(0, len(shard['labels']), batch_size):
+            rows = slice(start, start + batch_size) if order is None else order[start:start + batch_size]
+            yield shard['tokens'][rows], {'ingredient_output': shard['labels'][rows],
+                                          'score_output': shard['total_loss'][rows]}
+
+
+def training_dataset(directory: str, batch_size: int = 32, shuffle_buffer: int = 10_000,
+                     cache: Optional[str] = '', one_hot: bool = True, cycle_length: int = 4,
+                     seed: Optional[int] = None):
+    """
+    Builds the `tf.data` pipeline over an export for `model.fit`.
+
+    The shards are loaded `cycle_length` at a time in parallel and interleaved, cached (in memory, or in a file),
+    shuffled, batched and prefetched.
+
+    Args:
+        directory (str): The export directory.
+        batch_size (int): Recipes per batch (the notebook trained with 32).
+        shuffle_buffer (int): Recipes in the shuffle buffer (0 to keep the order).
+        cache (Optional[str]): '' caches in memory, a path caches in that file, None doesn't cache.
+        one_hot (bool): One-hot labels for categorical cross-entropy (the notebook's loss), otherwise the token
+            (for sparse categorical cross-entropy).
+        cycle_length (int): Shards that are read at the same time.
+        seed (Optional[int]): Seed of the shuffle; with a seed the interleaving is deterministic as well.
+
+    Returns:
+        tf.data.Dataset: Batches of (tokens, {'ingredient_output': ..., 'score_output': ...}).
+    """
+    import tensorflow as tf
+
+    manifest = read_manifest(directory)
+    max_length, vocabulary_size = manifest['max_length'], manifest['vocabulary_size']
+    paths = [os.path.join(directory, shard['path']) for shard in manifest['shards']]
+
+    def load(path):
+        shard = load_shard(path.decode())
+        return shard['tokens'], shard['labels'], shard['total_loss']
+
+    def shard_dataset(path):
+        # A whole shard is loaded in one call and then split into recipes, instead of yielding recipe by recipe
+        tokens, labels, total_loss = tf.numpy_function(load, [path], (tf.int32, tf.int32, tf.float32))
+        tokens.set_shape((None, max_length))
+        labels.set_shape((None,))
+        total_loss.set_shape((None,))
+        return tf.data.Dataset.from_tensor_slices((tokens, labels, total_loss))
+
+    def to_model(tokens, labels, total_loss):
+        ingredient_output = tf.one_hot(labels, vocabulary_size) if one_hot else labels
+        return tokens, {'ingredient_output': ingredient_output, 'score_output': total_loss}
+
+    dataset = tf.data.Dataset.from_tensor_slices(paths).interleave(
+        shard_dataset,
+        cycle_length=max(1, min(cycle_length, len(paths))),
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=seed is not None
+    )
+    if cache is not None:
+        dataset = dataset.cache(cache)
+    if shuffle_buffer:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).map(to_model, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,48 @@
+"""
+Shared fixtures of the tests. The helpers are imported like the scripts do (`from helper_functions...`), so the
+Code directory is put on the path.
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import make_data  # noqa: E402
+from helper_functions.helper_pairing import DEFAULT_TARGET_MACROS, PairingEngine, get_molecule_list  # noqa: E402
+
+
+@pytest.fixture
+def combined_df() -> pd.DataFrame:
+    """
+    A small combined dataset: five ingredients with overlapping molecules and different macros.
+    """
+    return pd.DataFrame({
+        'clean_ingredient': ['butter', 'garlic', 'onion', 'tomato', 'basil'],
+        'ID': ['1', '2', '3', '4', '5'],
+        'PROT (g)': [0.9, 6.4, 1.1, 0.9, 3.2],
+        'FAT (g)': [81.0, 0.5, 0.1, 0.2, 0.6],
+        'CHO (g)': [0.1, 33.1, 9.3, 3.9, 2.7],
+        'molecule_set': [{'a', 'b'}, {'b', 'c', 'd'}, {'c', 'd'}, {'d', 'e'}, {'e', 'f', 'a'}]
+    })
+
+
+@pytest.fixture
+def engine(combined_df) -> PairingEngine:
+    """
+    The engine of the small combined dataset.
+    """
+    return PairingEngine(combined_df, DEFAULT_TARGET_MACROS)
+
+
+@pytest.fixture(scope='session')
+def synthetic_data() -> dict:
+    """
+    The synthetic inputs of the '1k' benchmarks (see benchmarks/run.py), shared by the tests. Don't modify them.
+    """
+    data = make_data('1k')
+    data['combined_df']['molecule_set'] = data['combined_df']['molecule_list'].apply(get_molecule_list)
+    return data
@@ -0,0 +1,33 @@
+"""
+Tests of `combine_flavour_nutrition` against the groupby + merge it replaced (benchmarks/legacy.py).
+"""
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from benchmarks.legacy import combine_flavour_nutrition_merge
+from helper_functions.helper_combine import combine_flavour_nutrition
+
+
+def datasets(numeric: bool):
+    flavour_df = pd.DataFrame({
+        'ingredient': ['Butter', 'garlic', 'Onion', 'basil'],
+        'molecule_list': [['a'], ['b', 'c'], ['c'], ['d']]
+    })
+    nevo_df = pd.DataFrame({
+        'flavour_name': ['butter', 'garlic', 'garlic', 'onion', None],
+        'flavour_index': [1.0, 2.0, 2.0, 3.0, 4.0],
+        'NEVO-code': ['10', '20', '21', '30', '40']
+    })
+    if numeric:
+        nevo_df['FAT (g)'] = [81.0, 0.5, 0.7, 0.1, 1.0]
+    return flavour_df, nevo_df
+
+
+@pytest.mark.parametrize('numeric', [True, False])
+def test_combine_matches_merge(numeric):
+    expected = combine_flavour_nutrition_merge(*datasets(numeric))
+    combined = combine_flavour_nutrition(*datasets(numeric))
+    pdt.assert_frame_equal(combined, expected, check_dtype=False)
+    assert len(combined) == 3
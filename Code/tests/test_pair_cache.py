@@ -0,0 +1,33 @@
+"""
+Tests of the persistent pair score cache: disk hits across runs, and a rebuild when the molecules change.
+"""
+
+from helper_functions.helper_pair_cache import measure_pair_cache, molecule_pair_cache
+from helper_functions.helper_pairing import DEFAULT_TARGET_MACROS, PairingEngine
+
+
+def recipes(engine):
+    return [{'matched_ingredients': [{'ingredient': name}]} for name in engine.names]
+
+
+def test_disk_tier_is_reused(engine, tmp_path):
+    path = str(tmp_path / 'pair_overlap.f32')
+    first = measure_pair_cache(engine, molecule_pair_cache(engine, path), recipes(engine))
+    second = measure_pair_cache(engine, molecule_pair_cache(engine, path), recipes(engine))
+
+    assert first['disk_hits'] == 0 and first['max_difference'] == 0
+    assert second['misses'] == 0 and second['disk_hits'] == first['misses']
+    assert second['max_difference'] < 1e-6
+
+
+def test_disk_tier_is_rebuilt_for_other_molecules(combined_df, engine, tmp_path):
+    path = str(tmp_path / 'pair_overlap.f32')
+    measure_pair_cache(engine, molecule_pair_cache(engine, path), recipes(engine))
+
+    # Same IDs, other molecules (a regenerated combined dataset)
+    combined_df['molecule_set'] = [{'x'}, {'x', 'y'}, {'y'}, {'z'}, {'x', 'z'}]
+    changed = PairingEngine(combined_df, DEFAULT_TARGET_MACROS)
+    stats = measure_pair_cache(changed, molecule_pair_cache(changed, path), recipes(changed))
+
+    assert stats['disk_hits'] == 0
+    assert stats['max_difference'] < 1e-6
@@ -0,0 +1,123 @@
+"""
+Tests of the pairing search: the engine against the iterrows loop it replaced (benchmarks/legacy.py), and the
+pruned search against the exhaustive one, with and without the fallback.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks import synthetic
+from benchmarks.legacy import best_target_ingredient_iterrows, candidate_losses_iterrows
+from helper_functions.helper_pairing import DEFAULT_TARGET_MACROS, NUTRITION_COLUMNS, PairingEngine
+
+
+def recipe(*ingredients):
+    """
+    A recipe of (name, (protein, fat, carbohydrates)) ingredients, with the nutrition as `recipe_nutrition` reads it.
+    """
+    return {'matched_ingredients': [{'ingredient': name, 'nutrition': dict(zip(NUTRITION_COLUMNS, macros))}
+                                    for name, macros in ingredients]}
+
+
+@pytest.fixture
+def sparse_engine() -> PairingEngine:
+    """
+    60 candidates with few molecules out of many, so most candidates share none with a recipe and can be pruned.
+    """
+    random = np.random.default_rng(0)
+    rows = 60
+    combined_df = pd.DataFrame(random.gamma(1.0, 8.0, (rows, 3)).round(1), columns=NUTRITION_COLUMNS)
+    combined_df.insert(0, 'clean_ingredient', [f'ingredient {row}' for row in range(rows)])
+    combined_df.insert(1, 'ID', [str(row) for row in range(rows)])
+    molecule_sets = [{f'm{molecule}' for molecule in random.integers(0, 150, 4)} for _ in range(rows)]
+    molecule_sets[7] = set()
+    combined_df['molecule_set'] = molecule_sets
+    return PairingEngine(combined_df, DEFAULT_TARGET_MACROS)
+
+
+def random_recipes(engine, count, seed=1):
+    random = np.random.default_rng(seed)
+    return [
+        recipe(*[(engine.names[row], tuple(random.gamma(1.0, 10.0, 3).round(1)))
+                 for row in random.choice(len(engine.names), random.integers(1, 5), replace=False)])
+        for _ in range(count)
+    ]
+
+
+@pytest.fixture(scope='module')
+def legacy_cases(synthetic_data):
+    """
+    An engine over 60 synthetic candidates, and 15 synthetic recipes, an empty one and one without nutrition (the
+    iterrows loop is slow, so the inputs are kept small).
+    """
+    combined_df = synthetic_data['combined_df'].head(60).copy()
+    recipes = synthetic.recipes(15, combined_df, seed=1, max_ingredients=5) + [
+        {'matched_ingredients': []},
+        {'matched_ingredients': [{'ingredient': name} for name in combined_df['clean_ingredient'][:3]]}
+    ]
+    return PairingEngine(combined_df, DEFAULT_TARGET_MACROS, 0.4, 0.6), combined_df, recipes
+
+
+def test_engine_matches_iterrows_loop(legacy_cases):
+    engine, combined_df, recipes = legacy_cases
+    for recipe in recipes:
+        expected = best_target_ingredient_iterrows(recipe, combined_df, DEFAULT_TARGET_MACROS, 0.4, 0.6)
+        assert engine.best_target_ingredient(recipe) == expected
+        assert engine.best_target_ingredient_pruned(recipe, max_sharing=1.0) == expected
+
+
+def test_suggest_matches_iterrows_loop(legacy_cases):
+    engine, combined_df, recipes = legacy_cases
+    for recipe in recipes:
+        candidates = candidate_losses_iterrows(recipe, combined_df, DEFAULT_TARGET_MACROS, 0.4, 0.6)
+
+        # Sorted by total loss, the first candidate first on ties; only finite losses can be suggested
+        expected = sorted((candidate for candidate in candidates if math.isfinite(candidate[0])),
+                          key=lambda candidate: candidate[0])[:10]
+        suggestions = engine.suggest(recipe, 10)
+        assert suggestions['name'].tolist() == [candidate['name'] for _, candidate in expected]
+        np.testing.assert_allclose(suggestions['total_loss'], [total_loss for total_loss, _ in expected],
+                                   rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize('ingredients', [
+    [('butter', (0.9, 81.0, 0.1))],
+    [('garlic', (6.4, 0.5, 33.1))],
+    [('tomato', (0.9, 0.2, 3.9)), ('basil', (3.2, 0.6, 2.7))],
+    []
+])
+@pytest.mark.parametrize('max_sharing', [0.0, 0.5, 1.0])
+def test_pruned_matches_exhaustive(engine, ingredients, max_sharing):
+    stats = {}
+    assert engine.best_target_ingredient_pruned(recipe(*ingredients), stats, max_sharing) == \
+        engine.best_target_ingredient(recipe(*ingredients))
+    assert stats['candidates'] == 5
+
+
+# Ingredient 7 has no molecules: its Jaccard overlaps are NaN, like in the real data
+@pytest.mark.filterwarnings('ignore:invalid value encountered in divide:RuntimeWarning')
+def test_pruned_skips_candidates_with_the_same_result(sparse_engine):
+    pruned, scored = 0, 0
+    for random_recipe in random_recipes(sparse_engine, 200):
+        stats = {}
+        assert sparse_engine.best_target_ingredient_pruned(random_recipe, stats, max_sharing=1.0) == \
+            sparse_engine.best_target_ingredient(random_recipe)
+        assert not stats['exhaustive'] and stats['sharing'] < stats['candidates']
+        pruned += stats['pruned'] > 0
+        scored += stats['pruned'] == 0
+
+    # Both sides of the nutrition bound are exercised: groups that were skipped, and groups that had to be scored
+    assert pruned and scored
+
+
+def test_pruned_falls_back_when_most_candidates_share(engine):
+    # Garlic shares a molecule with butter, onion and tomato: 4 of the 5 candidates
+    stats = {}
+    engine.best_target_ingredient_pruned(recipe(('garlic', (6.4, 0.5, 33.1))), stats, max_sharing=0.5)
+    assert stats['exhaustive'] and stats['sharing'] == 5
+
+    engine.best_target_ingredient_pruned(recipe(('garlic', (6.4, 0.5, 33.1))), stats, max_sharing=0.9)
+    assert not stats['exhaustive'] and stats['sharing'] == 4
@@ -0,0 +1,31 @@
+"""
+Tests of the ingredient recogniser: longest alias wins, and no match runs across a list separator.
+"""
+
+import pytest
+
+from helper_functions.helper_recognise import IngredientRecogniser, line_segments
+
+
+@pytest.fixture
+def recogniser() -> IngredientRecogniser:
+    return IngredientRecogniser([
+        ('peanut butter', 'peanut butter'), ('peanut', 'peanut'), ('butter', 'butter'),
+        ('butter bean', 'butter bean'), ('bean', 'bean'), ('tomato', 'tomato'), ('olive oil', 'olive oil')
+    ])
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('2 tbsp peanut butter', ['peanut butter']),
+    ('2 tbsp Peanut-Butter', ['peanut butter']),
+    ('1 peanut, butter', ['peanut', 'butter']),
+    ('100 g butter, beans', ['butter', 'bean']),
+    ('butter beans (or peanut) / tomatoes; olive oil', ['butter bean', 'peanut', 'tomato', 'olive oil']),
+    ('salt, pepper', []),
+])
+def test_recognise(recogniser, line, expected):
+    assert recogniser.recognise(line) == expected
+
+
+def test_line_segments():
+    assert line_segments('2 Tomatoes, (chopped) ;') == [['2', 'tomato'], ['chopped']]
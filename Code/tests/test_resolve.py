@@ -0,0 +1,100 @@
+"""
+Tests of the fuzzy matcher and the match resolver against the `process.extract` loop and the wide pivot they
+replaced (benchmarks/legacy.py).
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from rapidfuzz import fuzz, process
+
+from benchmarks import synthetic
+from benchmarks.legacy import resolve_top_matches_pivot
+from helper_functions.helper_fuzzy import FuzzyMatcher
+from helper_functions.helper_resolve import matches_frame, resolve_matches, top_k_arrays
+
+NAME_COLUMNS = ['entity_alias_readable', 'entity_alias']
+
+
+@pytest.fixture(scope='module')
+def matching_case():
+    """
+    60 of the 300 flavour entities the NEVO names are based on, with a second name column that has missing
+    (None) names, and 80 NEVO names plus an empty one (every choice scores 0 against it).
+    """
+    entities = synthetic.flavour_entities(300, n_molecules=50)
+    flavour_df = entities.sample(60, random_state=1).reset_index(drop=True)
+    flavour_df['entity_alias'] = [None if row % 5 == 0 else name.lower().replace(' ', '')
+                                  for row, name in enumerate(flavour_df['entity_alias_readable'])]
+    names = synthetic.nevo_rows(80, entities, seed=2)['Engelse naam/Food name'].str.lower().tolist() + ['']
+    return names, flavour_df
+
+
+def extract_loop(names, flavour_df):
+    """
+    The long table of the scripts before `FuzzyMatcher`: one `process.extract` call per name and column.
+    """
+    top_matches = []
+    for idx, cleaned_name in enumerate(names):
+        for name_column in NAME_COLUMNS:
+            matches = process.extract(cleaned_name, flavour_df[name_column].tolist(), limit=3,
+                                      scorer=fuzz.partial_ratio)
+            for match, score, match_index in matches:
+                top_matches.append({
+                    'nutrition_index': idx,
+                    'nutrition_name': cleaned_name,
+                    'flavour_index': match_index,
+                    'flavour_name': match,
+                    'fuzz_score': score,
+                    'name_column': name_column
+                })
+    return pd.DataFrame(top_matches)
+
+
+def resolved_pairs(resolved_df):
+    # The pivot concatenates the rules one after the other, so the (row, label) pairs are compared sorted
+    return sorted(zip(resolved_df['nutrition_index'].astype(int), resolved_df['flavour_index'].astype(int)))
+
+
+def test_extract_matches_process_extract(matching_case):
+    names, flavour_df = matching_case
+    expected = extract_loop(names, flavour_df)
+    result = FuzzyMatcher(flavour_df, NAME_COLUMNS, limit=3).extract(names)
+
+    # The None choices are skipped, but the flavour indices still point at the rows of flavour_df
+    assert flavour_df['entity_alias'].isna().any()
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('consensus_score, threshold', [(70, 75), (80, 90)])
+def test_resolve_matches_pivot(matching_case, consensus_score, threshold):
+    names, flavour_df = matching_case
+    top_matches_df = extract_loop(names, flavour_df)
+    expected = resolve_top_matches_pivot(top_matches_df, threshold, consensus_score)
+
+    # The matcher's arrays and the arrays of the long table resolve the same rows
+    matcher_arrays = FuzzyMatcher(flavour_df, NAME_COLUMNS, limit=3).top_k(names, 3)
+    table_arrays = top_k_arrays(top_matches_df, len(names), 3)
+    np.testing.assert_array_equal(matcher_arrays[0], table_arrays[0])
+    np.testing.assert_array_equal(matcher_arrays[1], table_arrays[1])
+
+    result = matches_frame(*resolve_matches(*table_arrays, consensus_score, threshold))
+    assert 0 < len(result) < len(names)
+    assert resolved_pairs(result) == resolved_pairs(expected)
+
+
+def test_resolve_matches_pivot_rules():
+    # Every rule, a tie, a row without a match and a row with only two matches (its third column is missing)
+    top_matches_df = pd.DataFrame([
+        (1, 7, 85), (0, 5, 100), (1, 7, 82), (0, 4, 90), (1, 7, 81), (0, 3, 80),
+        (2, 3, 50), (2, 2, 95), (2, 3, 95),
+        (3, 1, 60), (3, 1, 50), (3, 2, 40),
+        (4, 1, 92), (4, 1, 92),
+        (5, 6, 85), (5, 6, 99), (5, 6, 85)
+    ], columns=['nutrition_index', 'flavour_index', 'fuzz_score'])
+    expected = resolve_top_matches_pivot(top_matches_df, 90, 80)
+
+    label, rule = resolve_matches(*top_k_arrays(top_matches_df, 6, 3), 80, 90)
+    result = matches_frame(label, rule)
+    assert result['rule'].tolist() == ['perfect', 'consensus', 'threshold', 'threshold', 'consensus']
+    assert resolved_pairs(result) == resolved_pairs(expected) == [(0, 5), (1, 7), (2, 2), (4, 1), (5, 6)]
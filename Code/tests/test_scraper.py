@@ -0,0 +1,108 @@
+"""
+Tests of the FlavourDB scraper against a stub server on 127.0.0.1 (no network access needed).
+"""
+
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from helper_functions.helper_scraper import combine_jsonl, read_checkpoint, scrape_entities
+
+
+class StubFlavourDB:
+    """
+    Answers '/entities_json?id=<ID>' with {"entity_id": <ID>}, except for the IDs set up otherwise:
+    `failures[ID]` 503 responses before the entity, or a fixed `payloads[ID]`.
+    """
+
+    def __init__(self):
+        self.requests = Counter()
+        self.failures = Counter()
+        self.payloads = {}
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                entity_id = int(self.path.rpartition('=')[2])
+                with stub.lock:
+                    stub.requests[entity_id] += 1
+                    fail = stub.failures[entity_id] > 0
+                    stub.failures[entity_id] -= fail
+                if fail:
+                    self.send_response(503)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = json.dumps(stub.payloads.get(entity_id, {'entity_id': entity_id})).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}/entities_json?id='
+
+
+@pytest.fixture
+def stub():
+    stub = StubFlavourDB()
+    thread = threading.Thread(target=stub.server.serve_forever, daemon=True)
+    thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+def scrape(stub, entity_ids, tmp_path, retries=2):
+    return scrape_entities(entity_ids, str(tmp_path / 'entities.jsonl'), str(tmp_path / 'entities.done'),
+                           base_url=stub.base_url, concurrency=4, retries=retries, backoff=0, timeout=5)
+
+
+def test_scrape_retries_resumes_and_combines(stub, tmp_path):
+    # ID 2 fails twice before it succeeds, ID 4 always fails
+    stub.failures[2] = 2
+    stub.failures[4] = 100
+
+    fetched, failed = scrape(stub, range(1, 5), tmp_path)
+    assert (fetched, failed) == (3, [4])
+    assert stub.requests[2] == 3
+    assert read_checkpoint(str(tmp_path / 'entities.done')) == {1, 2, 3}
+
+    # A rerun only fetches the IDs that are not in the checkpoint
+    stub.failures[4] = 0
+    stub.requests.clear()
+    fetched, failed = scrape(stub, range(1, 6), tmp_path)
+    assert (fetched, failed) == (2, [])
+    assert set(stub.requests) == {4, 5}
+
+    # An ID that is fetched again (its checkpoint line was lost) is only written once
+    (tmp_path / 'entities.done').write_text('1\n2\n4\n5\n')
+    assert scrape(stub, range(1, 6), tmp_path) == (1, [])
+
+    total = combine_jsonl(str(tmp_path / 'entities.jsonl'), str(tmp_path / 'entities.json'))
+    combined = json.loads((tmp_path / 'entities.json').read_text())
+    assert total == 5
+    assert [entity['entity_id'] for entity in combined] == [1, 2, 3, 4, 5]
+
+
+def test_combine_keys_by_requested_id(stub, tmp_path):
+    # Responses without an 'entity_id' are all kept; ones that are not a JSON object are left out
+    stub.payloads = {1: {'name': 'first'}, 2: {'name': 'second'}, 3: None, 4: [1, 2]}
+
+    assert scrape(stub, range(1, 6), tmp_path) == (5, [])
+    with open(tmp_path / 'entities.jsonl', 'a', encoding='utf-8') as f:
+        f.write('{"id": 6, "da')
+
+    total = combine_jsonl(str(tmp_path / 'entities.jsonl'), str(tmp_path / 'entities.json'))
+    combined = json.loads((tmp_path / 'entities.json').read_text())
+    assert total == 3
+    assert combined == [{'name': 'first'}, {'name': 'second'}, {'entity_id': 5}]
@@ -0,0 +1,59 @@
+"""
+Tests of the suggestion service: bad requests only fail themselves, and batched scoring gives the same
+suggestions as scoring one recipe at a time.
+"""
+
+import asyncio
+import json
+
+import numpy as np
+
+from helper_functions.helper_service import SuggestionService
+
+
+async def _post(port: int, body: bytes):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b"POST /suggest HTTP/1.1\r\nContent-Length: " + str(len(body)).encode() +
+                 b"\r\nConnection: close\r\n\r\n" + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(payload)
+
+
+def test_bad_requests_do_not_stop_the_service(engine):
+    async def run():
+        service = SuggestionService(engine, max_wait_ms=5)
+        server = await service.start('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            valid = json.dumps({'ingredients': ['butter'], 'k': 2}).encode()
+            first = await asyncio.wait_for(_post(port, valid), 5)
+            not_object = await asyncio.wait_for(_post(port, b'[1]'), 5)
+            string = await asyncio.wait_for(_post(port, b'"x"'), 5)
+            # A bad request batched with good ones only fails itself
+            batched = await asyncio.wait_for(asyncio.gather(
+                _post(port, valid),
+                _post(port, json.dumps({'ingredients': ['unknown']}).encode()),
+                _post(port, json.dumps({'matched_ingredients': [1]}).encode()),
+                _post(port, valid)
+            ), 5)
+            last = await asyncio.wait_for(_post(port, valid), 5)
+        return first, not_object, string, batched, last
+
+    first, not_object, string, batched, last = asyncio.run(run())
+    assert first[0] == 200 and len(first[1]['suggestions']) == 2
+    assert not_object[0] == 400 and string[0] == 400
+    assert [status for status, _ in batched] == [200, 400, 400, 200]
+    assert last == (200, last[1]) and last[1]['suggestions'] == first[1]['suggestions']
+
+
+def test_batch_scoring_matches_single_scoring(engine):
+    recipes = [engine.recipe_from_names(names) for names in (['butter'], ['garlic', 'onion'], [], ['basil'] * 2)]
+    excludes = [[], ['tomato'], [], ['butter']]
+    batch = engine.suggest_batch(recipes, [3, 3, 5, 2], excludes)
+    for recipe, k, exclude, suggestions in zip(recipes, [3, 3, 5, 2], excludes, batch):
+        single = engine.suggest(recipe, k, exclude)
+        assert single['name'].tolist() == suggestions['name'].tolist()
+        assert np.array_equal(single['total_loss'], suggestions['total_loss'])
@@ -0,0 +1,38 @@
+"""
+Tests of the incremental stop word search against the greedy loop it replaced (benchmarks/legacy.py).
+"""
+
+import pytest
+
+from benchmarks import synthetic
+from benchmarks.legacy import stop_words_greedy_loop
+from helper_functions.helper_merge import find_frequent_words
+from helper_functions.helper_stop_words import StopWordSearch
+
+
+@pytest.fixture(scope='module')
+def stop_word_case():
+    """
+    40 synthetic NEVO names, 120 of the 400 flavour entities they are based on (so not every name has a perfect
+    match) with a second name column that has gaps, and the 25 most common words of the names (the greedy loop
+    re-matches every name for every word, so the inputs are kept small).
+    """
+    entities = synthetic.flavour_entities(400, n_molecules=50)
+    flavour_df = entities.sample(120, random_state=0).reset_index(drop=True)
+    flavour_df['entity_alias'] = [None if row % 7 == 0 else name.lower().replace(' ', '')
+                                  for row, name in enumerate(flavour_df['entity_alias_readable'])]
+    names = synthetic.nevo_rows(40, entities, seed=3)['Engelse naam/Food name'].str.lower().tolist()
+    common_words = [word for word, _ in find_frequent_words(names, 25)]
+    return names, flavour_df, ['entity_alias_readable', 'entity_alias'], common_words
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_search_matches_greedy_loop(stop_word_case, workers):
+    names, flavour_df, name_columns, common_words = stop_word_case
+    expected = stop_words_greedy_loop(names, flavour_df, name_columns, common_words)
+    result = StopWordSearch(names, flavour_df, name_columns, workers=workers, batch_size=8).run(common_words,
+                                                                                                 verbose=False)
+
+    # Both kinds of words are exercised: words that were dropped, and kept words that added matches after the first
+    assert len(expected) < len(common_words) and expected['added_matches'][1:].sum() > 0
+    assert result.to_dict('list') == expected.to_dict('list')
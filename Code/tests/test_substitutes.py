@@ -0,0 +1,50 @@
+"""
+Tests of the substitute search: the blocked NumPy search against a brute-force one, and batch against single.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import helper_functions.helper_substitutes as helper_substitutes
+from helper_functions.helper_substitutes import SubstituteIndex
+
+
+@pytest.fixture
+def index(monkeypatch) -> SubstituteIndex:
+    # The NumPy search is tested, also when scipy is installed
+    monkeypatch.setattr(helper_substitutes, 'cKDTree', None)
+    random = np.random.default_rng(0)
+    rows = 60
+    combined_df = pd.DataFrame(random.gamma(1.0, 5.0, (rows, 6)).round(1),
+                               columns=['PROT (g)', 'FAT (g)', 'CHO (g)', 'FIBT (g)', 'NA (mg)', 'K (mg)'])
+    combined_df.iloc[::7, 3] = np.nan
+    combined_df.iloc[10] = combined_df.iloc[20]
+    combined_df.insert(0, 'clean_ingredient', [f'ingredient {row % 50}' for row in range(rows)])
+    combined_df.insert(1, 'ID', [str(row) for row in range(rows)])
+    combined_df['molecule_set'] = [{f'm{molecule}' for molecule in random.integers(0, 30, 6)} for _ in range(rows)]
+    return SubstituteIndex(combined_df, nutrients='all', pool=8)
+
+
+def test_nearest_matches_brute_force(index):
+    rows = np.arange(len(index.names))
+    distances, neighbours = index.nearest(rows, 12)
+
+    for row in rows:
+        exact = np.sqrt(((index.vectors - index.vectors[row]) ** 2).sum(axis=1))
+        expected = np.lexsort((np.arange(len(exact)), exact))[:12]
+        assert neighbours[row].tolist() == expected.tolist()
+        np.testing.assert_allclose(distances[row], exact[expected], rtol=0, atol=1e-12)
+
+
+def test_blocks_and_batches_give_the_same_substitutes(index, monkeypatch):
+    names = list(index.name_to_row)
+    single = [index.substitutes(name, 5) for name in names]
+
+    # Blocks of a few queries, and a chunk size that doesn't divide the queries
+    monkeypatch.setattr(helper_substitutes, 'MAX_BLOCK_VALUES', 500)
+    batch = index.substitutes_batch(names, 5, chunk_size=7)
+
+    for name, expected, result in zip(names, single, batch):
+        assert result.tolist() == expected.tolist()
+        assert name not in result['name']
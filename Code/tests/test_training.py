@@ -0,0 +1,42 @@
+"""
+Tests of the training export: the normalised encoding and the version check of the manifest.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from helper_functions.helper_inference import ModelPredictor
+from helper_functions.helper_training import (MANIFEST_FILE, build_vocabulary, export_training_shards,
+                                              iter_training_batches, read_manifest)
+
+
+def recipe(ingredients, target):
+    return {
+        'matched_ingredients': [{'ingredient': ingredient} for ingredient in ingredients],
+        'best_target_ingredient': {'name': target, 'total_loss': 0.5}
+    }
+
+
+def test_vocabulary_and_recipes_are_normalised_alike(tmp_path):
+    vocabulary = build_vocabulary(['Butter', ' garlic', 'butter', 'Onion '])
+    assert vocabulary == ['<pad>', '<unk>', 'butter', 'garlic', 'onion']
+
+    manifest = export_training_shards([recipe(['Garlic ', 'BUTTER'], 'Onion')], vocabulary, str(tmp_path))
+    assert (manifest['recipes'], manifest['skipped']) == (1, 0)
+
+    tokens, targets = next(iter_training_batches(str(tmp_path)))
+    assert tokens[0].tolist()[:2] == [2, 3]
+    assert targets['ingredient_output'].tolist() == [4]
+    np.testing.assert_allclose(targets['score_output'], [0.5])
+
+
+def test_load_refuses_an_old_export(tmp_path):
+    export_training_shards([], build_vocabulary(['butter']), str(tmp_path))
+    manifest = read_manifest(str(tmp_path))
+    del manifest['format_version'], manifest['encoding']
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps(manifest))
+
+    with pytest.raises(ValueError, match='Export the training data again'):
+        ModelPredictor.load('model.keras', str(tmp_path))